@@ -0,0 +1,17 @@
+"""
+Benchmarks - Scan and API performance measured against a simulated network
+
+Run from the backend directory:
+
+    python -m benchmarks.run --output results/head.json
+    python -m benchmarks.compare results/base.json results/head.json
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SRC_DIR = BACKEND_DIR / "src"
+
+# Plugins import each other as plugins.<name>.<module>, like they do inside the app
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
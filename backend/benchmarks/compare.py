@@ -0,0 +1,79 @@
+"""
+Benchmark Comparison - Show how the metrics moved between two reports
+
+    python -m benchmarks.compare base.json head.json [--threshold 0.1]
+
+Exits with status 1 when a metric got worse by more than the threshold,
+so it can gate a change in CI.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Metadata that should match for the numbers to be comparable
+COMPARABLE = ("python", "platform", "cpu_count", "args")
+
+
+def _load(path: Path) -> Dict[str, Any]:
+    with path.open() as f:
+        return json.load(f)
+
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """One row per metric in both reports, with the relative change and a verdict"""
+    rows = []
+    for name, new in head["metrics"].items():
+        old = base["metrics"].get(name)
+        if old is None:
+            continue
+        change: Optional[float] = None
+        if old["value"]:
+            change = (new["value"] - old["value"]) / abs(old["value"])
+        verdict = ""
+        if change is not None and new.get("better") in ("lower", "higher"):
+            # Positive means "moved the good way"
+            gain = -change if new["better"] == "lower" else change
+            if gain < -threshold:
+                verdict = "regression"
+            elif gain > threshold:
+                verdict = "improvement"
+        rows.append({"name": name, "unit": new["unit"], "base": old["value"],
+                     "head": new["value"], "change": change, "verdict": verdict})
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description=__doc__.split("\n\n")[0])
+    parser.add_argument("base", type=Path, help="Report of the baseline")
+    parser.add_argument("head", type=Path, help="Report of the change")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative change that counts as a regression (default: %(default)s)")
+    parser.add_argument("--all", action="store_true", help="Also list metrics within the threshold")
+    args = parser.parse_args(argv)
+
+    base, head = _load(args.base), _load(args.head)
+    for key in COMPARABLE:
+        if base["meta"].get(key) != head["meta"].get(key):
+            print(f"⚠️  Reports differ in {key}, the numbers may not be comparable")
+    print(f"base {base['meta'].get('commit') or '?'}  →  head {head['meta'].get('commit') or '?'}"
+          f"{' (dirty)' if head['meta'].get('dirty') else ''}")
+
+    rows = compare(base, head, args.threshold)
+    for row in rows:
+        if not (args.all or row["verdict"]):
+            continue
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "n/a"
+        mark = {"regression": "❌", "improvement": "✅"}.get(row["verdict"], "  ")
+        print(f"{mark} {row['name']:<52} {row['base']:>12.6g} → {row['head']:<12.6g} {row['unit']:<8} {change:>8}")
+
+    regressions = [row for row in rows if row["verdict"] == "regression"]
+    improvements = [row for row in rows if row["verdict"] == "improvement"]
+    print(f"{len(rows)} metric(s) compared: {len(regressions)} regression(s), "
+          f"{len(improvements)} improvement(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
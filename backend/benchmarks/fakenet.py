@@ -0,0 +1,171 @@
+"""
+Simulated Network - Deterministic fake hosts answering ping, ARP, DNS and TCP probes
+"""
+import asyncio
+import ipaddress
+import json
+import os
+import shlex
+import sys
+import tempfile
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+from plugins.scanner import neighbors
+
+from . import BACKEND_DIR
+from plugins.scanner.oui import SEED_ENTRIES
+
+# Common services, weighted towards what a LAN usually exposes
+SERVICE_PORTS = (22, 80, 443, 53, 139, 445, 3389, 8080, 5900, 631, 9100, 3306, 5432, 1883)
+OS_NAMES = ("Linux 5.X", "Microsoft Windows 10", "Apple macOS 13", "FreeBSD 13.0", "")
+
+
+def _uniform(*parts) -> float:
+    """A reproducible number in [0, 1) for the given key (no shared RNG state)"""
+    return zlib.crc32(":".join(map(str, parts)).encode()) / 2 ** 32
+
+
+class FakeHost:
+    __slots__ = ("ip", "mac", "hostname", "ports", "os_info", "latency")
+
+    def __init__(self, ip: str, mac: str, hostname: str, ports: List[int],
+                 os_info: str, latency: float):
+        self.ip = ip
+        self.mac = mac
+        self.hostname = hostname
+        self.ports = ports
+        self.os_info = os_info
+        self.latency = latency
+
+
+class FakeNetwork:
+    """
+    A synthetic LAN of live hosts inside one or more ranges.
+
+    Everything is derived from the seed, so the same arguments give the
+    same hosts, latencies and lost packets on every run and machine.
+
+    Args:
+        networks: CIDR ranges the hosts live in
+        density: Fraction of addresses that are up
+        latency: Base round-trip time in seconds, each host adds up to +100% jitter
+        loss: Probability that a single probe gets no answer
+        dns_latency: Seconds per reverse lookup (blocking, like gethostbyaddr)
+        arp_latency: Seconds per neighbor table read
+        seed: Makes the network reproducible
+    """
+
+    def __init__(self, networks: Iterable[str], density: float = 0.3, latency: float = 0.002,
+                 loss: float = 0.0, dns_latency: float = 0.001, arp_latency: float = 0.001,
+                 seed: int = 1):
+        # Enough to rebuild the same network in the fake nmap process
+        self.spec = {
+            "networks": [str(network) for network in networks], "density": density,
+            "latency": latency, "loss": loss, "dns_latency": dns_latency,
+            "arp_latency": arp_latency, "seed": seed,
+        }
+        self.networks = [ipaddress.ip_network(network, strict=False) for network in networks]
+        self.loss = loss
+        self.dns_latency = dns_latency
+        self.arp_latency = arp_latency
+        self.seed = seed
+        self.hosts: Dict[str, FakeHost] = {}
+        # Probes per address, so losses do not depend on probe order
+        self.attempts: Dict[str, int] = {}
+        self._tools_dir: Optional[tempfile.TemporaryDirectory] = None
+        vendors = list(SEED_ENTRIES)
+        for network in self.networks:
+            for address in network.hosts():
+                ip = str(address)
+                if _uniform(seed, "up", ip) >= density:
+                    continue
+                oui = vendors[int(_uniform(seed, "vendor", ip) * len(vendors))]
+                nic = f"{zlib.crc32(f'{seed}:{ip}'.encode()) & 0xFFFFFF:06X}"
+                mac = ":".join((oui + nic)[i:i + 2] for i in range(0, 12, 2))
+                ports = [
+                    port for port in SERVICE_PORTS
+                    if _uniform(seed, "port", ip, port) < 0.25
+                ]
+                named = _uniform(seed, "dns", ip) < 0.7
+                self.hosts[ip] = FakeHost(
+                    ip=ip,
+                    mac=mac,
+                    hostname=f"host-{ip.replace('.', '-')}.lan" if named else "",
+                    ports=ports,
+                    os_info=OS_NAMES[int(_uniform(seed, "os", ip) * len(OS_NAMES))],
+                    latency=latency * (1 + _uniform(seed, "rtt", ip))
+                )
+
+    @property
+    def size(self) -> int:
+        """Number of addresses in the ranges"""
+        return sum(max(1, network.num_addresses - 2) for network in self.networks)
+
+    def _lost(self, ip: str) -> bool:
+        attempt = self.attempts[ip] = self.attempts.get(ip, 0) + 1
+        return self.loss > 0 and _uniform(self.seed, "loss", ip, attempt) < self.loss
+
+    async def ping(self, ip: str, timeout: float = 2.0) -> bool:
+        """Stands in for probes.ping_host: silent hosts cost the full timeout"""
+        host = self.hosts.get(ip)
+        if host is None or self._lost(ip):
+            await asyncio.sleep(timeout)
+            return False
+        await asyncio.sleep(min(timeout, host.latency))
+        return True
+
+    async def read_neighbor_table(self) -> Dict[str, str]:
+        """Stands in for neighbors.read_neighbor_table"""
+        await asyncio.sleep(self.arp_latency)
+        return {ip: host.mac for ip, host in self.hosts.items()}
+
+    def gethostbyaddr(self, ip: str) -> str:
+        """Stands in for ReverseResolver._lookup (runs in its thread pool)"""
+        time.sleep(self.dns_latency)
+        host = self.hosts.get(ip)
+        return host.hostname if host else ""
+
+    async def scan_ports(self, ip: str, ports: Iterable[int]) -> List[int]:
+        """Stands in for PortScanner.scan: one round trip per batch of ports"""
+        host = self.hosts.get(ip)
+        if host is None:
+            return []
+        await asyncio.sleep(host.latency)
+        wanted = set(ports)
+        return [port for port in host.ports if port in wanted]
+
+    def install(self, scanner) -> None:
+        """Point a ScannerPlugin instance's network access at this fake network"""
+        scanner._ping_host = self.ping
+        scanner.resolver._lookup = self.gethostbyaddr
+        scanner.port_scanner.scan = self.scan_ports
+        neighbors.read_neighbor_table = self.read_neighbor_table
+        scanner.settings["nmap_path"] = self.tool_script("nmap", "benchmarks.fakenmap")
+        # Found by capability detection, which the async backend needs
+        tools = os.path.dirname(self.tool_script("ping", "benchmarks.fakeping"))
+        if tools not in os.environ.get("PATH", "").split(os.pathsep):
+            os.environ["PATH"] = tools + os.pathsep + os.environ.get("PATH", "")
+
+    def tool_script(self, name: str, module: str) -> str:
+        """An executable called name that runs module against this network"""
+        if self._tools_dir is None:
+            # Removed with the network
+            self._tools_dir = tempfile.TemporaryDirectory(prefix="redsec-faketools-")
+        path = os.path.join(self._tools_dir.name, name)
+        with open(path, "w") as f:
+            f.write(
+                "#!/bin/sh\n"
+                f"cd {shlex.quote(str(BACKEND_DIR))} && exec {shlex.quote(sys.executable)} "
+                f"-m {module} {shlex.quote(json.dumps(self.spec))} \"$@\"\n"
+            )
+        os.chmod(path, 0o755)
+        return path
+
+
+def synthetic_network(hosts: int, density: float = 0.3, **kwargs) -> FakeNetwork:
+    """A fake network in 10.0.0.0/8 just large enough for about hosts live hosts"""
+    addresses = max(4, int(hosts / density))
+    prefix = max(8, 32 - (addresses - 1).bit_length())
+    return FakeNetwork([f"10.0.0.0/{prefix}"], density=density, **kwargs)
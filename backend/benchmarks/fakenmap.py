@@ -0,0 +1,75 @@
+"""
+Fake nmap - Answers `nmap -oX - -iL -` scans from a FakeNetwork
+
+    python -m benchmarks.fakenmap '<FakeNetwork kwargs as JSON>' [nmap options]
+    python -m benchmarks.fakenmap '<FakeNetwork kwargs as JSON>' --version
+
+Installed as the scanner's nmap_path by FakeNetwork.install. Like an
+unprivileged run, SYN scans fail, so the capability check finds no SYN
+support and the scanner runs ping scans, filling in ports with its own
+connect scanner. Hosts are written batch by
+batch as they "finish", the way nmap streams its XML.
+"""
+import ipaddress
+import json
+import sys
+import time
+from typing import List, Optional
+
+from .fakenet import FakeNetwork
+
+# nmap pings this many addresses in parallel; each batch costs the slowest live round trip
+BATCH_SIZE = 256
+
+
+def _host(ip: str, mac: str) -> str:
+    return (
+        f'<host starttime="{int(time.time())}"><status state="up" reason="arp-response"/>\n'
+        f'<address addr="{ip}" addrtype="ipv4"/>\n'
+        f'<address addr="{mac}" addrtype="mac"/>\n'
+        f'<hostnames>\n</hostnames>\n<times srtt="1000" rttvar="5000" to="100000"/>\n</host>\n'
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    network = FakeNetwork(**json.loads(argv[0]))
+    options = argv[1:]
+    if "--version" in options:
+        print("Nmap version 7.94 ( https://nmap.org )\nCompiled with: nmap-libdnet-1.12 ipv6")
+        return 0
+    if "-sS" in options:
+        sys.stderr.write("You requested a scan type which requires root privileges.\nQUITTING!\n")
+        return 1
+
+    targets = [
+        str(address)
+        for spec in sys.stdin.read().split()
+        for address in ipaddress.ip_network(spec, strict=False)
+    ]
+    slowest = max((host.latency for host in network.hosts.values()), default=0)
+    out = sys.stdout
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE nmaprun>\n'
+              f'<nmaprun scanner="nmap" args="nmap {" ".join(options)}" version="7.94">\n'
+              '<verbose level="0"/>\n<debugging level="0"/>\n')
+    up = 0
+    for first in range(0, len(targets), BATCH_SIZE):
+        time.sleep(slowest)
+        for ip in targets[first:first + BATCH_SIZE]:
+            host = network.hosts.get(ip)
+            if host is not None and not network._lost(ip):
+                out.write(_host(ip, host.mac))
+                up += 1
+        done = min(len(targets), first + BATCH_SIZE)
+        out.write(f'<taskprogress task="Ping Scan" time="{int(time.time())}" '
+                  f'percent="{done * 100 / len(targets):.2f}" remaining="0" etc="0"/>\n')
+        out.flush()
+    out.write(f'<runstats><finished time="{int(time.time())}" exit="success"/>'
+              f'<hosts up="{up}" down="{len(targets) - up}" total="{len(targets)}"/>\n'
+              '</runstats>\n</nmaprun>\n')
+    out.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
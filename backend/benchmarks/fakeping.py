@@ -0,0 +1,32 @@
+"""
+Fake ping - Answers `ping -c 1 -W <timeout> <ip>` from a FakeNetwork
+
+    python -m benchmarks.fakeping '<FakeNetwork kwargs as JSON>' -c 1 -W 2 10.0.0.5
+
+Put on PATH by FakeNetwork.install, so capability detection finds a ping
+command and allows the async backend. Scans themselves go through
+FakeNetwork.ping, which installs in place of the scanner's ping probe.
+"""
+import json
+import sys
+import time
+from typing import List, Optional
+
+from .fakenet import FakeNetwork
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    network = FakeNetwork(**json.loads(argv[0]))
+    options, ip = argv[1:-1], argv[-1]
+    timeout = float(options[options.index("-W") + 1]) if "-W" in options else 2.0
+    host = network.hosts.get(ip)
+    if host is None or network._lost(ip):
+        time.sleep(timeout)
+        return 1
+    time.sleep(min(timeout, host.latency))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
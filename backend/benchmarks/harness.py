@@ -0,0 +1,81 @@
+"""
+Harness - Boots the API in-process against the simulated network and times things
+"""
+import contextlib
+import io
+import logging
+import math
+import os
+import statistics
+import tempfile
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .fakenet import FakeNetwork
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Median, p95, min and max of a list of samples"""
+    ordered = sorted(samples)
+    p95 = ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)]
+    return {
+        "median": statistics.median(ordered),
+        "p95": p95,
+        "min": ordered[0],
+        "max": ordered[-1],
+        "samples": len(ordered),
+    }
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    """Swallow the plugins' progress output and info logs while measuring"""
+    if not enabled:
+        yield
+        return
+    logging.disable(logging.INFO)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def isolate_environment() -> tempfile.TemporaryDirectory:
+    """
+    Point the app at a throwaway database and turn off the file watcher.
+
+    Must run before src.main is imported; the caller keeps the returned
+    directory alive for as long as the app runs.
+    """
+    workdir = tempfile.TemporaryDirectory(prefix="redsec-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir.name}/inventory.db"
+    os.environ["PLUGIN_WATCH_INTERVAL"] = "0"
+    return workdir
+
+
+@contextlib.asynccontextmanager
+async def running_app(settings: Optional[Dict[str, Any]] = None,
+                      network: Optional[FakeNetwork] = None,
+                      verbose: bool = False) -> AsyncIterator[Tuple[Any, Any, Any]]:
+    """
+    Load all plugins into the real FastAPI app and yield (app, plugin_manager, scanner).
+
+    settings override the scanner's plugin.json settings; with a network,
+    the scanner's ping, ARP, DNS, port and nmap access goes to it instead.
+    """
+    from src.main import app, plugin_manager
+
+    with quiet(not verbose):
+        await plugin_manager.load_all_plugins()
+        scanner = await plugin_manager.activate("scanner")
+    if scanner is None:
+        raise RuntimeError("The scanner plugin failed to load")
+    scanner.settings.update(settings or {})
+    if network is not None:
+        network.install(scanner)
+    try:
+        yield app, plugin_manager, scanner
+    finally:
+        with quiet(not verbose):
+            for name in list(plugin_manager.plugins):
+                await plugin_manager.unload_plugin(name)
@@ -0,0 +1,49 @@
+"""
+Synthetic Inventories - Large, reproducible device sets for the API benchmarks
+"""
+from datetime import datetime, timedelta
+from typing import List
+
+from plugins.scanner.device import Device
+from plugins.scanner.oui import SEED_ENTRIES
+
+from .fakenet import OS_NAMES, SERVICE_PORTS, _uniform
+
+# A fixed clock, so timestamps (and with them ETags) are the same on every run
+EPOCH = datetime(2024, 1, 1)
+
+
+def synthetic_devices(count: int, seed: int = 1) -> List[Device]:
+    """count devices spread over 10.0.0.0/8 with realistic vendors, ports and ages"""
+    vendors = list(SEED_ENTRIES.items())
+    devices = []
+    for n in range(count):
+        ip = f"10.{(n >> 16) & 0xFF}.{(n >> 8) & 0xFF}.{n & 0xFF}"
+        oui, vendor = vendors[int(_uniform(seed, "vendor", ip) * len(vendors))]
+        mac = ":".join((oui + f"{n & 0xFFFFFF:06X}")[i:i + 2] for i in range(0, 12, 2))
+        first_seen = EPOCH + timedelta(days=_uniform(seed, "first", ip) * 90)
+        last_seen = first_seen + timedelta(days=_uniform(seed, "last", ip) * 30)
+        device = Device(
+            ip=ip,
+            mac=mac,
+            hostname=f"host-{n}.lan" if _uniform(seed, "dns", ip) < 0.7 else "",
+            vendor=vendor,
+            status="active" if _uniform(seed, "status", ip) < 0.8 else "inactive",
+            os_info=OS_NAMES[int(_uniform(seed, "os", ip) * len(OS_NAMES))],
+            first_seen=first_seen,
+            last_seen=last_seen,
+            fingerprinted_at=last_seen
+        )
+        device.ports = [port for port in SERVICE_PORTS if _uniform(seed, "port", ip, port) < 0.25]
+        devices.append(device)
+    return devices
+
+
+def load_inventory(scanner, devices: List[Device]) -> None:
+    """Replace a ScannerPlugin's in-memory inventory (the store is left alone)"""
+    scanner.devices.clear()
+    scanner.index.clear()
+    for device in devices:
+        scanner.devices[device.ip] = device
+        scanner.index.update(device)
+    scanner.snapshot.touch()
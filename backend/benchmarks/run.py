@@ -0,0 +1,255 @@
+"""
+Benchmark Runner - Measure scan throughput, device API latency and plugin startup
+
+    python -m benchmarks.run [--suites scan,api,startup] [--output report.json]
+
+The report is JSON: run metadata (commit, machine, arguments) and one entry
+per metric with its value, unit and whether lower or higher is better.
+Feed two reports to benchmarks.compare to see what a change did.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import BACKEND_DIR
+from .fakenet import synthetic_network
+from .harness import isolate_environment, quiet, running_app, summarize
+from .inventory import load_inventory, synthetic_devices
+
+SUITES = ("scan", "api", "startup")
+SCAN_CASES = (("async", "full"), ("async", "incremental"), ("nmap", "full"))
+API_CASES = {
+    "list": ("/api/devices", {}),
+    "list_not_modified": ("/api/devices", None),  # If-None-Match with the current ETag
+    "query_vendor": ("/api/devices", {"vendor": "Apple", "limit": 100}),
+    "query_port": ("/api/devices", {"port": 22, "status": "active", "limit": 1000}),
+}
+
+
+class Report:
+    """Collects metrics; value is the median of the samples"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.meta = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            **_git_info(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "verbose")},
+        }
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, samples: List[float], unit: str, better: Optional[str] = "lower") -> None:
+        stats = summarize(samples)
+        self.metrics[name] = {"value": stats["median"], "unit": unit, "better": better, **stats}
+        spread = f"p95 {_format(stats['p95'], unit)}" if unit == "s" else f"min {_format(stats['min'], unit)}"
+        print(f"  {name:<52} {_format(stats['median'], unit):>16}  ({spread})")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"meta": self.meta, "metrics": self.metrics}
+
+
+def _format(value: float, unit: str) -> str:
+    if unit == "s":
+        return f"{value * 1000:.2f} ms" if value < 1 else f"{value:.3f} s"
+    return f"{value:,.1f} {unit}"
+
+
+def _git_info() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ("git", *args), cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "."))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+async def scan_suite(args: argparse.Namespace, report: Report) -> None:
+    """scan_network throughput for each backend and mode over one fake network"""
+    network = synthetic_network(
+        args.hosts, args.density, latency=args.latency, loss=args.loss,
+        dns_latency=args.dns_latency, seed=args.seed
+    )
+    target = str(network.networks[0])
+    print(f"Scan: {target}, {network.size} addresses, {len(network.hosts)} live hosts")
+    settings = {
+        "ping_timeout": args.ping_timeout,
+        "scan_processes": 0,
+        "progress_interval": 3600,
+    }
+    async with running_app(settings, network, args.verbose) as (_, _, scanner):
+        for backend, mode in SCAN_CASES:
+            seconds, phases, found = [], {}, []
+            for run in range(args.warmup + args.repeat):
+                if mode == "full":
+                    # Every full scan starts with cold DNS, like the first scan after startup
+                    scanner.resolver.clear()
+                with quiet(not args.verbose):
+                    started = time.perf_counter()
+                    job, _ = await scanner.submit_scan(target, backend, mode)
+                    await job.wait()
+                    elapsed = time.perf_counter() - started
+                if job.status != "completed":
+                    raise RuntimeError(f"{backend}/{mode} scan {job.status}: {job.error}")
+                if run < args.warmup:
+                    continue
+                seconds.append(elapsed)
+                found.append(len(job.devices))
+                for phase, value in (job.timings or {}).items():
+                    phases.setdefault(phase, []).append(value)
+
+            name = f"scan.{backend}.{mode}"
+            report.add(f"{name}.seconds", seconds, "s")
+            report.add(f"{name}.hosts_per_second", [network.size / s for s in seconds], "hosts/s", "higher")
+            report.add(f"{name}.devices_found", found, "devices", None)
+            for phase, values in sorted(phases.items()):
+                report.add(f"{name}.phase.{phase}", values, "s")
+
+
+async def _hammer(client, path: str, params: Optional[Dict[str, Any]], headers: Dict[str, str],
+                  requests: int, concurrency: int) -> tuple[List[float], float]:
+    """Send requests from concurrency workers; returns per-request latencies and the wall time"""
+    latencies: List[float] = []
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.get(path, params=params, headers=headers)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code not in (200, 304):
+                raise RuntimeError(f"GET {path} {params} returned {response.status_code}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+async def api_suite(args: argparse.Namespace, report: Report) -> None:
+    """GET /api/devices latency and throughput under concurrency, per inventory size"""
+    import httpx
+
+    # One log line per request would dwarf what is being measured
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    async with running_app(verbose=args.verbose) as (app, _, scanner):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for size in args.sizes:
+                print(f"API: {size:,} devices, {args.concurrency} concurrent clients")
+                load_inventory(scanner, synthetic_devices(size, args.seed))
+
+                # Serializing the snapshot after a change is paid by the first poll
+                rebuilds = []
+                for _ in range(args.repeat):
+                    scanner.snapshot.touch()
+                    started = time.perf_counter()
+                    response = await client.get("/api/devices")
+                    rebuilds.append(time.perf_counter() - started)
+                report.add(f"api.devices.{size}.list_rebuild.latency", rebuilds, "s")
+                etag = response.headers["etag"]
+
+                for case, (path, params) in API_CASES.items():
+                    headers = {"If-None-Match": etag} if params is None else {}
+                    await _hammer(client, path, params, headers, args.concurrency, args.concurrency)
+                    latencies, wall = await _hammer(
+                        client, path, params, headers, args.requests, args.concurrency
+                    )
+                    report.add(f"api.devices.{size}.{case}.latency", latencies, "s")
+                    report.add(f"api.devices.{size}.{case}.throughput", [len(latencies) / wall], "req/s", "higher")
+
+
+def startup_suite(args: argparse.Namespace, report: Report) -> None:
+    """Import and plugin load time, each run in a fresh interpreter"""
+    print(f"Startup: {args.startup_runs} fresh interpreter(s)")
+    runs = []
+    for _ in range(args.startup_runs):
+        result = subprocess.run(
+            (sys.executable, "-m", "benchmarks.startup"),
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        )
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    report.add("startup.import", [run["import"] for run in runs], "s")
+    report.add("startup.load_all_plugins", [run["load"] for run in runs], "s")
+    report.add("startup.total", [run["import"] + run["load"] for run in runs], "s")
+    for name in sorted({name for run in runs for name in run["plugins"]}):
+        report.add(f"startup.plugin.{name}", [run["plugins"].get(name, 0.0) for run in runs], "s")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    def int_list(value: str) -> List[int]:
+        return [int(item) for item in value.split(",") if item]
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--suites", default=",".join(SUITES),
+                        help="Comma separated suites to run (default: %(default)s)")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the fake network and inventories")
+    parser.add_argument("--repeat", type=int, default=5, help="Measured runs per scan case")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured runs before each scan case")
+    scan = parser.add_argument_group("scan suite")
+    scan.add_argument("--hosts", type=int, default=300, help="Approximate live hosts in the fake network")
+    scan.add_argument("--density", type=float, default=0.3, help="Fraction of addresses that are up")
+    scan.add_argument("--latency", type=float, default=0.002, help="Base round-trip time (s)")
+    scan.add_argument("--loss", type=float, default=0.0, help="Probe loss probability")
+    scan.add_argument("--dns-latency", type=float, default=0.001, help="Reverse lookup time (s)")
+    scan.add_argument("--ping-timeout", type=float, default=0.05,
+                      help="Scanner ping_timeout, paid by every silent address (s)")
+    api = parser.add_argument_group("api suite")
+    api.add_argument("--sizes", type=int_list, default=[1000, 10000, 100000],
+                     help="Inventory sizes (default: 1000,10000,100000)")
+    api.add_argument("--concurrency", type=int, default=16, help="Concurrent API clients")
+    api.add_argument("--requests", type=int, default=200, help="Requests per API case")
+    parser.add_argument("--startup-runs", type=int, default=5, help="Fresh interpreters for the startup suite")
+    parser.add_argument("--verbose", action="store_true", help="Show the plugins' output")
+    args = parser.parse_args(argv)
+
+    args.suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"Unknown suite(s): {', '.join(sorted(unknown))}")
+    return args
+
+
+async def run(args: argparse.Namespace, report: Report) -> None:
+    if "scan" in args.suites:
+        await scan_suite(args, report)
+    if "api" in args.suites:
+        await api_suite(args, report)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = Report(args)
+    # Before the app is imported, so it picks up the throwaway database
+    workdir = isolate_environment()
+    try:
+        asyncio.run(run(args, report))
+    finally:
+        workdir.cleanup()
+    if "startup" in args.suites:
+        startup_suite(args, report)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report.to_dict(), indent=2) + "\n")
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
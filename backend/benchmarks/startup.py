@@ -0,0 +1,37 @@
+"""
+Startup - Time importing the app and loading its plugins in a fresh interpreter
+
+Run by the startup suite in a subprocess; prints its timings as one JSON line.
+"""
+import asyncio
+import json
+import time
+
+from .harness import isolate_environment, quiet
+
+
+async def _load(plugin_manager) -> float:
+    started = time.perf_counter()
+    await plugin_manager.load_all_plugins()
+    elapsed = time.perf_counter() - started
+    for name in list(plugin_manager.plugins):
+        await plugin_manager.unload_plugin(name)
+    return elapsed
+
+
+def main() -> None:
+    workdir = isolate_environment()
+    with quiet():
+        started = time.perf_counter()
+        from src.main import plugin_manager
+        imported = time.perf_counter() - started
+        loaded = asyncio.run(_load(plugin_manager))
+
+    histogram = plugin_manager.metrics.metrics["redsec_plugin_load_duration_seconds"]
+    plugins = {key[0]: total[0] for key, (_, total) in histogram.series.items()}
+    workdir.cleanup()
+    print(json.dumps({"import": imported, "load": loaded, "plugins": plugins}))
+
+
+if __name__ == "__main__":
+    main()
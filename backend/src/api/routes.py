@@ -1,18 +1,32 @@
 """
 API Routes for RedSec Dashboard
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel
+import asyncio
+import json
+
+from ..core.http_cache import conditional_response, etag_for
+from ..core.plugin_process import PluginUnavailable
+from ..core.serialization import dumps
 
 router = APIRouter()
 
 # Will be injected by main.py
 plugin_manager = None
 
+# Encoded /plugins body for the plugin manager's memoized listing: (listing, etag, body)
+_plugins_body = None
+
 
 class ScanRequest(BaseModel):
     network: Optional[str] = None
+    backend: Optional[str] = None
+    mode: Optional[str] = None
+    profile: Optional[str] = None
 
 
 @router.get("/health")
@@ -22,57 +36,424 @@ async def health_check():
 
 
 @router.get("/plugins")
-async def list_plugins():
+async def list_plugins(if_none_match: Optional[str] = Header(None)):
     """List all available plugins"""
+    global _plugins_body
     if not plugin_manager:
         raise HTTPException(status_code=500, detail="Plugin manager not initialized")
     
-    return {
-        "plugins": plugin_manager.list_plugins()
-    }
+    # Encoded once per memoized listing; browsers may reuse it as long as the server does
+    listing = plugin_manager.list_plugins()
+    if _plugins_body is None or _plugins_body[0] is not listing:
+        body = dumps({"plugins": listing})
+        _plugins_body = (listing, etag_for(body), body)
+    _, etag, body = _plugins_body
+    return conditional_response(
+        body, etag, if_none_match,
+        cache_control=f"private, max-age={plugin_manager.metadata_ttl:g}"
+    )
 
 
-@router.post("/scan")
-async def start_scan(request: ScanRequest):
-    """Start a network scan"""
+@router.post("/plugins/{name}/load")
+async def load_plugin(name: str):
+    """Load and initialize a plugin that is not running"""
     if not plugin_manager:
         raise HTTPException(status_code=500, detail="Plugin manager not initialized")
     
-    scanner = plugin_manager.get_plugin("scanner")
-    if not scanner:
-        raise HTTPException(status_code=404, detail="Scanner plugin not found")
+    if not (plugin_manager.plugins_dir / name / "plugin.json").exists():
+        raise HTTPException(status_code=404, detail=f"Plugin {name} not found")
+    if not await plugin_manager.load_plugin(name):
+        raise HTTPException(status_code=500, detail=f"Plugin {name} failed to load")
     
-    result = await scanner.execute(action='scan', network=request.network)
-    return result
+    return {"status": "success", "plugin": name, "action": "load"}
 
 
-@router.get("/devices")
-async def get_devices():
-    """Get all discovered devices"""
+@router.post("/plugins/{name}/reload")
+async def reload_plugin(name: str):
+    """Hot-swap a plugin with its current code, keeping its state; the old version stays on failure"""
     if not plugin_manager:
         raise HTTPException(status_code=500, detail="Plugin manager not initialized")
     
-    scanner = plugin_manager.get_plugin("scanner")
-    if not scanner:
-        raise HTTPException(status_code=404, detail="Scanner plugin not found")
+    if not plugin_manager.get_plugin(name):
+        raise HTTPException(status_code=404, detail=f"Plugin {name} not loaded")
+    if not await plugin_manager.reload_plugin(name):
+        raise HTTPException(status_code=500, detail=f"Reload of {name} failed, previous version kept")
     
-    result = await scanner.execute(action='list')
-    return result
+    return {"status": "success", "plugin": name, "action": "reload"}
 
 
-@router.get("/device/{ip}")
-async def get_device(ip: str):
-    """Get specific device information"""
+@router.post("/plugins/{name}/unload")
+async def unload_plugin(name: str):
+    """Stop a plugin after its running calls finish"""
+    if not plugin_manager:
+        raise HTTPException(status_code=500, detail="Plugin manager not initialized")
+    
+    if not plugin_manager.get_plugin(name):
+        raise HTTPException(status_code=404, detail=f"Plugin {name} not loaded")
+    if not await plugin_manager.unload_plugin(name):
+        raise HTTPException(status_code=500, detail=f"Plugin {name} failed to unload")
+    
+    return {"status": "success", "plugin": name, "action": "unload"}
+
+
+@router.get("/events")
+async def event_bus_stats():
+    """Event bus counters and the state of every subscriber queue"""
+    if not plugin_manager:
+        raise HTTPException(status_code=500, detail="Plugin manager not initialized")
+    
+    return plugin_manager.events.stats()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request, plugin and scan metrics in the Prometheus text format"""
+    if not plugin_manager:
+        raise HTTPException(status_code=500, detail="Plugin manager not initialized")
+    
+    return PlainTextResponse(
+        await plugin_manager.render_metrics(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@router.websocket("/ws")
+async def event_socket(websocket: WebSocket, topics: Optional[str] = None,
+                       policy: str = "drop_oldest", queue: int = Query(256, ge=1, le=10000)):
+    """
+    Multiplexed event stream over one WebSocket.
+    
+    Client messages:
+        {"op": "subscribe", "topics": ["scanner.*"]}
+        {"op": "unsubscribe", "topics": ["scanner.scan"]}
+        {"op": "ping"}
+    
+    Server messages:
+        {"type": "event", "topic", "seq", "time", "data"}
+        {"type": "subscribed", "topics"} after every (un)subscribe
+        {"type": "dropped", "count"} when this client fell behind and lost events
+        {"type": "pong"} and {"type": "error", "message"}
+    """
+    await websocket.accept()
+    if not plugin_manager:
+        await websocket.close(code=1011)
+        return
+    
+    try:
+        subscription = plugin_manager.events.subscribe(
+            [t.strip() for t in topics.split(",") if t.strip()] if topics else [],
+            maxsize=queue,
+            policy=policy
+        )
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "message": str(e)})
+        await websocket.close(code=1008)
+        return
+    
+    async def send_events():
+        async for event in subscription:
+            dropped = subscription.take_dropped()
+            if dropped:
+                await websocket.send_json({"type": "dropped", "count": dropped})
+            await websocket.send_text(event.to_json())
+        # Closed by the "disconnect" overflow policy
+        await websocket.close(code=1013)
+    
+    async def receive_commands():
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                message = None
+            op = message.get("op") if isinstance(message, dict) else None
+            if op in ("subscribe", "unsubscribe"):
+                requested = message.get("topics") or []
+                if op == "subscribe":
+                    subscription.subscribe(requested)
+                else:
+                    subscription.unsubscribe(requested)
+                await websocket.send_json({"type": "subscribed", "topics": sorted(subscription.patterns)})
+            elif op == "ping":
+                await websocket.send_json({"type": "pong"})
+            else:
+                await websocket.send_json({"type": "error", "message": f"Unknown op: {op}"})
+    
+    sender = asyncio.create_task(send_events())
+    # A failed send just means the client went away; the receive loop sees that too
+    sender.add_done_callback(lambda task: task.cancelled() or task.exception())
+    try:
+        await receive_commands()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        subscription.close()
+        sender.cancel()
+
+
+async def _scanner(**kwargs):
+    """Run a scanner plugin action, activating the plugin if lazy, or raise the matching HTTP error"""
     if not plugin_manager:
         raise HTTPException(status_code=500, detail="Plugin manager not initialized")
     
-    scanner = plugin_manager.get_plugin("scanner")
-    if not scanner:
+    try:
+        return await plugin_manager.execute("scanner", **kwargs)
+    except LookupError:
         raise HTTPException(status_code=404, detail="Scanner plugin not found")
+    except PluginUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def _event_stream(events) -> StreamingResponse:
+    """Wrap an async iterator of scan events as a Server-Sent Events response"""
+    async def event_source():
+        async for event in events:
+            # Events with an id can be resumed with Last-Event-ID
+            event_id = f"id: {event['id']}\n" if 'id' in event else ""
+            yield f"{event_id}event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/scan", status_code=202)
+async def start_scan(request: ScanRequest):
+    """Queue a network scan and return its job ID with an estimate of its duration and packets"""
+    result = await _scanner(
+        action='scan',
+        network=request.network,
+        backend=request.backend,
+        mode=request.mode,
+        profile=request.profile
+    )
+    
+    if result.get('status') == 'error':
+        raise HTTPException(status_code=400, detail=result.get('message'))
     
-    result = await scanner.execute(action='get_device', ip=ip)
+    return result
+
+
+@router.get("/scan/profiles")
+async def list_scan_profiles():
+    """Scan profiles with their port sets and timing"""
+    return await _scanner(action='profiles')
+
+
+@router.get("/scan/estimate")
+async def estimate_scan(network: Optional[str] = None, backend: Optional[str] = None,
+                        mode: Optional[str] = None, profile: Optional[str] = None):
+    """Estimate a scan's duration and packets without starting it"""
+    result = await _scanner(action='estimate', network=network, backend=backend,
+                            mode=mode, profile=profile)
+    
+    if result.get('status') == 'error':
+        raise HTTPException(status_code=400, detail=result.get('message'))
+    
+    return result
+
+
+@router.get("/scan/stream")
+async def stream_scan(network: Optional[str] = None, backend: Optional[str] = None,
+                      mode: Optional[str] = None, profile: Optional[str] = None):
+    """Start (or join) a network scan, streaming devices and progress as Server-Sent Events"""
+    result = await _scanner(action='stream', network=network, backend=backend, mode=mode,
+                            profile=profile)
+    
+    if result.get('status') == 'error':
+        raise HTTPException(status_code=400, detail=result.get('message'))
+    
+    return _event_stream(result['events'])
+
+
+@router.get("/scans")
+async def list_scans():
+    """List queued, running and recently finished scan jobs"""
+    return await _scanner(action='list_scans')
+
+
+@router.get("/scans/{job_id}")
+async def get_scan(job_id: str, timings: bool = False):
+    """Get the status and results of a scan job, optionally with the time spent per phase"""
+    result = await _scanner(action='scan_status', job_id=job_id, timings=timings)
     
     if result.get('status') == 'error':
         raise HTTPException(status_code=404, detail=result.get('message'))
     
     return result
+
+
+@router.get("/scans/{job_id}/stream")
+async def follow_scan(job_id: str):
+    """Stream the events of an existing scan job, replaying those already sent (only the outcome once it finished)"""
+    result = await _scanner(action='follow_scan', job_id=job_id)
+    
+    if result.get('status') == 'error':
+        raise HTTPException(status_code=404, detail=result.get('message'))
+    
+    return _event_stream(result['events'])
+
+
+@router.delete("/scans/{job_id}")
+async def cancel_scan(job_id: str):
+    """Cancel a queued or running scan job"""
+    result = await _scanner(action='cancel_scan', job_id=job_id)
+    
+    if result.get('status') == 'error':
+        raise HTTPException(status_code=404, detail=result.get('message'))
+    
+    return result
+
+
+@router.get("/monitor")
+async def get_monitor():
+    """Get the state of continuous monitoring"""
+    return await _scanner(action='monitor_status')
+
+
+@router.post("/monitor/start")
+async def start_monitor():
+    """Start periodic liveness checks and discovery scans"""
+    return await _scanner(action='start_monitor')
+
+
+@router.post("/monitor/stop")
+async def stop_monitor():
+    """Stop continuous monitoring"""
+    return await _scanner(action='stop_monitor')
+
+
+@router.get("/changes")
+async def get_changes(since: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1)):
+    """Get inventory changes (appeared, disappeared, mac_changed, port_opened, port_closed) after an ID"""
+    return await _scanner(action='changes', since=since, limit=limit)
+
+
+@router.get("/changes/stream")
+async def stream_changes(since: Optional[int] = Query(None, ge=0),
+                         last_event_id: Optional[int] = Header(None)):
+    """Stream inventory changes as Server-Sent Events, from since (or Last-Event-ID) or from now on"""
+    result = await _scanner(
+        action='follow_changes',
+        since=since if since is not None else last_event_id
+    )
+    return _event_stream(result['events'])
+
+
+@router.get("/capabilities")
+async def get_capabilities():
+    """What the scanner may do on this host (privileges, nmap, ping), as detected at startup"""
+    return await _scanner(action='capabilities')
+
+
+@router.post("/capabilities/refresh")
+async def refresh_capabilities():
+    """Detect the scanner's capabilities again, e.g. after installing nmap or granting privileges"""
+    return await _scanner(action='capabilities', refresh=True)
+
+
+@router.get("/devices")
+async def get_devices(
+    if_none_match: Optional[str] = Header(None),
+    vendor: Optional[str] = None,
+    status: Optional[str] = None,
+    port: Optional[int] = None,
+    subnet: Optional[str] = None,
+    os: Optional[str] = None,
+    seen_after: Optional[datetime] = None,
+    seen_before: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1)
+):
+    """
+    Get discovered devices.
+    
+    Without query parameters the whole inventory is returned. Any filter,
+    field selection or page size switches to an indexed, cursor-paginated
+    query; pass next_cursor back as cursor to fetch the following page.
+    """
+    filters = {
+        "vendor": vendor, "status": status, "port": port, "subnet": subnet,
+        "os": os, "seen_after": seen_after, "seen_before": seen_before,
+        "cursor": cursor, "limit": limit,
+        "fields": [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    }
+    if any(value is not None for value in filters.values()):
+        result = await _scanner(action='query', **filters)
+        if result.get('status') == 'error':
+            raise HTTPException(status_code=400, detail=result.get('message'))
+        body = dumps(result)
+        return conditional_response(body, etag_for(body), if_none_match)
+    
+    # Served from a pre-serialized snapshot; unchanged polls get a 304
+    result = await _scanner(action='list_snapshot')
+    return conditional_response(result['body'], result['etag'], if_none_match)
+
+
+@router.get("/device/{ip}")
+async def get_device(ip: str, if_none_match: Optional[str] = Header(None)):
+    """Get specific device information"""
+    result = await _scanner(action='get_device', ip=ip)
+    
+    if result.get('status') == 'error':
+        raise HTTPException(status_code=404, detail=result.get('message'))
+    
+    body = dumps(result)
+    return conditional_response(body, etag_for(body), if_none_match)
+
+
+@router.get("/history")
+async def get_history_status():
+    """Get the scan history's retention, rollup progress and time span"""
+    result = await _scanner(action='history_status')
+    
+    if result.get('status') == 'error':
+        raise HTTPException(status_code=400, detail=result.get('message'))
+    
+    return result
+
+
+@router.get("/history/hosts")
+async def get_history_hosts(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    subnet: Optional[str] = None
+):
+    """
+    Hosts that were up at any time between start and end (default: the last 24 hours).
+    
+    Long ranges are answered from hourly and daily rollups, so months of
+    history take about as long as a day.
+    """
+    result = await _scanner(action='history_hosts', start=start, end=end, subnet=subnet)
+    
+    if result.get('status') == 'error':
+        raise HTTPException(status_code=400, detail=result.get('message'))
+    
+    return result
+
+
+@router.get("/history/host/{ip}")
+async def get_history_timeline(
+    ip: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: str = Query("auto", pattern="^(auto|raw|hour|day)$"),
+    limit: int = Query(5000, ge=1, le=100000)
+):
+    """
+    One host's presence, open ports and OS over time (default: the last 7 days).
+    
+    resolution picks raw observations or hourly/daily rollups; auto uses the
+    finest one that still covers start and keeps the timeline short.
+    """
+    result = await _scanner(
+        action='history_timeline', ip=ip, start=start, end=end, resolution=resolution, limit=limit
+    )
+    
+    if result.get('status') == 'error':
+        raise HTTPException(status_code=400, detail=result.get('message'))
+    
+    return result
@@ -0,0 +1,143 @@
+"""
+Compression - gzip/brotli response compression with a cache of compressed bodies
+"""
+import asyncio
+import gzip
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies larger than this are compressed in a worker thread (zlib and brotli
+# release the GIL), so a large device list does not stall the event loop
+THREAD_THRESHOLD = 256 * 1024
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Codings of an Accept-Encoding header with their q-values"""
+    codings: Dict[str, float] = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses for clients that accept it.
+
+    brotli is preferred when the optional brotli package is installed,
+    gzip otherwise. Bodies under minimum_size, already encoded responses,
+    Server-Sent Events and other streamed bodies are passed through.
+    Compressed bodies of responses with an ETag are kept in a small LRU
+    cache, so polling an unchanged snapshot compresses it only once; their
+    ETag is made weak, as the bytes differ from the identity encoding.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4, cache_size: int = 32):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str, int], bytes]" = OrderedDict()
+
+    def negotiate(self, accept_encoding: str) -> Optional[str]:
+        """The coding to respond with, None for identity"""
+        codings = parse_accept_encoding(accept_encoding)
+        wildcard = codings.get("*", 0.0)
+        if brotli is not None and codings.get("br", 0.0) > 0:
+            return "br"
+        if codings.get("gzip", wildcard) > 0:
+            return "gzip"
+        return None
+
+    def _encode(self, body: bytes, coding: str) -> bytes:
+        if coding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def compress(self, body: bytes, coding: str, etag: Optional[str]) -> bytes:
+        key = (etag, coding, len(body)) if etag else None
+        if key is not None and key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        if len(body) > THREAD_THRESHOLD:
+            compressed = await asyncio.to_thread(self._encode, body, coding)
+        else:
+            compressed = self._encode(body, coding)
+        if key is not None:
+            self._cache[key] = compressed
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return compressed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        coding = self.negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        pending = None
+
+        async def compressing_send(message):
+            nonlocal pending
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if message["status"] == 304:
+                    # Keep the ETag as the 200 would have carried it
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["ETag"] = f"W/{etag}"
+                if (message["status"] < 200 or message["status"] in (204, 304)
+                        or "content-encoding" in headers
+                        or headers.get("content-type", "").startswith("text/event-stream")):
+                    await send(message)
+                    return
+                # Held back until the body shows whether it is worth compressing
+                pending = message
+                return
+            if pending is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            start, pending = pending, None
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(start)
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            etag = headers.get("etag")
+            compressed = await self.compress(body, coding, etag)
+            headers["Content-Encoding"] = coding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, compressing_send)
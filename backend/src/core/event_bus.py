@@ -0,0 +1,191 @@
+"""
+Event Bus - In-process publish/subscribe for plugins and connected clients
+"""
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import datetime
+from fnmatch import fnmatchcase
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("drop_oldest", "drop_newest", "disconnect")
+
+
+class Event:
+    """A published message; its JSON form is built once and shared by all subscribers"""
+
+    __slots__ = ("topic", "data", "seq", "time", "_json")
+
+    def __init__(self, topic: str, data: Any, seq: int):
+        self.topic = topic
+        self.data = data
+        self.seq = seq
+        self.time = datetime.now()
+        self._json: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": "event",
+            "topic": self.topic,
+            "seq": self.seq,
+            "time": self.time.isoformat(),
+            "data": self.data
+        }
+
+    def to_json(self) -> str:
+        if self._json is None:
+            self._json = json.dumps(self.to_dict(), default=str)
+        return self._json
+
+
+class SubscriptionClosed(Exception):
+    """Raised by Subscription.get() once the subscription is closed and drained"""
+
+
+class Subscription:
+    """
+    A subscriber's bounded queue of events for a set of topic patterns.
+
+    Patterns are shell-style ("scanner.*" matches "scanner.change"). When
+    the queue is full the policy decides what gives: "drop_oldest" keeps
+    the newest events, "drop_newest" keeps the backlog, and "disconnect"
+    closes the subscription so the consumer can resync from scratch.
+    Dropped events are counted so consumers can tell they missed some.
+    """
+
+    def __init__(self, bus: "EventBus", patterns: Iterable[str] = (),
+                 maxsize: int = 256, policy: str = "drop_oldest"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.bus = bus
+        self.patterns: Set[str] = set(patterns)
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.queue: Deque[Event] = deque()
+        self.dropped = 0
+        self.delivered = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def matches(self, topic: str) -> bool:
+        return any(fnmatchcase(topic, pattern) for pattern in self.patterns)
+
+    def subscribe(self, patterns: Iterable[str]) -> None:
+        self.patterns.update(patterns)
+
+    def unsubscribe(self, patterns: Iterable[str]) -> None:
+        self.patterns.difference_update(patterns)
+
+    def offer(self, event: Event) -> bool:
+        """Queue an event without blocking. Returns False if it was not queued."""
+        if self.closed:
+            return False
+        if len(self.queue) >= self.maxsize:
+            self.dropped += 1
+            self.bus.dropped += 1
+            if self.policy == "drop_newest":
+                return False
+            if self.policy == "disconnect":
+                logger.warning(f"Closing slow event subscriber ({self.maxsize} events behind)")
+                self.close()
+                return False
+            self.queue.popleft()
+        self.queue.append(event)
+        self._ready.set()
+        return True
+
+    def take_dropped(self) -> int:
+        """Return and reset the number of events dropped since the last call"""
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    async def get(self) -> Event:
+        """Wait for the next event"""
+        while not self.queue:
+            if self.closed:
+                raise SubscriptionClosed()
+            self._ready.clear()
+            await self._ready.wait()
+        self.delivered += 1
+        return self.queue.popleft()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Event:
+        try:
+            return await self.get()
+        except SubscriptionClosed:
+            raise StopAsyncIteration
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self._ready.set()
+            self.bus._remove(self)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "patterns": sorted(self.patterns),
+            "queued": len(self.queue),
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "dropped": self.dropped,
+            "delivered": self.delivered
+        }
+
+
+class EventBus:
+    """
+    Topic-based fan-out hosted by the PluginManager.
+
+    publish() never blocks the producer: each subscriber has its own
+    bounded queue, so one slow client cannot stall a scan or other clients.
+    """
+
+    def __init__(self):
+        self.subscriptions: List[Subscription] = []
+        self.seq = 0
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, patterns: Iterable[str] = (), maxsize: int = 256,
+                  policy: str = "drop_oldest") -> Subscription:
+        """Open a subscription; close() it when done"""
+        subscription = Subscription(self, patterns, maxsize, policy)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def _remove(self, subscription: Subscription) -> None:
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+
+    def publish(self, topic: str, data: Any) -> int:
+        """
+        Deliver an event to every matching subscriber.
+
+        Returns:
+            Number of subscribers that queued the event
+        """
+        self.seq += 1
+        self.published += 1
+        event = Event(topic, data, self.seq)
+        delivered = 0
+        for subscription in list(self.subscriptions):
+            if subscription.matches(topic) and subscription.offer(event):
+                delivered += 1
+        return delivered
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "published": self.published,
+            "dropped": self.dropped,
+            "subscribers": [subscription.stats() for subscription in self.subscriptions]
+        }
+
+    def close(self) -> None:
+        for subscription in list(self.subscriptions):
+            subscription.close()
@@ -0,0 +1,34 @@
+"""
+HTTP Caching - ETags and conditional responses for read-only endpoints
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+
+# Device data changes with every scan: always revalidate, never in shared caches
+DEVICE_CACHE_CONTROL = "private, no-cache"
+
+
+def etag_for(body: bytes) -> str:
+    """Strong ETag derived from the response body"""
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in tags
+
+
+def conditional_response(body: bytes, etag: str, if_none_match: Optional[str],
+                         cache_control: str = DEVICE_CACHE_CONTROL) -> Response:
+    """A JSON response, or a bodiless 304 when the client already has this version"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -7,6 +7,8 @@ from pydantic import BaseModel
 import json
 from pathlib import Path
 
+from .metrics import MetricsRegistry
+
 
 class PluginMetadata(BaseModel):
     """Plugin metadata model"""
@@ -17,6 +19,15 @@ class PluginMetadata(BaseModel):
     endpoints: List[str] = []
     ui_component: Optional[str] = None
     enabled: bool = True
+    # Initialize on first use instead of at startup
+    lazy: bool = False
+    # Seconds initialize() may take, defaults to the manager's limit
+    init_timeout: Optional[float] = None
+    # Run in a separate worker process, with optional limits
+    isolated: bool = False
+    max_concurrency: Optional[int] = None
+    memory_limit_mb: Optional[int] = None
+    settings: Dict[str, Any] = {}
 
 
 class BasePlugin(ABC):
@@ -25,6 +36,9 @@ class BasePlugin(ABC):
     def __init__(self, plugin_dir: Path):
         self.plugin_dir = plugin_dir
         self.metadata = self._load_metadata()
+        # Injected by the PluginManager before initialize()
+        self.event_bus = None
+        self.metrics = MetricsRegistry()
         
     def _load_metadata(self) -> PluginMetadata:
         """Load plugin metadata from plugin.json"""
@@ -52,6 +66,33 @@ class BasePlugin(ABC):
         """Cleanup resources when plugin is disabled"""
         pass
     
+    async def export_state(self) -> Dict[str, Any]:
+        """
+        Return state to carry over when the plugin is hot-reloaded.
+        
+        Called on the running instance after its in-flight calls drained.
+        Use plain data (dicts, lists, strings): the new instance runs freshly
+        imported code, so objects of the old instance's classes do not fit it.
+        """
+        return {}
+    
+    async def import_state(self, state: Dict[str, Any]) -> None:
+        """Take over state from export_state(), called before initialize()"""
+        pass
+    
+    async def resume(self) -> None:
+        """
+        Called on the running instance when a reload failed after its
+        export_state(): restart whatever export_state() stopped.
+        """
+        pass
+    
+    def publish(self, topic: str, data: Any) -> int:
+        """Publish an event as "<plugin name>.<topic>" on the shared event bus"""
+        if self.event_bus is None:
+            return 0
+        return self.event_bus.publish(f"{self.metadata.name}.{topic}", data)
+    
     def get_metadata(self) -> Dict[str, Any]:
         """Return plugin metadata"""
         return self.metadata.model_dump()
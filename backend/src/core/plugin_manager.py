@@ -1,24 +1,84 @@
 """
 Plugin Manager - Handles loading, registration and execution of plugins
 """
+import asyncio
 import importlib.util
+import json
 import sys
+import time
 from pathlib import Path
-from typing import Dict, List, Optional, Type, Any
-from .plugin_base import BasePlugin
+from types import ModuleType
+from typing import Dict, List, Optional, Tuple, Type, Any
+from .event_bus import EventBus
+from .metrics import MetricsRegistry
+from .plugin_base import BasePlugin, PluginMetadata
+from .plugin_process import ProcessPlugin
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _lazy_import(name: str) -> Optional[ModuleType]:
+    """Return a module that is only really imported on first attribute access"""
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+class _CallGate:
+    """Counts a plugin's running calls and holds new ones while it is swapped out"""
+    
+    def __init__(self):
+        self.active = 0
+        self.open = asyncio.Event()
+        self.open.set()
+        self.idle = asyncio.Event()
+        self.idle.set()
+    
+    def enter(self) -> None:
+        self.active += 1
+        self.idle.clear()
+    
+    def leave(self) -> None:
+        self.active -= 1
+        if self.active == 0:
+            self.idle.set()
+
+
 class PluginManager:
     """Manages all plugins in the system"""
     
-    def __init__(self, plugins_dir: Path):
+    def __init__(self, plugins_dir: Path, init_timeout: float = 30.0,
+                 drain_timeout: float = 30.0, metadata_ttl: float = 5.0):
         self.plugins_dir = plugins_dir
         self.plugins: Dict[str, BasePlugin] = {}
         self.plugin_classes: Dict[str, Type[BasePlugin]] = {}
+        # Default limit for a plugin's initialize(), plugin.json can override it
+        self.init_timeout = init_timeout
+        # Lazy plugins that have not been activated yet
+        self.lazy_plugins: Dict[str, PluginMetadata] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._globals: Optional[Dict[str, Any]] = None
+        # Hot reload: in-flight calls, per-plugin locks and the loaded file versions
+        self.drain_timeout = drain_timeout
+        self._calls: Dict[str, _CallGate] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._versions: Dict[str, Tuple[int, ...]] = {}
+        self._watcher: Optional[asyncio.Task] = None
+        # list_plugins() result, reused for metadata_ttl seconds while the plugin set is unchanged
+        self.metadata_ttl = metadata_ttl
+        self._listing: Optional[Tuple[Tuple, float, List[Dict]]] = None
+        # Shared pub/sub channel between plugins and connected clients
+        self.events = EventBus()
+        self.metrics = MetricsRegistry()
+        self._register_metrics()
         
     async def discover_plugins(self) -> List[str]:
         """Discover all available plugins in the plugins directory"""
@@ -36,42 +96,33 @@ class PluginManager:
         
         return discovered
     
-    def _load_plugin_class(self, plugin_name: str) -> Optional[Type[BasePlugin]]:
-        """Dynamically load a plugin class from its module"""
-        plugin_path = self.plugins_dir / plugin_name
-        module_file = plugin_path / f"{plugin_name}_plugin.py"
-        
-        if not module_file.exists():
-            logger.error(f"Plugin module not found: {module_file}")
+    def _read_metadata(self, plugin_name: str) -> Optional[PluginMetadata]:
+        """Read a plugin's plugin.json without loading its code"""
+        try:
+            with open(self.plugins_dir / plugin_name / "plugin.json", 'r') as f:
+                return PluginMetadata(**json.load(f))
+        except Exception as e:
+            logger.error(f"Invalid plugin.json for {plugin_name}: {e}")
             return None
+    
+    def _plugin_globals(self) -> Dict[str, Any]:
+        """
+        Names plugin modules have always been able to use without importing.
         
-        try:
-            # Add src directory to path to enable imports
-            src_dir = self.plugins_dir.parent
-            if str(src_dir) not in sys.path:
-                sys.path.insert(0, str(src_dir))
-            
-            # Read and execute the plugin file
-            with open(module_file, 'r', encoding='utf-8') as f:
-                code = f.read()
-            
-            # Import necessary modules for the plugin
+        Built once and shared. netifaces is loaded lazily, so plugins that
+        never touch it do not pay for importing it.
+        """
+        if self._globals is None:
             import asyncio
-            import socket
-            import netifaces
-            from datetime import datetime
             import platform
-            import subprocess
             import re
+            import socket
+            import subprocess
+            from datetime import datetime
             
-            # Create a namespace for the plugin with all necessary imports
             namespace = {
-                '__file__': str(module_file),
-                '__name__': f"plugins.{plugin_name}",
-                '__builtins__': __builtins__,
                 'asyncio': asyncio,
                 'socket': socket,
-                'netifaces': netifaces,
                 'Path': Path,
                 'Dict': Dict,
                 'Any': Any,
@@ -83,85 +134,445 @@ class PluginManager:
                 're': re,
                 'BasePlugin': BasePlugin,
             }
+            netifaces = sys.modules.get('netifaces') or _lazy_import('netifaces')
+            if netifaces is not None:
+                namespace['netifaces'] = netifaces
+            self._globals = namespace
+        return self._globals
+    
+    def _load_plugin_class(self, plugin_name: str) -> Optional[Type[BasePlugin]]:
+        """Dynamically load a plugin class from its module"""
+        plugin_path = self.plugins_dir / plugin_name
+        module_file = plugin_path / f"{plugin_name}_plugin.py"
+        
+        if not module_file.exists():
+            logger.error(f"Plugin module not found: {module_file}")
+            return None
+        
+        module_name = f"plugins.{plugin_name}.{module_file.stem}"
+        try:
+            # Add src directory to path to enable imports
+            src_dir = self.plugins_dir.parent
+            if str(src_dir) not in sys.path:
+                sys.path.insert(0, str(src_dir))
             
-            # Execute the plugin code
-            exec(code, namespace)
+            # A regular import, so the compiled code is cached in __pycache__
+            spec = importlib.util.spec_from_file_location(module_name, module_file)
+            module = importlib.util.module_from_spec(spec)
+            module.__dict__.update(self._plugin_globals())
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
             
-            # Look for a class that inherits from BasePlugin
-            for name, obj in namespace.items():
-                if (isinstance(obj, type) and 
-                    issubclass(obj, BasePlugin) and 
-                    obj is not BasePlugin):
-                    logger.info(f"Found plugin class: {name}")
-                    return obj
+            # Look for a class defined by the plugin that inherits from BasePlugin
+            candidates = [
+                obj for obj in vars(module).values()
+                if isinstance(obj, type) and issubclass(obj, BasePlugin) and obj is not BasePlugin
+            ]
+            candidates.sort(key=lambda obj: obj.__module__ != module_name)
+            if candidates:
+                logger.info(f"Found plugin class: {candidates[0].__name__}")
+                return candidates[0]
             
             logger.error(f"No valid plugin class found in {module_file}")
             return None
             
         except Exception as e:
+            sys.modules.pop(module_name, None)
             logger.error(f"Error loading plugin {plugin_name}: {e}", exc_info=True)
             return None
     
+    def _plugin_class_for(self, plugin_name: str) -> Optional[Type[BasePlugin]]:
+        """The class to instantiate: the plugin's own, or a proxy for isolated plugins"""
+        metadata = self._read_metadata(plugin_name)
+        if metadata is not None and metadata.isolated:
+            # The plugin's code is only imported in its worker process
+            return ProcessPlugin
+        return self._load_plugin_class(plugin_name)
+    
     async def load_plugin(self, plugin_name: str) -> bool:
-        """Load and initialize a specific plugin"""
+        """
+        Load and initialize a specific plugin.
+        
+        Concurrent calls for the same plugin share a single load.
+        """
         if plugin_name in self.plugins:
             logger.warning(f"Plugin {plugin_name} already loaded")
             return True
         
-        plugin_class = self._load_plugin_class(plugin_name)
+        task = self._loading.get(plugin_name)
+        if task is None:
+            task = asyncio.ensure_future(self._load_plugin(plugin_name))
+            self._loading[plugin_name] = task
+            task.add_done_callback(lambda _: self._loading.pop(plugin_name, None))
+        return await asyncio.shield(task)
+    
+    async def _load_plugin(self, plugin_name: str) -> bool:
+        started = time.perf_counter()
+        # Importing may compile the module, keep that off the event loop
+        plugin_class = await asyncio.to_thread(self._plugin_class_for, plugin_name)
         if not plugin_class:
             return False
         
+        plugin_instance = await self._start_instance(plugin_name, plugin_class)
+        if plugin_instance is None:
+            return False
+        
+        self.plugins[plugin_name] = plugin_instance
+        self.plugin_classes[plugin_name] = plugin_class
+        self.lazy_plugins.pop(plugin_name, None)
+        self._versions[plugin_name] = self._source_version(plugin_name)
+        self._load_seconds.observe(time.perf_counter() - started, plugin=plugin_name)
+        logger.info(
+            f"Successfully loaded plugin: {plugin_name} "
+            f"({time.perf_counter() - started:.2f}s)"
+        )
+        self.events.publish("plugins.loaded", {"name": plugin_name})
+        return True
+    
+    async def _start_instance(self, plugin_name: str, plugin_class: Type[BasePlugin],
+                              state: Optional[Dict[str, Any]] = None) -> Optional[BasePlugin]:
+        """
+        Create and initialize a plugin instance, handing it migrated state first.
+        
+        Returns None (after cleaning up) if initialize() fails, raises or
+        exceeds the plugin's init timeout.
+        """
+        plugin_instance = None
+        timeout = self.init_timeout
         try:
             plugin_path = self.plugins_dir / plugin_name
             plugin_instance = plugin_class(plugin_path)
+            plugin_instance.event_bus = self.events
+            plugin_instance.metrics = self.metrics
+            timeout = plugin_instance.metadata.init_timeout or self.init_timeout
+            if state:
+                await plugin_instance.import_state(state)
             
             # Initialize the plugin
-            if await plugin_instance.initialize():
-                self.plugins[plugin_name] = plugin_instance
-                self.plugin_classes[plugin_name] = plugin_class
-                logger.info(f"Successfully loaded plugin: {plugin_name}")
-                return True
-            else:
-                logger.error(f"Plugin {plugin_name} initialization failed")
-                return False
+            if await asyncio.wait_for(plugin_instance.initialize(), timeout):
+                return plugin_instance
+            logger.error(f"Plugin {plugin_name} initialization failed")
                 
+        except asyncio.TimeoutError:
+            logger.error(f"Plugin {plugin_name} did not initialize within {timeout}s")
         except Exception as e:
             logger.error(f"Error initializing plugin {plugin_name}: {e}")
-            return False
+        
+        if plugin_instance is not None:
+            # Release whatever a failed initialize() managed to start
+            try:
+                await plugin_instance.cleanup()
+            except Exception as e:
+                logger.error(f"Error cleaning up plugin {plugin_name}: {e}")
+        return None
     
     async def load_all_plugins(self) -> None:
-        """Discover and load all available plugins"""
+        """
+        Discover all available plugins and initialize them concurrently.
+        
+        Plugins with "lazy": true in plugin.json are only registered here and
+        initialized by activate() the first time they are used.
+        """
         discovered = await self.discover_plugins()
+        eager = []
         for plugin_name in discovered:
+            metadata = self._read_metadata(plugin_name)
+            if metadata is None or not metadata.enabled:
+                continue
+            if metadata.lazy:
+                self.lazy_plugins[plugin_name] = metadata
+                logger.info(f"Deferring lazy plugin: {plugin_name}")
+            else:
+                eager.append(plugin_name)
+        
+        await asyncio.gather(*(self.load_plugin(plugin_name) for plugin_name in eager))
+    
+    async def activate(self, plugin_name: str) -> Optional[BasePlugin]:
+        """Get a plugin, initializing it first if it is a lazy plugin not yet in use"""
+        plugin = self.plugins.get(plugin_name)
+        if plugin is None and plugin_name in self.lazy_plugins:
             await self.load_plugin(plugin_name)
+            plugin = self.plugins.get(plugin_name)
+        return plugin
+    
+    async def execute(self, plugin_name: str, **kwargs) -> Dict[str, Any]:
+        """
+        Run a plugin's execute(), activating it if needed.
+        
+        Calls wait while the plugin is being reloaded or unloaded and are
+        counted, so a reload can let the running ones finish first.
+        
+        Raises:
+            LookupError: If the plugin is not loaded
+        """
+        calls = self._calls_for(plugin_name)
+        while not calls.open.is_set():
+            await calls.open.wait()
+        calls.enter()
+        try:
+            plugin = await self.activate(plugin_name)
+            if plugin is None:
+                raise LookupError(f"Plugin {plugin_name} not loaded")
+            started = time.perf_counter()
+            status = "exception"
+            try:
+                result = await plugin.execute(**kwargs)
+                status = result.get("status", "success") if isinstance(result, dict) else "success"
+                return result
+            finally:
+                self._execute_seconds.observe(
+                    time.perf_counter() - started,
+                    plugin=plugin_name, action=kwargs.get("action", ""), status=status
+                )
+        finally:
+            calls.leave()
+    
+    def _register_metrics(self) -> None:
+        self._execute_seconds = self.metrics.histogram(
+            "redsec_plugin_execute_duration_seconds",
+            "Duration of plugin execute() calls",
+            ("plugin", "action", "status")
+        )
+        self._load_seconds = self.metrics.histogram(
+            "redsec_plugin_load_duration_seconds",
+            "Time to import and initialize a plugin",
+            ("plugin",)
+        )
+        self.metrics.gauge(
+            "redsec_plugin_calls_in_flight",
+            "Plugin execute() calls currently running",
+            ("plugin",),
+            collect=lambda: {(name,): calls.active for name, calls in self._calls.items()}
+        )
+        self.metrics.gauge(
+            "redsec_plugins_loaded",
+            "Plugins currently loaded",
+            collect=lambda: len(self.plugins)
+        )
+        self.metrics.gauge(
+            "redsec_event_subscribers",
+            "Open event bus subscriptions",
+            collect=lambda: len(self.events.subscriptions)
+        )
+        self.metrics.gauge(
+            "redsec_event_queue_depth",
+            "Events waiting in all subscriber queues",
+            collect=lambda: sum(len(sub.queue) for sub in self.events.subscriptions)
+        )
+        self.metrics.counter(
+            "redsec_events_published_total",
+            "Events published on the event bus",
+            collect=lambda: self.events.published
+        )
+        self.metrics.counter(
+            "redsec_events_dropped_total",
+            "Events dropped because a subscriber queue was full",
+            collect=lambda: self.events.dropped
+        )
+    
+    async def render_metrics(self) -> str:
+        """Prometheus text for the API process and every isolated plugin's worker"""
+        parts = [self.metrics.render()]
+        for plugin_name, plugin in list(self.plugins.items()):
+            if isinstance(plugin, ProcessPlugin):
+                try:
+                    parts.append(await plugin.render_metrics())
+                except Exception as e:
+                    logger.warning(f"Could not collect metrics from {plugin_name}: {e}")
+        return "".join(parts)
+    
+    def _calls_for(self, plugin_name: str) -> _CallGate:
+        if plugin_name not in self._calls:
+            self._calls[plugin_name] = _CallGate()
+        return self._calls[plugin_name]
+    
+    async def _drain(self, plugin_name: str) -> _CallGate:
+        """Hold new calls to a plugin and wait (up to drain_timeout) for running ones"""
+        calls = self._calls_for(plugin_name)
+        calls.open.clear()
+        try:
+            await asyncio.wait_for(calls.idle.wait(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"{calls.active} call(s) to {plugin_name} still running "
+                f"after {self.drain_timeout}s, continuing anyway"
+            )
+        return calls
+    
+    async def reload_plugin(self, plugin_name: str) -> bool:
+        """
+        Replace a loaded plugin with a fresh instance of its current code.
+        
+        New calls are held and running ones drained, the old instance's
+        export_state() is handed to the new one's import_state(), and the new
+        instance is initialized while the old one is still in place. If the
+        code fails to load or initialize, the old instance and modules stay
+        active, its resume() is called, and False is returned.
+        """
+        old = self.plugins.get(plugin_name)
+        if old is None:
+            logger.warning(f"Plugin {plugin_name} not loaded")
+            return False
+        
+        async with self._lock_for(plugin_name):
+            old = self.plugins[plugin_name]
+            version = self._source_version(plugin_name)
+            calls = await self._drain(plugin_name)
+            modules = self._take_modules(plugin_name)
+            new = None
+            exported = False
+            try:
+                try:
+                    plugin_class = await asyncio.to_thread(self._plugin_class_for, plugin_name)
+                    if plugin_class:
+                        state = await old.export_state()
+                        exported = True
+                        new = await self._start_instance(plugin_name, plugin_class, state)
+                except Exception as e:
+                    logger.error(f"Error reloading plugin {plugin_name}: {e}")
+                
+                if new is None:
+                    # Roll back to the code that is still running
+                    self._take_modules(plugin_name)
+                    sys.modules.update(modules)
+                    if exported:
+                        try:
+                            await old.resume()
+                        except Exception as e:
+                            logger.error(f"Error resuming plugin {plugin_name}: {e}")
+                    logger.error(f"Reload of {plugin_name} failed, keeping the running version")
+                    self.events.publish("plugins.reload_failed", {"name": plugin_name})
+                    return False
+                
+                self.plugins[plugin_name] = new
+                self.plugin_classes[plugin_name] = plugin_class
+            finally:
+                self._versions[plugin_name] = version
+                calls.open.set()
+            
+            try:
+                await old.cleanup()
+            except Exception as e:
+                logger.error(f"Error cleaning up replaced plugin {plugin_name}: {e}")
+            logger.info(f"Reloaded plugin: {plugin_name}")
+            self.events.publish("plugins.reloaded", {"name": plugin_name})
+            return True
+    
+    def _lock_for(self, plugin_name: str) -> asyncio.Lock:
+        if plugin_name not in self._locks:
+            self._locks[plugin_name] = asyncio.Lock()
+        return self._locks[plugin_name]
+    
+    def _take_modules(self, plugin_name: str) -> Dict[str, ModuleType]:
+        """Remove a plugin's modules from sys.modules so they are imported afresh"""
+        prefix = f"plugins.{plugin_name}."
+        return {
+            name: sys.modules.pop(name)
+            for name in [name for name in sys.modules if name.startswith(prefix)]
+        }
+    
+    def _source_version(self, plugin_name: str) -> Tuple[int, ...]:
+        """Modification times of a plugin's plugin.json and Python files"""
+        plugin_path = self.plugins_dir / plugin_name
+        files = [plugin_path / "plugin.json", *plugin_path.rglob("*.py")]
+        return tuple(sorted(
+            path.stat().st_mtime_ns for path in files
+            if path.exists() and "__pycache__" not in path.parts
+        ))
+    
+    async def watch(self, interval: float = 2.0) -> None:
+        """
+        Reload loaded plugins whose files changed.
+        
+        A change is acted on once the files have stayed the same for one more
+        interval, so a save that touches several files triggers one reload.
+        """
+        pending: Dict[str, Tuple[int, ...]] = {}
+        while True:
+            await asyncio.sleep(interval)
+            for plugin_name in list(self.plugins):
+                try:
+                    version = await asyncio.to_thread(self._source_version, plugin_name)
+                except OSError:
+                    continue
+                if version == self._versions.get(plugin_name):
+                    pending.pop(plugin_name, None)
+                elif pending.get(plugin_name) != version:
+                    pending[plugin_name] = version
+                else:
+                    del pending[plugin_name]
+                    logger.info(f"Plugin {plugin_name} changed on disk, reloading")
+                    await self.reload_plugin(plugin_name)
+    
+    def start_watching(self, interval: float = 2.0) -> None:
+        """Start watching the plugins directory for changes"""
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self.watch(interval))
+    
+    async def stop_watching(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
     
     def get_plugin(self, plugin_name: str) -> Optional[BasePlugin]:
         """Get a loaded plugin by name"""
         return self.plugins.get(plugin_name)
     
     def list_plugins(self) -> List[Dict]:
-        """List all loaded plugins with their metadata"""
-        return [
+        """
+        List all loaded plugins and not yet activated lazy ones, with their metadata.
+        
+        The listing is memoized for metadata_ttl seconds; loading, unloading
+        or reloading a plugin invalidates it at once. Callers must not
+        modify the returned list, it is shared until then.
+        """
+        key = (
+            tuple(self.plugins.items()),
+            tuple(self.lazy_plugins)
+        )
+        now = time.monotonic()
+        if self._listing is not None:
+            cached_key, expires, listing = self._listing
+            if cached_key == key and now < expires:
+                return listing
+        
+        listing = [
             {
                 "name": name,
+                "active": True,
                 "metadata": plugin.get_metadata()
             }
             for name, plugin in self.plugins.items()
+        ] + [
+            {
+                "name": name,
+                "active": False,
+                "metadata": metadata.model_dump()
+            }
+            for name, metadata in self.lazy_plugins.items()
         ]
+        self._listing = (key, now + self.metadata_ttl, listing)
+        return listing
     
     async def unload_plugin(self, plugin_name: str) -> bool:
-        """Unload a plugin and cleanup its resources"""
+        """Unload a plugin, after draining running calls, and cleanup its resources"""
         plugin = self.plugins.get(plugin_name)
         if not plugin:
             logger.warning(f"Plugin {plugin_name} not loaded")
             return False
         
-        try:
-            await plugin.cleanup()
-            del self.plugins[plugin_name]
-            logger.info(f"Unloaded plugin: {plugin_name}")
-            return True
-        except Exception as e:
-            logger.error(f"Error unloading plugin {plugin_name}: {e}")
-            return False
+        async with self._lock_for(plugin_name):
+            calls = await self._drain(plugin_name)
+            try:
+                plugin = self.plugins.pop(plugin_name)
+                self._versions.pop(plugin_name, None)
+                await plugin.cleanup()
+                logger.info(f"Unloaded plugin: {plugin_name}")
+                self.events.publish("plugins.unloaded", {"name": plugin_name})
+                return True
+            except Exception as e:
+                logger.error(f"Error unloading plugin {plugin_name}: {e}")
+                return False
+            finally:
+                calls.open.set()
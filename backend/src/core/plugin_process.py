@@ -0,0 +1,432 @@
+"""
+Plugin Processes - Run a plugin in its own worker process behind an RPC proxy
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import pickle
+import sys
+import threading
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from .plugin_base import BasePlugin
+
+logger = logging.getLogger(__name__)
+
+# Failed restarts in a row after which a crashed worker is given up on
+MAX_RESTARTS = 5
+
+
+class RemoteStream:
+    """Stands in for an async iterator in a result; its items follow as separate messages"""
+
+    __slots__ = ("id",)
+
+    def __init__(self, stream_id: int):
+        self.id = stream_id
+
+
+class RemoteError(Exception):
+    """An exception raised by the plugin inside its worker process"""
+
+
+class PluginUnavailable(Exception):
+    """The plugin's worker process is down and did not come back in time"""
+
+
+def _receive(conn: Connection, on_message: Callable[[tuple], None], name: str) -> asyncio.Future:
+    """
+    Read messages from conn in a dedicated thread and hand them to the loop.
+
+    The returned future is done once the pipe is closed. A thread of its
+    own, as a recv() that blocks for the pipe's lifetime would hold a
+    default executor thread for good.
+    """
+    loop = asyncio.get_running_loop()
+    closed = loop.create_future()
+
+    def finish() -> None:
+        if not closed.done():
+            closed.set_result(None)
+
+    def run() -> None:
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    break
+                loop.call_soon_threadsafe(on_message, message)
+            loop.call_soon_threadsafe(finish)
+        except RuntimeError:
+            # The event loop is already closed
+            pass
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return closed
+
+
+class _EventForwarder:
+    """The worker's event_bus: publishes go to the API process's bus"""
+
+    def __init__(self, send):
+        self._send = send
+
+    def publish(self, topic: str, data: Any) -> int:
+        self._send(("event", topic, data))
+        return 0
+
+
+class _Worker:
+    """Serves RPC calls for one plugin inside the worker process"""
+
+    def __init__(self, conn: Connection, plugin_dir: Path):
+        self.conn = conn
+        self.plugin_dir = plugin_dir
+        self.plugin: Optional[BasePlugin] = None
+        self.streams: Dict[int, asyncio.Task] = {}
+        self._stream_ids = itertools.count(1)
+
+    def send(self, message: tuple) -> None:
+        self.conn.send(message)
+
+    async def run(self) -> None:
+        from .plugin_manager import PluginManager
+
+        plugin_class = PluginManager(self.plugin_dir.parent)._load_plugin_class(self.plugin_dir.name)
+        if plugin_class is None:
+            raise RuntimeError(f"Could not load plugin {self.plugin_dir.name}")
+        self.plugin = plugin_class(self.plugin_dir)
+        self.plugin.event_bus = _EventForwarder(self.send)
+
+        tasks = set()
+        stopped = asyncio.get_running_loop().create_future()
+
+        def handle(message: tuple) -> None:
+            kind = message[0]
+            if kind == "call":
+                task = asyncio.create_task(self._call(*message[1:]))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            elif kind == "close":
+                task = self.streams.pop(message[1], None)
+                if task:
+                    task.cancel()
+            elif kind == "stop" and not stopped.done():
+                stopped.set_result(None)
+
+        closed = _receive(self.conn, handle, "plugin-rpc")
+        await asyncio.wait([closed, stopped], return_when=asyncio.FIRST_COMPLETED)
+
+    async def _call(self, call_id: int, method: str, args: tuple, kwargs: Dict[str, Any]) -> None:
+        try:
+            if method == "metrics":
+                result = self.plugin.metrics.render()
+            else:
+                result = await getattr(self.plugin, method)(*args, **kwargs)
+            if isinstance(result, dict):
+                result = {key: self._stream(value) for key, value in result.items()}
+            message = ("result", call_id, True, result)
+        except Exception as e:
+            message = ("result", call_id, False, RemoteError(f"{type(e).__name__}: {e}"))
+        try:
+            self.send(message)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            # Pickling fails before anything is written, so the pipe is still usable
+            self.send(("result", call_id, False, RemoteError(f"Unpicklable result: {e}")))
+
+    def _stream(self, value: Any) -> Any:
+        """Replace an async iterator with a RemoteStream and start sending its items"""
+        if not hasattr(value, "__anext__"):
+            return value
+        stream_id = next(self._stream_ids)
+        self.streams[stream_id] = asyncio.create_task(self._pump(stream_id, value))
+        return RemoteStream(stream_id)
+
+    async def _pump(self, stream_id: int, iterator: AsyncIterator[Any]) -> None:
+        error = None
+        try:
+            async for item in iterator:
+                self.send(("item", stream_id, item))
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            self.streams.pop(stream_id, None)
+        self.send(("end", stream_id, error))
+
+
+def serve(conn: Connection, plugin_dir: str, memory_limit_mb: Optional[int] = None) -> None:
+    """Worker process entry point"""
+    if memory_limit_mb:
+        try:
+            import resource
+
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError) as e:
+            print(f"⚠️  Could not limit plugin memory: {e}")
+    src_dir = str(Path(plugin_dir).parent.parent)
+    if src_dir not in sys.path:
+        sys.path.insert(0, src_dir)
+    try:
+        asyncio.run(_Worker(conn, Path(plugin_dir)).run())
+    except KeyboardInterrupt:
+        pass
+
+
+class ProcessPlugin(BasePlugin):
+    """
+    Proxy for a plugin that runs in a separate worker process.
+
+    Selected with "isolated": true in plugin.json. Calls are sent over a
+    pipe and results (which must be picklable) sent back; async iterators
+    in a result dict, such as event streams, are relayed item by item.
+    At most max_concurrency calls run at once, memory_limit_mb caps the
+    worker's address space, and a worker that dies is restarted with
+    backoff, up to MAX_RESTARTS failed attempts in a row. Calls wait up to
+    ready_timeout for a restarting worker, then raise PluginUnavailable.
+    State lives in the worker, so a restart starts it fresh.
+    """
+
+    def __init__(self, plugin_dir: Path):
+        super().__init__(plugin_dir)
+        self.max_concurrency = self.metadata.max_concurrency
+        self.memory_limit_mb = self.metadata.memory_limit_mb
+        self.restarts = 0
+        # Set once restarting was given up on; a reload starts a new worker
+        self.failed = False
+        self.ready_timeout = self.metadata.init_timeout or 30.0
+        self._slots = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+        self._process: Optional[multiprocessing.Process] = None
+        self._conn: Optional[Connection] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._restarter: Optional[asyncio.Task] = None
+        self._calls: Dict[int, asyncio.Future] = {}
+        self._streams: Dict[int, asyncio.Queue] = {}
+        self._call_ids = itertools.count(1)
+        self._state: Optional[Dict[str, Any]] = None
+        self._ready = asyncio.Event()
+        self._closing = False
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self._process else None
+
+    async def _spawn(self) -> bool:
+        """Start a worker process and initialize the plugin in it"""
+        context = multiprocessing.get_context("spawn")
+        parent, child = context.Pipe()
+        self._process = context.Process(
+            target=serve,
+            args=(child, str(self.plugin_dir), self.memory_limit_mb),
+            name=f"plugin-{self.metadata.name}"
+        )
+        await asyncio.to_thread(self._process.start)
+        child.close()
+        self._conn = parent
+        self._reader = asyncio.create_task(self._read(parent))
+
+        if self._state:
+            await self._call("import_state", self._state)
+            self._state = None
+        ok = await self._call("initialize")
+        if ok:
+            self._ready.set()
+            logger.info(f"Plugin {self.metadata.name} running in process {self.pid}")
+        return bool(ok)
+
+    async def _read(self, conn: Connection) -> None:
+        await _receive(conn, self._dispatch, f"plugin-{self.metadata.name}-rpc")
+
+        # The worker exited: fail what was waiting on it
+        was_running = self._ready.is_set()
+        self._ready.clear()
+        for future in self._calls.values():
+            if not future.done():
+                future.set_exception(RemoteError(f"Plugin process {self.metadata.name} exited"))
+        self._calls.clear()
+        for queue in self._streams.values():
+            queue.put_nowait(("end", "Plugin process exited"))
+        self._streams.clear()
+        if was_running and not self._closing:
+            self._restarter = asyncio.create_task(self._restart())
+
+    def _dispatch(self, message: tuple) -> None:
+        kind = message[0]
+        if kind == "result":
+            _, call_id, ok, value = message
+            future = self._calls.pop(call_id, None)
+            if ok and isinstance(value, dict):
+                # Register streams now, so items that follow have somewhere to go
+                value = {key: self._follow(item) for key, item in value.items()}
+            if future and not future.done():
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+        elif kind in ("item", "end"):
+            queue = self._streams.get(message[1])
+            if queue:
+                queue.put_nowait((kind, message[2]))
+                if kind == "end":
+                    del self._streams[message[1]]
+        elif kind == "event" and self.event_bus is not None:
+            self.event_bus.publish(message[1], message[2])
+
+    def _follow(self, value: Any) -> Any:
+        """Turn a RemoteStream into a local async iterator"""
+        if not isinstance(value, RemoteStream):
+            return value
+        queue: asyncio.Queue = asyncio.Queue()
+        self._streams[value.id] = queue
+
+        async def items() -> AsyncIterator[Any]:
+            finished = False
+            try:
+                while True:
+                    kind, payload = await queue.get()
+                    if kind == "end":
+                        finished = True
+                        if payload:
+                            raise RemoteError(payload)
+                        return
+                    yield payload
+            finally:
+                if not finished:
+                    # The consumer went away: stop the stream in the worker
+                    self._streams.pop(value.id, None)
+                    self._send(("close", value.id))
+
+        return items()
+
+    def _send(self, message: tuple) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.send(message)
+            except (OSError, ValueError):
+                pass
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        call_id = next(self._call_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._calls[call_id] = future
+        try:
+            self._conn.send(("call", call_id, method, args, kwargs))
+        except (OSError, ValueError) as e:
+            self._calls.pop(call_id, None)
+            raise RemoteError(f"Plugin process {self.metadata.name} unavailable: {e}")
+        return await future
+
+    async def _restart(self) -> None:
+        """Respawn a crashed worker, backing off between failed attempts"""
+        await self._stop_process()
+        delay = 0.5
+        for _ in range(MAX_RESTARTS):
+            if self._closing:
+                return
+            self.restarts += 1
+            logger.warning(f"Restarting plugin process {self.metadata.name} (restart {self.restarts})")
+            try:
+                if await asyncio.wait_for(self._spawn(), self.ready_timeout):
+                    return
+            except Exception as e:
+                logger.error(f"Plugin process {self.metadata.name} failed to start: {e}")
+            await self._stop_process()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+        self.failed = True
+        logger.error(
+            f"Plugin process {self.metadata.name} did not come back after {MAX_RESTARTS} attempts, "
+            f"giving up; reload the plugin to try again"
+        )
+
+    async def _stop_process(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._process is not None:
+            process, self._process = self._process, None
+            await asyncio.to_thread(process.join, 5)
+            if process.is_alive():
+                process.kill()
+                await asyncio.to_thread(process.join)
+        if self._reader is not None and self._reader is not asyncio.current_task():
+            await asyncio.gather(self._reader, return_exceptions=True)
+        self._reader = None
+
+    async def initialize(self) -> bool:
+        return await self._spawn()
+
+    async def _wait_ready(self) -> None:
+        """Wait for a (re)starting worker, raise PluginUnavailable when it does not come up"""
+        if self._ready.is_set():
+            return
+        if self.failed:
+            raise PluginUnavailable(f"Plugin process {self.metadata.name} failed and was not restarted")
+        try:
+            await asyncio.wait_for(self._ready.wait(), self.ready_timeout)
+        except asyncio.TimeoutError:
+            raise PluginUnavailable(
+                f"Plugin process {self.metadata.name} not running after {self.ready_timeout:g}s"
+            )
+
+    async def execute(self, **kwargs) -> Dict[str, Any]:
+        await self._wait_ready()
+        if self._slots is None:
+            return await self._call("execute", **kwargs)
+        async with self._slots:
+            return await self._call("execute", **kwargs)
+
+    async def export_state(self) -> Dict[str, Any]:
+        try:
+            await self._wait_ready()
+        except PluginUnavailable as e:
+            # Nothing to hand over, the state died with the worker
+            logger.warning(f"{e}; the reloaded plugin starts without its state")
+            return {}
+        return await self._call("export_state")
+
+    async def render_metrics(self) -> str:
+        """The worker's own metrics, in Prometheus text format"""
+        if not self._ready.is_set():
+            return ""
+        return await self._call("metrics")
+
+    async def import_state(self, state: Dict[str, Any]) -> None:
+        # Handed to the worker once it is started
+        self._state = state
+
+    async def resume(self) -> None:
+        if self._ready.is_set():
+            await self._call("resume")
+
+    async def cleanup(self) -> None:
+        self._closing = True
+        self._ready.clear()
+        if self._restarter is not None and self._restarter is not asyncio.current_task():
+            self._restarter.cancel()
+            await asyncio.gather(self._restarter, return_exceptions=True)
+        if self._conn is not None:
+            try:
+                await asyncio.wait_for(self._call("cleanup"), 30)
+            except Exception as e:
+                logger.error(f"Error cleaning up plugin process {self.metadata.name}: {e}")
+            self._send(("stop",))
+        await self._stop_process()
+
+    def get_metadata(self) -> Dict[str, Any]:
+        return {
+            **super().get_metadata(),
+            "process": {
+                "pid": self.pid,
+                "alive": self._process is not None and self._process.is_alive(),
+                "restarts": self.restarts,
+                "failed": self.failed,
+                "active_calls": len(self._calls)
+            }
+        }
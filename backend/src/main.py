@@ -5,6 +5,8 @@ import os
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from .core.compression import CompressionMiddleware
+from .core.metrics import RequestMetrics
 from .core.plugin_manager import PluginManager
 from .api import routes
 
@@ -24,11 +26,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for responses over COMPRESSION_MIN_SIZE bytes (0 disables)
+compression_min_size = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+if compression_min_size > 0:
+    app.add_middleware(CompressionMiddleware, minimum_size=compression_min_size)
+
 # Initialize plugin manager
 BASE_DIR = Path(__file__).parent
 PLUGINS_DIR = BASE_DIR / "plugins"
 plugin_manager = PluginManager(PLUGINS_DIR)
 
+# Request latency histograms, served with the other metrics at /api/metrics
+app.add_middleware(RequestMetrics, registry=plugin_manager.metrics)
+
 # Inject plugin manager into routes
 routes.plugin_manager = plugin_manager
 
@@ -42,12 +52,17 @@ async def startup_event():
     print("🚀 Starting RedSec Dashboard...")
     await plugin_manager.load_all_plugins()
     print(f"✅ Loaded {len(plugin_manager.plugins)} plugin(s)")
+    # Hot-reload plugins when their files change (0 disables)
+    watch_interval = float(os.environ.get("PLUGIN_WATCH_INTERVAL", "2"))
+    if watch_interval > 0:
+        plugin_manager.start_watching(watch_interval)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     print("🛑 Shutting down RedSec Dashboard...")
+    await plugin_manager.stop_watching()
     for plugin_name in list(plugin_manager.plugins.keys()):
         await plugin_manager.unload_plugin(plugin_name)
 
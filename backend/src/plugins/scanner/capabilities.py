@@ -0,0 +1,151 @@
+"""
+Capabilities - What this host lets the scanner do, detected once and cached
+
+Raw-socket privileges, the nmap build and whether it may SYN scan, and the
+ping and ARP tools the built-in probes rely on. Detection launches a few
+short processes, so the plugin runs it at startup and on demand only.
+"""
+import asyncio
+import os
+import platform
+import re
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from plugins.scanner.neighbors import PROC_ARP
+from plugins.scanner.nmap_xml import NmapError, stream_hosts
+
+# Bits of the Linux effective capability set (CapEff in /proc/self/status)
+CAP_NET_ADMIN = 12
+CAP_NET_RAW = 13
+
+NMAP_VERSION = re.compile(r"Nmap version (\S+)")
+
+
+def _linux_capabilities() -> Optional[int]:
+    """The process's effective capability mask, None when unavailable"""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("CapEff:"):
+                return int(line.split()[1], 16)
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def detect_privileges() -> Dict[str, Any]:
+    """Whether the process may open raw sockets: root/Administrator or CAP_NET_RAW"""
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            admin = bool(ctypes.windll.shell32.IsUserAnAdmin())
+        except (AttributeError, OSError):
+            admin = False
+        return {"admin": admin, "net_raw": admin, "net_admin": admin, "raw_sockets": admin}
+
+    root = os.geteuid() == 0
+    mask = _linux_capabilities() if sys.platform.startswith("linux") else None
+    net_raw = root or bool(mask is not None and mask >> CAP_NET_RAW & 1)
+    net_admin = root or bool(mask is not None and mask >> CAP_NET_ADMIN & 1)
+    return {"admin": root, "net_raw": net_raw, "net_admin": net_admin, "raw_sockets": net_raw}
+
+
+async def _run(*command: str, timeout: float = 10.0) -> Tuple[Optional[int], str]:
+    """Run a short command and return its exit status and output, (None, "") if it would not run"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+    except OSError:
+        return None, ""
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+        return None, ""
+    return process.returncode, stdout.decode(errors="replace")
+
+
+def parse_nmap_version(text: str) -> Tuple[str, List[str]]:
+    """Version and "Compiled with" features from `nmap --version`"""
+    match = NMAP_VERSION.search(text)
+    features: List[str] = []
+    for line in text.splitlines():
+        if line.startswith("Compiled with:"):
+            features = line.split(":", 1)[1].split()
+    return (match.group(1) if match else ""), features
+
+
+async def detect_nmap(binary: str = "nmap", timeout: float = 30.0) -> Dict[str, Any]:
+    """
+    Find nmap and check what it may do here.
+
+    SYN scanning is tested for real against localhost, as privileges alone
+    do not tell (NMAP_PRIVILEGED, Npcap, file capabilities on the binary).
+    OS detection needs the same raw access.
+    """
+    info: Dict[str, Any] = {
+        "binary": binary, "path": shutil.which(binary), "version": "", "features": [],
+        "syn_scan": False, "os_detection": False, "error": ""
+    }
+    if info["path"] is None:
+        info["error"] = f"{binary} not found"
+        return info
+
+    returncode, output = await _run(info["path"], "--version")
+    if returncode != 0:
+        info["error"] = output.strip().splitlines()[-1] if output.strip() else "nmap --version failed"
+        return info
+    info["version"], info["features"] = parse_nmap_version(output)
+
+    async def syn_probe() -> None:
+        probe = stream_hosts(["127.0.0.1"], ["-sS", "-p", "80", "-n"], binary=info["path"])
+        try:
+            async for _ in probe:
+                pass
+        finally:
+            await probe.aclose()
+
+    try:
+        await asyncio.wait_for(syn_probe(), timeout)
+        info["syn_scan"] = info["os_detection"] = True
+    except NmapError as e:
+        info["error"] = str(e)
+    except asyncio.TimeoutError:
+        info["error"] = f"SYN scan test did not finish in {timeout:g}s"
+    return info
+
+
+async def detect_capabilities(nmap_binary: str = "nmap") -> Dict[str, Any]:
+    """Build the capability profile; never raises, missing tools show up as None/False"""
+    ping = shutil.which("ping")
+    if PROC_ARP.exists():
+        neighbor_table = str(PROC_ARP)
+    else:
+        neighbor_table = shutil.which("arp")
+    nmap = await detect_nmap(nmap_binary)
+    # Backends a scan can use at all
+    backends = []
+    if ping:
+        backends.append("async")
+    if nmap["version"]:
+        backends.append("nmap")
+    return {
+        "detected_at": datetime.now().isoformat(),
+        "platform": platform.system().lower(),
+        "privileges": detect_privileges(),
+        "nmap": nmap,
+        "ping": ping,
+        "neighbor_table": neighbor_table,
+        "backends": backends,
+    }
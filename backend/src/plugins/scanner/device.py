@@ -0,0 +1,214 @@
+"""
+Device Model - Compact fixed-schema representation of a discovered host
+"""
+import socket
+import sys
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from plugins.scanner.oui import mac_to_int
+
+
+def _ip_to_int(ip: str) -> int:
+    return int.from_bytes(socket.inet_aton(ip), "big")
+
+
+def _int_to_ip(value: int) -> str:
+    return socket.inet_ntoa(value.to_bytes(4, "big"))
+
+
+def _int_to_mac(value: Optional[int]) -> str:
+    if value is None:
+        return ""
+    raw = f"{value:012X}"
+    return ":".join(raw[i:i + 2] for i in range(0, 12, 2))
+
+
+def _ts(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+class Device:
+    """
+    Represents a network device.
+
+    Uses __slots__ and packed storage to keep per-device overhead small on
+    large inventories: the IPv4 address and MAC are stored as integers,
+    timestamps as epoch seconds and ports as an unsigned 16-bit array.
+    The public attributes (ip, mac, first_seen, ...) are properties that
+    convert on access, so callers see the usual str/datetime/list values.
+    """
+    __slots__ = (
+        "ip_int", "mac_int", "hostname", "vendor", "status", "os_info",
+        "first_seen_ts", "last_seen_ts", "fingerprinted_ts", "_ports",
+    )
+
+    TRACKED_FIELDS = ("mac", "hostname", "vendor", "os_info", "ports", "status")
+
+    def __init__(self, ip: str, mac: str = "", hostname: str = "",
+                 vendor: str = "", status: str = "active", os_info: str = "",
+                 first_seen: Optional[datetime] = None,
+                 last_seen: Optional[datetime] = None,
+                 fingerprinted_at: Optional[datetime] = None):
+        now = datetime.now().timestamp()
+        self.ip_int = _ip_to_int(ip)
+        self.mac = mac
+        self.hostname = hostname
+        # Vendor/status/OS strings repeat across thousands of devices; share them
+        self.vendor = sys.intern(vendor)
+        self.status = sys.intern(status)
+        self.os_info = sys.intern(os_info)
+        self.first_seen_ts = _ts(first_seen) or now
+        self.last_seen_ts = _ts(last_seen) or now
+        # When hostname/vendor/ports/OS were last probed (None = never)
+        self.fingerprinted_ts = _ts(fingerprinted_at)
+        self._ports = array("H")
+
+    @property
+    def ip(self) -> str:
+        return _int_to_ip(self.ip_int)
+
+    @property
+    def mac(self) -> str:
+        return _int_to_mac(self.mac_int)
+
+    @mac.setter
+    def mac(self, value: str) -> None:
+        self.mac_int = mac_to_int(value) if value else None
+
+    @property
+    def ports(self) -> List[int]:
+        return self._ports.tolist()
+
+    @ports.setter
+    def ports(self, value: Iterable[int]) -> None:
+        self._ports = array("H", sorted(set(value)))
+
+    @property
+    def first_seen(self) -> datetime:
+        return datetime.fromtimestamp(self.first_seen_ts)
+
+    @first_seen.setter
+    def first_seen(self, value: datetime) -> None:
+        self.first_seen_ts = value.timestamp()
+
+    @property
+    def last_seen(self) -> datetime:
+        return datetime.fromtimestamp(self.last_seen_ts)
+
+    @last_seen.setter
+    def last_seen(self, value: datetime) -> None:
+        self.last_seen_ts = value.timestamp()
+
+    @property
+    def fingerprinted_at(self) -> Optional[datetime]:
+        if self.fingerprinted_ts is None:
+            return None
+        return datetime.fromtimestamp(self.fingerprinted_ts)
+
+    @fingerprinted_at.setter
+    def fingerprinted_at(self, value: Optional[datetime]) -> None:
+        self.fingerprinted_ts = _ts(value)
+
+    @classmethod
+    def from_record(cls, record: Any) -> "Device":
+        """Build a device from a stored DeviceRecord row"""
+        device = cls(
+            ip=record.ip,
+            mac=record.mac,
+            hostname=record.hostname,
+            vendor=record.vendor,
+            status=record.status,
+            os_info=record.os_info,
+            first_seen=record.first_seen,
+            last_seen=record.last_seen,
+            fingerprinted_at=record.fingerprinted_at
+        )
+        device.ports = record.ports or []
+        return device
+
+    def refreshed(self, mac: str = "") -> "Device":
+        """Copy of this device seen alive again now, keeping its fingerprint"""
+        device = Device(
+            ip=self.ip,
+            mac=mac or self.mac,
+            hostname=self.hostname,
+            vendor=self.vendor,
+            status="active",
+            os_info=self.os_info,
+            first_seen=self.first_seen,
+            fingerprinted_at=self.fingerprinted_at
+        )
+        device._ports = array("H", self._ports)
+        return device
+
+    def changes_from(self, previous: "Device") -> List[str]:
+        """Names of the fields that differ from an earlier observation"""
+        return [
+            field for field in self.TRACKED_FIELDS
+            if getattr(self, field) != getattr(previous, field)
+        ]
+
+    def merge(self, previous: "Device") -> None:
+        """Carry history and known identity over from an earlier observation"""
+        self.first_seen_ts = min(self.first_seen_ts, previous.first_seen_ts)
+        if self.mac_int is None:
+            self.mac_int = previous.mac_int
+        self.hostname = self.hostname or previous.hostname
+        self.vendor = self.vendor or previous.vendor
+        self.os_info = self.os_info or previous.os_info
+
+    def to_record(self) -> Dict[str, Any]:
+        """Column values for the inventory store"""
+        return {
+            "ip": self.ip,
+            "mac": self.mac,
+            "hostname": self.hostname,
+            "vendor": self.vendor,
+            "status": self.status,
+            "os_info": self.os_info,
+            "ports": self.ports,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "fingerprinted_at": self.fingerprinted_at
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return serialize_devices((self,))[0]
+
+
+def serialize_devices(devices: Iterable[Device]) -> List[Dict[str, Any]]:
+    """
+    Convert many devices to API dicts in one pass.
+
+    Reads the packed slots directly instead of going through the
+    properties, and formats timestamps once per distinct value (devices
+    found in the same scan batch often share them).
+    """
+    fromtimestamp = datetime.fromtimestamp
+    iso_cache: Dict[float, str] = {}
+
+    def iso(ts: float) -> str:
+        text = iso_cache.get(ts)
+        if text is None:
+            text = iso_cache[ts] = fromtimestamp(ts).isoformat()
+        return text
+
+    result = []
+    append = result.append
+    for d in devices:
+        data = {
+            "ip": _int_to_ip(d.ip_int),
+            "mac": _int_to_mac(d.mac_int),
+            "hostname": d.hostname,
+            "vendor": d.vendor,
+            "status": d.status,
+            "first_seen": iso(d.first_seen_ts),
+            "last_seen": iso(d.last_seen_ts),
+            "ports": d._ports.tolist()
+        }
+        if d.os_info:
+            data["os_info"] = d.os_info
+        append(data)
+    return result
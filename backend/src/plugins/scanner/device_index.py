@@ -0,0 +1,179 @@
+"""
+Device Index - Secondary indexes for filtered, paginated inventory queries
+"""
+import ipaddress
+import re
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> Set[str]:
+    """Lowercase word tokens, so "Apple, Inc." matches vendor=apple"""
+    return set(TOKEN.findall(text.lower())) if text else set()
+
+
+def ip_key(ip: str) -> int:
+    return int(ipaddress.ip_address(ip))
+
+
+class DeviceIndex:
+    """
+    Indexes kept alongside ScannerPlugin.devices.
+
+    IPs are kept in a sorted array of integers (ordering, cursors and CIDR
+    ranges by bisection), last_seen in a sorted array of (timestamp, ip)
+    pairs (time windows), and vendor/OS words, status and open ports in
+    inverted indexes. update() must be called whenever a device changes.
+    """
+
+    def __init__(self):
+        self.ips: List[int] = []
+        self.by_ip: Dict[int, str] = {}
+        self.seen: List[Tuple[float, int]] = []
+        self.vendor: Dict[str, Set[int]] = defaultdict(set)
+        self.os: Dict[str, Set[int]] = defaultdict(set)
+        self.status: Dict[str, Set[int]] = defaultdict(set)
+        self.ports: Dict[int, Set[int]] = defaultdict(set)
+        # What each IP is currently indexed under, so updates can undo it
+        self._entries: Dict[int, Tuple[float, Set[str], Set[str], str, Tuple[int, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ips)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def update(self, device: Any) -> None:
+        """(Re)index a device after it was added or modified"""
+        # Read the packed fields directly, avoiding str/datetime round trips
+        key = device.ip_int
+        entry = (
+            device.last_seen_ts,
+            tokenize(device.vendor),
+            tokenize(device.os_info),
+            device.status,
+            tuple(device._ports),
+        )
+        old = self._entries.get(key)
+        if old == entry:
+            return
+        if old is None:
+            insort(self.ips, key)
+            self.by_ip[key] = device.ip
+        else:
+            self._unlink(key, old)
+
+        self._entries[key] = entry
+        seen, vendor_tokens, os_tokens, status, ports = entry
+        insort(self.seen, (seen, key))
+        for token in vendor_tokens:
+            self.vendor[token].add(key)
+        for token in os_tokens:
+            self.os[token].add(key)
+        self.status[status].add(key)
+        for port in ports:
+            self.ports[port].add(key)
+
+    def count_range(self, first: int, last: int) -> int:
+        """Devices with an IP in the inclusive integer range first..last"""
+        return bisect_right(self.ips, last) - bisect_left(self.ips, first)
+
+    def remove(self, ip: str) -> None:
+        key = ip_key(ip)
+        old = self._entries.pop(key, None)
+        if old is None:
+            return
+        self._unlink(key, old)
+        del self.ips[bisect_left(self.ips, key)]
+        del self.by_ip[key]
+
+    def _unlink(self, key: int, entry: Tuple) -> None:
+        seen, vendor_tokens, os_tokens, status, ports = entry
+        i = bisect_left(self.seen, (seen, key))
+        if i < len(self.seen) and self.seen[i] == (seen, key):
+            del self.seen[i]
+        for token in vendor_tokens:
+            self._discard(self.vendor, token, key)
+        for token in os_tokens:
+            self._discard(self.os, token, key)
+        self._discard(self.status, status, key)
+        for port in ports:
+            self._discard(self.ports, port, key)
+
+    @staticmethod
+    def _discard(index: Dict[Any, Set[int]], value: Any, key: int) -> None:
+        keys = index.get(value)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[value]
+
+    def _tokens_match(self, index: Dict[str, Set[int]], text: str) -> Set[int]:
+        """Keys whose indexed text contains every word of the query"""
+        result: Optional[Set[int]] = None
+        for token in tokenize(text):
+            keys = index.get(token, set())
+            result = keys if result is None else result & keys
+        return set(result or ())
+
+    def query(self, vendor: Optional[str] = None, status: Optional[str] = None,
+              port: Optional[int] = None, subnet: Optional[str] = None,
+              os: Optional[str] = None, seen_after: Optional[datetime] = None,
+              seen_before: Optional[datetime] = None, cursor: Optional[str] = None,
+              limit: int = 100) -> Tuple[List[str], int, Optional[str]]:
+        """
+        Find devices matching every given filter, in IP order.
+
+        Args:
+            cursor: IP of the last device on the previous page
+            limit: Page size
+
+        Returns:
+            (IPs on this page, total number of matches, cursor for the next page or None)
+        """
+        lo, hi = 0, len(self.ips)
+        if subnet:
+            network = ipaddress.ip_network(subnet, strict=False)
+            lo = bisect_left(self.ips, int(network.network_address))
+            hi = bisect_right(self.ips, int(network.broadcast_address))
+
+        candidates: Optional[Set[int]] = None
+
+        def narrow(keys: Iterable[int]) -> None:
+            nonlocal candidates
+            keys = set(keys)
+            candidates = keys if candidates is None else candidates & keys
+
+        if status:
+            narrow(self.status.get(status, ()))
+        if port is not None:
+            narrow(self.ports.get(port, ()))
+        if vendor:
+            narrow(self._tokens_match(self.vendor, vendor))
+        if os:
+            narrow(self._tokens_match(self.os, os))
+        if seen_after or seen_before:
+            start = bisect_left(self.seen, (seen_after.timestamp(),)) if seen_after else 0
+            end = bisect_left(self.seen, (seen_before.timestamp(),)) if seen_before else len(self.seen)
+            narrow(key for _, key in self.seen[start:end])
+
+        if candidates is None:
+            # No set filters: walk the IP order directly
+            matches = self.ips[lo:hi]
+        else:
+            first = self.ips[lo] if lo < len(self.ips) else None
+            last = self.ips[hi - 1] if hi > 0 else None
+            matches = sorted(
+                key for key in candidates
+                if first is not None and last is not None and first <= key <= last
+            )
+
+        total = len(matches)
+        start = bisect_right(matches, ip_key(cursor)) if cursor else 0
+        page = matches[start:start + limit]
+        next_cursor = self.by_ip[page[-1]] if page and start + limit < total else None
+        return [self.by_ip[key] for key in page], total, next_cursor
@@ -0,0 +1,537 @@
+"""
+Scan History - Append-only log of per-host observations with hourly and daily rollups
+"""
+import asyncio
+import ipaddress
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Boolean, Index, Integer, String, case, delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlalchemy.orm import Mapped, mapped_column
+
+from plugins.scanner.inventory import Base
+
+RAW = 0
+HOUR = 3600
+DAY = 86400
+RESOLUTIONS = {"raw": RAW, "hour": HOUR, "day": DAY}
+RESOLUTION_NAMES = {seconds: name for name, seconds in RESOLUTIONS.items()}
+
+# (ip as integer, up, open ports or None if not probed, os_info, mac)
+Observation = Tuple[int, bool, Optional[List[int]], str, str]
+
+
+class ScanRecord(Base):
+    """One row per scan or liveness check that produced observations"""
+    __tablename__ = "history_scans"
+    __table_args__ = (
+        Index("ix_history_scans_finished_at", "finished_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(16))
+    backend: Mapped[str] = mapped_column(String(16), default="")
+    network: Mapped[str] = mapped_column(String(255), default="")
+    started_at: Mapped[int] = mapped_column(Integer)
+    finished_at: Mapped[int] = mapped_column(Integer)
+    hosts_up: Mapped[int] = mapped_column(Integer, default=0)
+    hosts_down: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class ObservationRecord(Base):
+    """
+    What one scan saw of one host, stamped with the time the scan finished.
+
+    Addresses and times are stored as integers and ports as "22,80,443",
+    in a table clustered by (ip, seen_at) so a host's timeline is one range
+    read. The (seen_at, up, ip) index answers time-range questions without
+    touching the rows.
+    """
+    __tablename__ = "history_observations"
+    __table_args__ = (
+        Index("ix_history_observations_seen_at", "seen_at", "up", "ip"),
+        {"sqlite_with_rowid": False},
+    )
+
+    ip: Mapped[int] = mapped_column(Integer, primary_key=True)
+    seen_at: Mapped[int] = mapped_column(Integer, primary_key=True)
+    scan_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    up: Mapped[bool] = mapped_column(Boolean)
+    ports: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    os_info: Mapped[str] = mapped_column(String(255), default="")
+    mac: Mapped[str] = mapped_column(String(17), default="")
+
+
+class RollupRecord(Base):
+    """Observations of one host folded into an hour or a (UTC) day"""
+    __tablename__ = "history_rollups"
+    __table_args__ = (
+        Index("ix_history_rollups_bucket", "resolution", "bucket", "ip"),
+        {"sqlite_with_rowid": False},
+    )
+
+    resolution: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ip: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bucket: Mapped[int] = mapped_column(Integer, primary_key=True)
+    observations: Mapped[int] = mapped_column(Integer)
+    up: Mapped[int] = mapped_column(Integer)
+    first_up: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    last_up: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # As of the last time the host answered within the bucket
+    ports: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    os_info: Mapped[str] = mapped_column(String(255), default="")
+    mac: Mapped[str] = mapped_column(String(17), default="")
+
+
+class HistoryState(Base):
+    """Compaction watermarks: what has been rolled up and what has been pruned"""
+    __tablename__ = "history_state"
+
+    name: Mapped[str] = mapped_column(String(32), primary_key=True)
+    value: Mapped[int] = mapped_column(Integer)
+
+
+def _floor(value: int, size: int) -> int:
+    return value - value % size
+
+
+def _ceil(value: int, size: int) -> int:
+    return -(-value // size) * size
+
+
+def _pack_ports(ports: Optional[Iterable[int]]) -> Optional[str]:
+    return None if ports is None else ",".join(str(port) for port in sorted(ports))
+
+
+def _unpack_ports(ports: Optional[str]) -> Optional[List[int]]:
+    if ports is None:
+        return None
+    return [int(port) for port in ports.split(",") if port]
+
+
+def _isoformat(value: Optional[int]) -> Optional[str]:
+    return datetime.fromtimestamp(value).isoformat() if value is not None else None
+
+
+def _ip(value: int) -> str:
+    return str(ipaddress.IPv4Address(value))
+
+
+class HistoryStore:
+    """
+    Scan history next to the inventory, in the same database.
+
+    Every scan appends one observation per host it checked (up or not,
+    open ports, OS, MAC). compact() folds complete hours into hourly
+    rollups and complete days into daily ones, then drops raw observations
+    after raw_days, hourly rollups after hourly_days and daily rollups
+    after daily_days. Range queries read each part of the range from the
+    coarsest level that covers it, so months of history are answered from
+    the rollup indexes without loading observations into memory.
+    """
+
+    # Rows per statement; 10 rollup columns x 250 rows stays well under SQLite's parameter limit
+    BATCH_SIZE = 250
+    WATERMARKS = ("hour", "day", "raw_floor", "hour_floor", "day_floor")
+
+    def __init__(self, engine: AsyncEngine, raw_days: float = 7, hourly_days: float = 90,
+                 daily_days: float = 730, compact_interval: float = 3600):
+        self.engine = engine
+        self.sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        self.raw_days = raw_days
+        self.hourly_days = hourly_days
+        self.daily_days = daily_days
+        self.compact_interval = compact_interval
+        # hour/day: rolled up before this time; *_floor: pruned before this time
+        self.state: Dict[str, int] = dict.fromkeys(self.WATERMARKS, 0)
+        self.last_compacted: Optional[float] = None
+        self._compaction: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def open(self) -> None:
+        """Create the history tables if needed and read the watermarks"""
+        tables = [model.__table__ for model in (ScanRecord, ObservationRecord, RollupRecord, HistoryState)]
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=tables)
+        async with self.sessionmaker() as session:
+            for name, value in await session.execute(select(HistoryState.name, HistoryState.value)):
+                self.state[name] = value
+
+    async def close(self) -> None:
+        if self._compaction is not None:
+            await asyncio.gather(self._compaction, return_exceptions=True)
+            self._compaction = None
+
+    async def record(self, kind: str, observations: List[Observation], started_at: float,
+                     backend: str = "", network: str = "") -> Optional[int]:
+        """
+        Append one scan's observations.
+
+        Returns:
+            The id of the scan record, or None if there was nothing to record
+        """
+        if not observations:
+            return None
+        up = sum(1 for observation in observations if observation[1])
+        # Stamped on write, so nothing lands in an hour that is already rolled up
+        finished_at = int(time.time())
+        async with self.sessionmaker() as session:
+            scan = ScanRecord(
+                kind=kind,
+                backend=backend,
+                network=network,
+                started_at=int(started_at),
+                finished_at=finished_at,
+                hosts_up=up,
+                hosts_down=len(observations) - up
+            )
+            session.add(scan)
+            await session.flush()
+            rows = [
+                {
+                    "ip": ip, "seen_at": finished_at, "scan_id": scan.id, "up": is_up,
+                    "ports": _pack_ports(ports), "os_info": os_info, "mac": mac
+                }
+                for ip, is_up, ports, os_info, mac in observations
+            ]
+            for start in range(0, len(rows), self.BATCH_SIZE):
+                stmt = sqlite_insert(ObservationRecord).on_conflict_do_nothing()
+                await session.execute(stmt, rows[start:start + self.BATCH_SIZE])
+            await session.commit()
+        self._schedule_compaction()
+        return scan.id
+
+    def _schedule_compaction(self) -> None:
+        """Compact in the background at most every compact_interval seconds"""
+        if self._compaction is not None and not self._compaction.done():
+            return
+        if self.last_compacted is not None and time.time() - self.last_compacted < self.compact_interval:
+            return
+        self._compaction = asyncio.create_task(self._compact_quietly())
+
+    async def _compact_quietly(self) -> None:
+        try:
+            await self.compact()
+        except Exception as e:
+            print(f"⚠️  Scan history compaction failed: {e}")
+
+    async def compact(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Roll up complete hours and days, then prune what is past retention.
+
+        Every bucket is committed on its own, so writers are only briefly
+        blocked and an interrupted compaction resumes where it stopped.
+
+        Returns:
+            Rollup rows written and rows pruned per level
+        """
+        now = int(time.time() if now is None else now)
+        result = {"hours": 0, "days": 0, "raw_pruned": 0, "hours_pruned": 0, "days_pruned": 0}
+        async with self._lock:
+            self.last_compacted = time.time()
+            async with self.sessionmaker() as session:
+                hour_end = _floor(now, HOUR)
+                bucket = await self._next_bucket(session, RAW, self.state["hour"], HOUR)
+                while bucket is not None and bucket < hour_end:
+                    result["hours"] += await self._rollup(session, RAW, HOUR, bucket)
+                    await self._set(session, "hour", bucket + HOUR)
+                    await session.commit()
+                    bucket = await self._next_bucket(session, RAW, bucket + HOUR, HOUR)
+                await self._set(session, "hour", max(self.state["hour"], hour_end))
+
+                day_end = _floor(self.state["hour"], DAY)
+                bucket = await self._next_bucket(session, HOUR, self.state["day"], DAY)
+                while bucket is not None and bucket < day_end:
+                    result["days"] += await self._rollup(session, HOUR, DAY, bucket)
+                    await self._set(session, "day", bucket + DAY)
+                    await session.commit()
+                    bucket = await self._next_bucket(session, HOUR, bucket + DAY, DAY)
+                await self._set(session, "day", max(self.state["day"], day_end))
+
+                # Only prune what a coarser level already holds, on that level's bucket edges
+                raw_cut = min(_floor(int(now - self.raw_days * DAY), HOUR), self.state["hour"])
+                hour_cut = min(_floor(int(now - self.hourly_days * DAY), DAY), self.state["day"])
+                day_cut = _floor(int(now - self.daily_days * DAY), DAY)
+                result["raw_pruned"] = (await session.execute(
+                    delete(ObservationRecord).where(ObservationRecord.seen_at < raw_cut)
+                )).rowcount
+                await session.execute(delete(ScanRecord).where(ScanRecord.finished_at < raw_cut))
+                result["hours_pruned"] = (await session.execute(
+                    delete(RollupRecord).where(RollupRecord.resolution == HOUR, RollupRecord.bucket < hour_cut)
+                )).rowcount
+                result["days_pruned"] = (await session.execute(
+                    delete(RollupRecord).where(RollupRecord.resolution == DAY, RollupRecord.bucket < day_cut)
+                )).rowcount
+                for name, cut in (("raw_floor", raw_cut), ("hour_floor", hour_cut), ("day_floor", day_cut)):
+                    await self._set(session, name, max(self.state[name], cut))
+                await session.commit()
+        return result
+
+    async def _set(self, session, name: str, value: int) -> None:
+        self.state[name] = value
+        stmt = sqlite_insert(HistoryState).values(name=name, value=value)
+        await session.execute(stmt.on_conflict_do_update(index_elements=[HistoryState.name],
+                                                         set_={"value": value}))
+
+    async def _next_bucket(self, session, source: int, after: int, size: int) -> Optional[int]:
+        """Start of the first bucket at or after after that has source data (skips idle gaps)"""
+        if source == RAW:
+            stmt = select(func.min(ObservationRecord.seen_at)).where(ObservationRecord.seen_at >= after)
+        else:
+            stmt = select(func.min(RollupRecord.bucket)).where(
+                RollupRecord.resolution == source, RollupRecord.bucket >= after
+            )
+        first = (await session.execute(stmt)).scalar()
+        return None if first is None else _floor(first, size)
+
+    async def _rollup(self, session, source: int, resolution: int, bucket: int) -> int:
+        """Fold the source level's data within one bucket into rollup rows"""
+        if source == RAW:
+            t = ObservationRecord
+            when, up = t.seen_at, case((t.up, 1), else_=0)
+            counts = select(
+                t.ip, func.count(), func.sum(up),
+                func.min(case((t.up, t.seen_at))), func.max(case((t.up, t.seen_at)))
+            ).where(when >= bucket, when < bucket + resolution)
+            answered = t.up
+        else:
+            t = RollupRecord
+            when = t.bucket
+            counts = select(
+                t.ip, func.sum(t.observations), func.sum(t.up), func.min(t.first_up), func.max(t.last_up)
+            ).where(t.resolution == source, when >= bucket, when < bucket + resolution)
+            answered = t.up > 0
+
+        rows: Dict[int, Dict[str, Any]] = {}
+        for ip, observations, up_count, first_up, last_up in await session.execute(counts.group_by(t.ip)):
+            rows[ip] = {
+                "resolution": resolution, "ip": ip, "bucket": bucket, "observations": observations,
+                "up": up_count, "first_up": first_up, "last_up": last_up,
+                "ports": None, "os_info": "", "mac": ""
+            }
+        # SQLite takes bare columns from the row that holds max(), i.e. the last sighting
+        last = select(t.ip, func.max(when), t.ports, t.os_info, t.mac).where(
+            answered, when >= bucket, when < bucket + resolution,
+            *((t.resolution == source,) if source != RAW else ())
+        ).group_by(t.ip)
+        for ip, _, ports, os_info, mac in await session.execute(last):
+            rows[ip].update(ports=ports, os_info=os_info, mac=mac)
+
+        values = list(rows.values())
+        for start in range(0, len(values), self.BATCH_SIZE):
+            stmt = sqlite_insert(RollupRecord).values(values[start:start + self.BATCH_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[RollupRecord.resolution, RollupRecord.ip, RollupRecord.bucket],
+                set_={name: getattr(stmt.excluded, name) for name in (
+                    "observations", "up", "first_up", "last_up", "ports", "os_info", "mac"
+                )}
+            )
+            await session.execute(stmt)
+        return len(values)
+
+    def _plan(self, start: int, end: int) -> List[Tuple[int, int, int]]:
+        """
+        Split [start, end) into (resolution, lo, hi) pieces: whole rolled-up
+        days from daily rollups, whole rolled-up hours from hourly ones and
+        the ragged edges from raw observations. Edges whose raw data has
+        been pruned widen to the buckets of the level that still has it.
+        """
+        levels = ((DAY, self.state["day"]), (HOUR, self.state["hour"]))
+
+        def split(lo: int, hi: int, level: int) -> List[Tuple[int, int, int]]:
+            if lo >= hi:
+                return []
+            if level == len(levels):
+                return [(RAW, lo, hi)]
+            size, done = levels[level]
+            first, last = _ceil(lo, size), min(_floor(hi, size), done)
+            if first >= last:
+                return split(lo, hi, level + 1)
+            return split(lo, first, level + 1) + [(size, first, last)] + split(last, hi, level + 1)
+
+        floors = {RAW: self.state["raw_floor"], HOUR: self.state["hour_floor"], DAY: self.state["day_floor"]}
+        coarser = {RAW: HOUR, HOUR: DAY}
+
+        def available(resolution: int, lo: int, hi: int) -> List[Tuple[int, int, int]]:
+            if lo >= floors[resolution] or resolution == DAY:
+                return [(resolution, lo, hi)]
+            # Floors sit on the coarser level's bucket edges, so widening never overlaps
+            cut = min(hi, floors[resolution])
+            size = coarser[resolution]
+            pieces = available(size, _floor(lo, size), _ceil(cut, size))
+            if cut < hi:
+                pieces.append((resolution, cut, hi))
+            return pieces
+
+        return [piece for planned in split(start, end, 0) for piece in available(*planned)]
+
+    async def hosts_up(self, start: float, end: float,
+                       network: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Hosts that answered at least once in [start, end).
+
+        Args:
+            start, end: Epoch seconds
+            network: Only hosts in this CIDR range
+
+        Returns:
+            Per host the first and last time it answered and how often,
+            plus the resolutions the answer was built from
+        """
+        start, end = int(start), math.ceil(end)
+        bounds = None
+        if network:
+            subnet = ipaddress.ip_network(network, strict=False)
+            bounds = int(subnet.network_address), int(subnet.broadcast_address)
+
+        plan = self._plan(start, end)
+        hosts: Dict[int, List[int]] = {}
+        async with self.sessionmaker() as session:
+            for resolution, lo, hi in plan:
+                if resolution == RAW:
+                    t = ObservationRecord
+                    stmt = select(t.ip, func.min(t.seen_at), func.max(t.seen_at), func.count()).where(
+                        t.seen_at >= lo, t.seen_at < hi, t.up
+                    )
+                else:
+                    t = RollupRecord
+                    stmt = select(t.ip, func.min(t.first_up), func.max(t.last_up), func.sum(t.up)).where(
+                        t.resolution == resolution, t.bucket >= lo, t.bucket < hi, t.up > 0
+                    )
+                if bounds:
+                    stmt = stmt.where(t.ip.between(*bounds))
+                for ip, first_up, last_up, count in await session.execute(stmt.group_by(t.ip)):
+                    seen = hosts.get(ip)
+                    if seen is None:
+                        hosts[ip] = [first_up, last_up, count]
+                    else:
+                        seen[0] = min(seen[0], first_up)
+                        seen[1] = max(seen[1], last_up)
+                        seen[2] += count
+
+        return {
+            "start": _isoformat(start),
+            "end": _isoformat(end),
+            "resolutions": sorted({RESOLUTION_NAMES[resolution] for resolution, _, _ in plan}),
+            "hosts": [
+                {"ip": _ip(ip), "first_up": _isoformat(first), "last_up": _isoformat(last), "times_up": count}
+                for ip, (first, last, count) in sorted(hosts.items())
+            ],
+            "total": len(hosts)
+        }
+
+    def _auto_resolution(self, start: int, end: int) -> int:
+        """The finest level that still has data for start and keeps the timeline short"""
+        span = end - start
+        if span <= 2 * DAY and start >= self.state["raw_floor"]:
+            return RAW
+        if span <= 62 * DAY and start >= self.state["hour_floor"]:
+            return HOUR
+        return DAY
+
+    async def timeline(self, ip: str, start: float, end: float, resolution: str = "auto",
+                       limit: int = 5000) -> Dict[str, Any]:
+        """
+        One host's observations in [start, end), oldest first.
+
+        At "hour" or "day" resolution each point is a rollup bucket; the
+        most recent part that is not rolled up yet comes from the next
+        finer level, so the timeline always reaches up to end.
+
+        Args:
+            ip: IPv4 address
+            start, end: Epoch seconds
+            resolution: "raw", "hour", "day" or "auto" (by span and retention)
+            limit: Most points to return
+
+        Raises:
+            ValueError: On an invalid address or resolution
+        """
+        start, end = int(start), math.ceil(end)
+        key = int(ipaddress.IPv4Address(ip))
+        if resolution == "auto":
+            level = self._auto_resolution(start, end)
+        elif resolution in RESOLUTIONS:
+            level = RESOLUTIONS[resolution]
+        else:
+            raise ValueError(f"Invalid resolution {resolution!r}, expected auto, raw, hour or day")
+
+        pieces = []
+        lo = start
+        for size, done in ((DAY, self.state["day"]), (HOUR, self.state["hour"]), (RAW, None)):
+            if size > level:
+                continue
+            hi = end if done is None else max(lo, min(end, done))
+            if lo < hi:
+                pieces.append((size, lo, hi))
+            lo = hi
+
+        points: List[Dict[str, Any]] = []
+        async with self.sessionmaker() as session:
+            for size, lo, hi in pieces:
+                remaining = limit + 1 - len(points)
+                if remaining <= 0:
+                    break
+                if size == RAW:
+                    t = ObservationRecord
+                    stmt = select(t).where(t.ip == key, t.seen_at >= lo, t.seen_at < hi).order_by(t.seen_at)
+                    for row in (await session.execute(stmt.limit(remaining))).scalars():
+                        points.append({
+                            "time": _isoformat(row.seen_at),
+                            "resolution": "raw",
+                            "up": row.up,
+                            "ports": _unpack_ports(row.ports),
+                            "os_info": row.os_info,
+                            "mac": row.mac,
+                            "scan_id": row.scan_id
+                        })
+                else:
+                    t = RollupRecord
+                    stmt = select(t).where(
+                        t.resolution == size, t.ip == key, t.bucket >= _floor(lo, size), t.bucket < hi
+                    ).order_by(t.bucket)
+                    for row in (await session.execute(stmt.limit(remaining))).scalars():
+                        points.append({
+                            "time": _isoformat(row.bucket),
+                            "resolution": RESOLUTION_NAMES[size],
+                            "observations": row.observations,
+                            "up": row.up,
+                            "uptime": round(row.up / row.observations, 4) if row.observations else 0.0,
+                            "first_up": _isoformat(row.first_up),
+                            "last_up": _isoformat(row.last_up),
+                            "ports": _unpack_ports(row.ports),
+                            "os_info": row.os_info,
+                            "mac": row.mac
+                        })
+
+        return {
+            "ip": ip,
+            "start": _isoformat(start),
+            "end": _isoformat(end),
+            "resolution": RESOLUTION_NAMES[level],
+            "points": points[:limit],
+            "truncated": len(points) > limit
+        }
+
+    async def stats(self) -> Dict[str, Any]:
+        """Retention settings, watermarks and the span of the stored history"""
+        async with self.sessionmaker() as session:
+            oldest, newest = (await session.execute(
+                select(func.min(ObservationRecord.seen_at), func.max(ObservationRecord.seen_at))
+            )).one()
+            scans = (await session.execute(select(func.count()).select_from(ScanRecord))).scalar()
+            oldest_rollup = (await session.execute(select(func.min(RollupRecord.bucket)))).scalar()
+        return {
+            "retention_days": {"raw": self.raw_days, "hour": self.hourly_days, "day": self.daily_days},
+            "scans": scans,
+            "oldest_observation": _isoformat(oldest),
+            "newest_observation": _isoformat(newest),
+            "oldest_rollup": _isoformat(oldest_rollup),
+            "rolled_up_until": {"hour": _isoformat(self.state["hour"] or None),
+                                "day": _isoformat(self.state["day"] or None)},
+            "last_compacted": _isoformat(int(self.last_compacted)) if self.last_compacted else None
+        }
@@ -0,0 +1,127 @@
+"""
+Device Inventory - Persistent device store backed by SQLAlchemy (async)
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import JSON, DateTime, Index, Integer, String, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class DeviceRecord(Base):
+    """One row per IP address ever seen by the scanner"""
+    __tablename__ = "devices"
+    __table_args__ = (
+        Index("ix_devices_ip", "ip", unique=True),
+        Index("ix_devices_mac", "mac"),
+        Index("ix_devices_last_seen", "last_seen"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    ip: Mapped[str] = mapped_column(String(45))
+    mac: Mapped[str] = mapped_column(String(17), default="")
+    hostname: Mapped[str] = mapped_column(String(255), default="")
+    vendor: Mapped[str] = mapped_column(String(255), default="")
+    status: Mapped[str] = mapped_column(String(16), default="active")
+    os_info: Mapped[str] = mapped_column(String(255), default="")
+    ports: Mapped[List[int]] = mapped_column(JSON, default=list)
+    first_seen: Mapped[datetime] = mapped_column(DateTime)
+    last_seen: Mapped[datetime] = mapped_column(DateTime)
+    fingerprinted_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+def to_async_url(url: str) -> str:
+    """Accept plain sqlite:/// URLs (as in .env.example) and use the aiosqlite driver"""
+    if url.startswith("sqlite:///"):
+        return "sqlite+aiosqlite:///" + url[len("sqlite:///"):]
+    return url
+
+
+def _keep_known(stmt, column):
+    """Take the incoming value unless it is empty, otherwise keep the stored one"""
+    return func.coalesce(func.nullif(getattr(stmt.excluded, column.key), ""), column)
+
+
+class DeviceStore:
+    """
+    Async persistence for the scanner inventory.
+
+    Rows are keyed by IP. Upserts keep the stored first_seen, keep known
+    identity fields when a scan came back without them, and overwrite the
+    rest, so a device's history survives rescans and restarts. Uses SQLite
+    upsert syntax (aiosqlite driver).
+    """
+
+    # SQLite caps bound parameters per statement; 11 columns x 500 rows stays well under it
+    BATCH_SIZE = 500
+
+    def __init__(self, url: str):
+        self.url = to_async_url(url)
+        self.engine: Optional[AsyncEngine] = None
+        self.sessionmaker: Optional[async_sessionmaker] = None
+
+    async def open(self) -> None:
+        """Create the engine and the schema if needed"""
+        if self.url.startswith("sqlite+aiosqlite:///"):
+            path = self.url[len("sqlite+aiosqlite:///"):]
+            if path and path != ":memory:":
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.engine = create_async_engine(self.url)
+        self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def close(self) -> None:
+        if self.engine:
+            await self.engine.dispose()
+            self.engine = None
+
+    async def load_all(self) -> List[DeviceRecord]:
+        """Load the full inventory, used to warm the in-memory cache at startup"""
+        async with self.sessionmaker() as session:
+            result = await session.execute(select(DeviceRecord))
+            return list(result.scalars())
+
+    async def upsert_many(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Insert or update devices in batches.
+
+        Args:
+            rows: Dicts with DeviceRecord column names (except id)
+
+        Returns:
+            Number of rows written
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+
+        async with self.sessionmaker() as session:
+            for start in range(0, len(rows), self.BATCH_SIZE):
+                stmt = sqlite_insert(DeviceRecord).values(rows[start:start + self.BATCH_SIZE])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[DeviceRecord.ip],
+                    set_={
+                        "mac": _keep_known(stmt, DeviceRecord.mac),
+                        "hostname": _keep_known(stmt, DeviceRecord.hostname),
+                        "vendor": _keep_known(stmt, DeviceRecord.vendor),
+                        "os_info": _keep_known(stmt, DeviceRecord.os_info),
+                        "status": stmt.excluded.status,
+                        "ports": stmt.excluded.ports,
+                        "last_seen": stmt.excluded.last_seen,
+                        "fingerprinted_at": func.coalesce(
+                            stmt.excluded.fingerprinted_at, DeviceRecord.fingerprinted_at
+                        ),
+                    }
+                )
+                await session.execute(stmt)
+            await session.commit()
+        return len(rows)
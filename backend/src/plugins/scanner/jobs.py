@@ -0,0 +1,348 @@
+"""
+Scan Jobs - Background scan scheduling with queueing, deduplication and cancellation
+"""
+import asyncio
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+
+class ScanJob:
+    """A single scan request and everything it has produced so far"""
+
+    FINISHED = ("completed", "failed", "cancelled")
+    # Ended here by a hot reload; exported unfinished, so the new instance runs it again
+    HANDED_OVER = "reloaded"
+
+    def __init__(self, network: Optional[str], backend: str,
+                 options: Optional[Dict[str, Any]] = None,
+                 on_record: Optional[Callable[["ScanJob", Dict[str, Any]], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.network = network
+        self.backend = backend
+        self.options = options or {}
+        # Identity used to deduplicate identical in-flight requests
+        self.key = (network, backend, tuple(sorted(self.options.items())))
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.progress: Dict[str, Any] = {}
+        self.diff: Optional[Dict[str, Any]] = None
+        self.timings: Optional[Dict[str, float]] = None
+        self.devices: List[Dict[str, Any]] = []
+        self.events: List[Dict[str, Any]] = []
+        self.task: Optional[asyncio.Task] = None
+        self.on_record = on_record
+        self._updated = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in self.FINISHED or self.status == self.HANDED_OVER
+
+    def record(self, event: Dict[str, Any]) -> None:
+        """Store an event and wake up anyone following the job"""
+        kind = event.get("event")
+        if kind == "device":
+            self.devices.append(event["device"])
+        elif kind in ("progress", "complete"):
+            self.progress = {
+                k: v for k, v in event.items() if k not in ("event", "diff", "timings")
+            }
+            if "diff" in event:
+                self.diff = event["diff"]
+            if "timings" in event:
+                self.timings = event["timings"]
+        elif kind == "start" and not self.network:
+            self.network = event.get("network")
+        self.events.append(event)
+        if self.on_record:
+            self.on_record(self, event)
+
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    def finish(self, status: str, error: Optional[str] = None,
+               event: Optional[Dict[str, Any]] = None) -> None:
+        """Move the job to a final state, recording the event that ended it"""
+        self.status = status
+        self.error = error
+        self.finished_at = datetime.now()
+        self.record(event or {"event": "cancelled" if status == "cancelled" else "error",
+                              "message": error})
+        # The devices are kept in self.devices; late followers only need the outcome.
+        # Followers already running keep the full list they are reading.
+        self.events = self.events[-1:]
+
+    async def wait(self) -> None:
+        """Wait until the job reaches a final state"""
+        while not self.finished:
+            await self._updated.wait()
+
+    async def follow(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Replay the job's events so far, then yield new ones until it finishes.
+
+        Once the job has finished, only its final event is replayed.
+        """
+        # finish() swaps in a shorter list; stay on the one being read
+        events = self.events
+        index = 0
+        while True:
+            while index < len(events):
+                yield events[index]
+                index += 1
+            if self.finished:
+                return
+            await self._updated.wait()
+
+    def to_dict(self, include_devices: bool = False,
+                include_timings: bool = False) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "network": self.network,
+            "backend": self.backend,
+            "options": self.options,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "progress": self.progress,
+            "diff": self.diff,
+            "total": len(self.devices)
+        }
+        if include_devices:
+            data["devices"] = self.devices
+        if include_timings:
+            data["timings"] = self.timings
+        return data
+
+    def to_state(self) -> Dict[str, Any]:
+        """Everything needed to rebuild the job, as plain data"""
+        return {**self.to_dict(include_devices=True, include_timings=True), "events": self.events}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any],
+                   on_record: Optional[Callable[["ScanJob", Dict[str, Any]], None]] = None
+                   ) -> "ScanJob":
+        """
+        Rebuild a job from to_state().
+
+        Finished jobs keep their results; unfinished ones come back queued,
+        under the same ID, to be run again from the start.
+        """
+        job = cls(state["network"], state["backend"], state["options"], on_record)
+        job.id = state["id"]
+        job.created_at = datetime.fromisoformat(state["created_at"])
+        if state["status"] in cls.FINISHED:
+            job.status = state["status"]
+            job.error = state["error"]
+            job.started_at = datetime.fromisoformat(state["started_at"]) if state["started_at"] else None
+            job.finished_at = datetime.fromisoformat(state["finished_at"])
+            job.progress = state["progress"]
+            job.diff = state["diff"]
+            job.timings = state.get("timings")
+            job.devices = state["devices"]
+            job.events = state["events"][-1:]
+        return job
+
+
+class ScanScheduler:
+    """
+    Runs scan jobs on a bounded pool of workers.
+
+    Jobs for the same network are run one at a time in submission order,
+    identical requests that are still queued or running share one job, and
+    finished jobs are kept for status queries up to a history limit.
+    """
+
+    def __init__(self, run_scan: Callable[..., AsyncIterator[Dict[str, Any]]],
+                 workers: int = 2, history: int = 100,
+                 on_event: Optional[Callable[[ScanJob, Dict[str, Any]], None]] = None):
+        self.run_scan = run_scan
+        self.on_event = on_event
+        self.worker_count = max(1, workers)
+        self.history = history
+        self.jobs: "OrderedDict[str, ScanJob]" = OrderedDict()
+        self.pending: Deque[ScanJob] = deque()
+        self.active_networks: Set[Optional[str]] = set()
+        self._cond = asyncio.Condition()
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker())
+                for _ in range(self.worker_count)
+            ]
+
+    async def stop(self) -> None:
+        for job in list(self.jobs.values()):
+            if not job.finished:
+                await self.cancel(job.id)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @property
+    def running(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == "running")
+
+    async def submit(self, network: Optional[str], backend: str,
+                     options: Optional[Dict[str, Any]] = None) -> Tuple[ScanJob, bool]:
+        """
+        Queue a scan, or return the matching in-flight job.
+
+        Args:
+            network: CIDR range, or None to auto-detect
+            backend: Discovery backend name
+            options: Extra keyword arguments passed through to run_scan
+
+        Returns:
+            The job and whether it was newly created
+        """
+        job = ScanJob(network, backend, options, on_record=self.on_event)
+        for existing in self.jobs.values():
+            if not existing.finished and existing.key == job.key:
+                return existing, False
+
+        self.jobs[job.id] = job
+        self._trim_history()
+
+        async with self._cond:
+            self.pending.append(job)
+            self._cond.notify_all()
+        return job, True
+
+    def export_jobs(self) -> List[Dict[str, Any]]:
+        return [job.to_state() for job in self.jobs.values()]
+
+    async def hand_over(self) -> List[Dict[str, Any]]:
+        """
+        Stop for a hot reload and export the jobs.
+
+        Unfinished jobs end with a "reloaded" event instead of "cancelled",
+        so their followers know the scan continues in the new instance, and
+        are exported unfinished to run again there. Their scans are stopped
+        before this returns, so nothing they find is missed by the export.
+        """
+        tasks = []
+        async with self._cond:
+            for job in list(self.jobs.values()):
+                if job.finished:
+                    continue
+                if job in self.pending:
+                    self.pending.remove(job)
+                # job_id lets followers reopen /api/scans/{id}/stream on the new instance
+                job.finish(ScanJob.HANDED_OVER, event={
+                    "event": "reloaded", "job_id": job.id,
+                    "message": "Scanner reloaded, the scan is run again"
+                })
+                if job.task:
+                    job.task.cancel()
+                    tasks.append(job.task)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, *tasks, return_exceptions=True)
+        self._workers = []
+        return self.export_jobs()
+
+    def resume(self) -> None:
+        """Undo hand_over() after a failed reload: run the handed-over jobs again here"""
+        states = [job.to_state() for job in self.jobs.values() if job.status == ScanJob.HANDED_OVER]
+        for state in states:
+            del self.jobs[state["id"]]
+        self.restore_jobs(states)
+        self.start()
+
+    def restore_jobs(self, states: List[Dict[str, Any]]) -> None:
+        """Take over jobs from export_jobs(), requeueing unfinished ones. Call before start()."""
+        for state in states:
+            job = ScanJob.from_state(state, on_record=self.on_event)
+            self.jobs[job.id] = job
+            if not job.finished:
+                self.pending.append(job)
+        self._trim_history()
+
+    def get(self, job_id: str) -> Optional[ScanJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[ScanJob]:
+        return list(self.jobs.values())
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job. Returns False if there was nothing to cancel."""
+        job = self.jobs.get(job_id)
+        if not job or job.finished:
+            return False
+
+        if job in self.pending:
+            async with self._cond:
+                self.pending.remove(job)
+            job.finish("cancelled")
+        elif job.task:
+            job.task.cancel()
+            await job.wait()
+        return True
+
+    def _trim_history(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self.jobs) - self.history)]:
+            del self.jobs[job_id]
+
+    def _next_job(self) -> Optional[ScanJob]:
+        for job in self.pending:
+            if job.network not in self.active_networks:
+                return job
+        return None
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._cond:
+                job = self._next_job()
+                while job is None:
+                    await self._cond.wait()
+                    job = self._next_job()
+                self.pending.remove(job)
+                # The job's network may be filled in once auto-detection runs
+                network = job.network
+                self.active_networks.add(network)
+                job.status = "running"
+                job.started_at = datetime.now()
+
+            try:
+                job.task = asyncio.create_task(self._run(job))
+                try:
+                    await asyncio.wait([job.task])
+                except asyncio.CancelledError:
+                    job.task.cancel()
+                    raise
+                if not job.finished:
+                    # Cancelled before the task got to run
+                    job.finish("cancelled")
+            finally:
+                async with self._cond:
+                    self.active_networks.discard(network)
+                    self._cond.notify_all()
+
+    async def _run(self, job: ScanJob) -> None:
+        try:
+            async for event in self.run_scan(job.network, job.backend, **job.options):
+                if event.get("event") == "error":
+                    job.finish("failed", event.get("message"), event)
+                    return
+                if event.get("event") == "complete":
+                    job.finish("completed", event=event)
+                    return
+                job.record(event)
+            job.finish("failed", "Scan ended without completing")
+        except asyncio.CancelledError:
+            if not job.finished:
+                # Handed-over jobs are already ended
+                job.finish("cancelled")
+        except Exception as e:
+            job.finish("failed", str(e))
@@ -0,0 +1,150 @@
+"""
+Monitoring - Periodic liveness checks and scans, and the inventory change feed
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+
+class ChangeFeed:
+    """
+    Bounded log of inventory changes (host appeared/disappeared, MAC changed,
+    port opened/closed).
+
+    Every change gets an increasing id, so clients can poll with since=<id>
+    or resume a stream where they left off.
+    """
+
+    def __init__(self, history: int = 1000,
+                 on_publish: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=max(1, history))
+        self.on_publish = on_publish
+        self.last_id = 0
+        self._updated = asyncio.Event()
+
+    def publish(self, kind: str, ip: str, **details: Any) -> Dict[str, Any]:
+        """Append a change and wake up followers"""
+        self.last_id += 1
+        event = {
+            "event": "change",
+            "id": self.last_id,
+            "type": kind,
+            "ip": ip,
+            "time": datetime.now().isoformat(),
+            **details
+        }
+        self.events.append(event)
+        print(f"   🔔 {kind}: {ip}")
+        if self.on_publish:
+            self.on_publish(event)
+
+        self._updated.set()
+        self._updated = asyncio.Event()
+        return event
+
+    def since(self, after: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Changes with an id greater than after, oldest first"""
+        result = [event for event in self.events if event["id"] > after]
+        return result[:limit] if limit else result
+
+    async def follow(self, after: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield changes after the given id (or from now on), waiting for new ones"""
+        cursor = self.last_id if after is None else after
+        while True:
+            for event in self.since(cursor):
+                cursor = event["id"]
+                yield event
+            await self._updated.wait()
+
+
+class Monitor:
+    """
+    Runs check() every interval seconds and scan() every scan_interval.
+
+    Both intervals are randomized by +/- jitter (a fraction) so several
+    sensors do not probe the network in lockstep. The first run is a scan,
+    so monitoring starts from a complete picture.
+    """
+
+    def __init__(self, check: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+                 scan: Callable[[], Awaitable[Any]], interval: float = 60,
+                 scan_interval: float = 3600, jitter: float = 0.1):
+        self.check = check
+        self.scan = scan
+        self.interval = interval
+        self.scan_interval = scan_interval
+        self.jitter = jitter
+        self.checks = 0
+        self.scans = 0
+        # Failed scans in a row, they back off the next attempt
+        self.scan_failures = 0
+        self.last_check: Optional[datetime] = None
+        self.last_scan: Optional[datetime] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.next_run: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.next_run = None
+
+    def _jittered(self, seconds: float) -> float:
+        return max(0.0, seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    async def _loop(self) -> None:
+        next_scan = time.monotonic()
+        while True:
+            scanning = time.monotonic() >= next_scan
+            try:
+                if scanning:
+                    await self.scan()
+                    self.scans += 1
+                    self.scan_failures = 0
+                    self.last_scan = datetime.now()
+                    next_scan = time.monotonic() + self._jittered(self.scan_interval)
+                else:
+                    self.last_result = await self.check()
+                    self.checks += 1
+                    self.last_check = datetime.now()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Monitoring run failed: {e}")
+                if scanning:
+                    # Retry with a backoff from interval up to scan_interval, not at once
+                    self.scan_failures += 1
+                    backoff = min(self.scan_interval, self.interval * 2 ** min(self.scan_failures - 1, 16))
+                    next_scan = time.monotonic() + self._jittered(max(1.0, backoff))
+
+            delay = min(self._jittered(self.interval), max(0.0, next_scan - time.monotonic()))
+            self.next_run = datetime.fromtimestamp(time.time() + delay)
+            await asyncio.sleep(delay)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "scan_interval": self.scan_interval,
+            "jitter": self.jitter,
+            "checks": self.checks,
+            "scans": self.scans,
+            "scan_failures": self.scan_failures,
+            "last_check": self.last_check.isoformat() if self.last_check else None,
+            "last_scan": self.last_scan.isoformat() if self.last_scan else None,
+            "next_run": self.next_run.isoformat() if self.next_run else None,
+            "last_result": self.last_result
+        }
@@ -0,0 +1,121 @@
+"""
+Neighbor Table - Bulk IP -> MAC resolution from the OS ARP cache
+"""
+import asyncio
+import platform
+import re
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+PROC_ARP = Path("/proc/net/arp")
+
+# Matches "192.168.1.1 ... aa-bb-cc-dd-ee-ff" (Windows) and
+# "? (192.168.1.1) at aa:bb:cc:dd:ee:ff on en0" (macOS/BSD)
+ARP_LINE = re.compile(
+    r'(\d{1,3}(?:\.\d{1,3}){3})\)?\s+(?:at\s+)?'
+    r'([0-9a-fA-F]{1,2}(?:[:-][0-9a-fA-F]{1,2}){5})'
+)
+
+# ATF_COM: the kernel has a resolved hardware address for the entry
+ATF_COM = 0x2
+
+
+def normalize_mac(mac: str) -> str:
+    """Uppercase, colon-separated, zero-padded (macOS prints 0:1b:...)"""
+    return ":".join(part.zfill(2) for part in re.split(r"[:-]", mac)).upper()
+
+
+def parse_proc_arp(text: str) -> Dict[str, str]:
+    """Parse the Linux /proc/net/arp table"""
+    entries = {}
+    for line in text.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 4:
+            continue
+        ip, flags, mac = fields[0], fields[2], fields[3]
+        if int(flags, 16) & ATF_COM and mac != "00:00:00:00:00:00":
+            entries[ip] = mac.upper()
+    return entries
+
+
+def parse_arp_output(text: str) -> Dict[str, str]:
+    """Parse `arp -a` output from Windows, macOS or BSD"""
+    entries = {}
+    for line in text.splitlines():
+        match = ARP_LINE.search(line)
+        if match:
+            mac = normalize_mac(match.group(2))
+            if mac not in ("00:00:00:00:00:00", "FF:FF:FF:FF:FF:FF"):
+                entries[match.group(1)] = mac
+    return entries
+
+
+async def read_neighbor_table() -> Dict[str, str]:
+    """Load the whole neighbor table in one pass"""
+    if platform.system().lower() == 'linux' and PROC_ARP.exists():
+        return parse_proc_arp(await asyncio.to_thread(PROC_ARP.read_text))
+
+    result = await asyncio.create_subprocess_exec(
+        'arp', '-a',
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, _ = await result.communicate()
+    return parse_arp_output(stdout.decode(errors='replace'))
+
+
+class NeighborTable:
+    """
+    Cached IP -> MAC map shared by every probe in a scan.
+
+    A miss only triggers a re-read if the cached copy predates the caller's
+    probe, and re-reads are throttled to one per min_interval, so a /22 costs
+    a handful of table reads instead of a process per host.
+    """
+
+    def __init__(self, min_interval: float = 0.5):
+        self.min_interval = min_interval
+        self.entries: Dict[str, str] = {}
+        self.updated = 0.0
+        self.refreshes = 0
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, fresh_after: Optional[float] = None) -> None:
+        """
+        Re-read the table.
+
+        Args:
+            fresh_after: Skip the read if the table was already refreshed
+                after this monotonic timestamp (by a concurrent caller)
+        """
+        async with self._lock:
+            if fresh_after is not None:
+                if self.updated > fresh_after:
+                    return
+                wait = self.updated + self.min_interval - time.monotonic()
+                if wait > 0:
+                    # Let more probes finish so one read serves them all
+                    await asyncio.sleep(wait)
+            started = time.monotonic()
+            try:
+                self.entries = await read_neighbor_table()
+            except Exception as e:
+                print(f"Error reading neighbor table: {e}")
+            self.updated = started
+            self.refreshes += 1
+
+    async def lookup(self, ip: str, fresh_after: Optional[float] = None) -> str:
+        """
+        Return the MAC for an IP, or "" if the OS has none.
+
+        Args:
+            ip: Address to resolve
+            fresh_after: Monotonic time the host was last probed; a miss on a
+                table older than this triggers a (shared, throttled) re-read
+        """
+        mac = self.entries.get(ip)
+        if mac is None and fresh_after is not None and self.updated <= fresh_after:
+            await self.refresh(fresh_after)
+            mac = self.entries.get(ip)
+        return mac or ""
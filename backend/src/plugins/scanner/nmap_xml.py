@@ -0,0 +1,198 @@
+"""
+Nmap Runner - Streams nmap's XML output into hosts as nmap finishes them
+"""
+import asyncio
+import xml.etree.ElementTree as ET
+from typing import AsyncIterator, Callable, Iterable, List, Optional
+
+CHUNK_SIZE = 64 * 1024
+
+
+class NmapError(Exception):
+    """nmap could not be started or exited with an error"""
+
+
+class NmapHost:
+    """
+    One <host> element of nmap's XML output.
+
+    ports is None when nmap did not scan ports (-sn), so callers can tell
+    "no open ports" from "not checked".
+    """
+
+    __slots__ = ("ip", "state", "mac", "vendor", "os_info", "ports")
+
+    def __init__(self, ip: str, state: str = "up", mac: str = "", vendor: str = "",
+                 os_info: str = "", ports: Optional[List[int]] = None):
+        self.ip = ip
+        self.state = state
+        self.mac = mac
+        self.vendor = vendor
+        self.os_info = os_info
+        self.ports = ports
+
+
+def parse_host(element: ET.Element) -> NmapHost:
+    """Build an NmapHost from a closed <host> element"""
+    status = element.find("status")
+    host = NmapHost("", status.get("state", "") if status is not None else "")
+    for address in element.iterfind("address"):
+        kind = address.get("addrtype")
+        if kind == "mac":
+            host.mac = address.get("addr", "").upper()
+            host.vendor = address.get("vendor", "")
+        elif kind in ("ipv4", "ipv6") and not host.ip:
+            host.ip = address.get("addr", "")
+
+    ports = element.find("ports")
+    if ports is not None:
+        host.ports = sorted(
+            int(port.get("portid"))
+            for port in ports.iterfind("port")
+            if port.get("protocol") == "tcp" and port.find("state[@state='open']") is not None
+        )
+
+    # Matches come best first
+    osmatch = element.find("os/osmatch")
+    if osmatch is not None:
+        host.os_info = osmatch.get("name", "")
+    return host
+
+
+class HostStream:
+    """
+    Incremental parser for nmap -oX output.
+
+    Feed it the output as it arrives; it returns the hosts whose element
+    closed in that chunk. Finished top-level elements are dropped from the
+    tree, so memory stays flat however many hosts the scan covers.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._root: Optional[ET.Element] = None
+        self._depth = 0
+        # Last <taskprogress> percentage, with --stats-every
+        self.percent: Optional[float] = None
+        # errormsg of <finished exit="error">
+        self.error = ""
+
+    def feed(self, data: bytes) -> List[NmapHost]:
+        self._parser.feed(data)
+        return self._collect()
+
+    def close(self) -> List[NmapHost]:
+        """Flush the parser once the output has ended"""
+        self._parser.close()
+        return self._collect()
+
+    def _collect(self) -> List[NmapHost]:
+        hosts = []
+        for event, element in self._parser.read_events():
+            if event == "start":
+                if self._root is None:
+                    self._root = element
+                self._depth += 1
+                continue
+            self._depth -= 1
+            if element.tag == "host":
+                hosts.append(parse_host(element))
+            elif element.tag == "taskprogress":
+                self.percent = float(element.get("percent", 0))
+            elif element.tag == "finished" and element.get("exit") == "error":
+                self.error = element.get("errormsg", "")
+            if self._depth == 1:
+                # A direct child of <nmaprun> is complete and handled
+                self._root.remove(element)
+        return hosts
+
+
+async def stream_host_batches(targets: Iterable[str], arguments: List[str],
+                              on_progress: Optional[Callable[[float], None]] = None,
+                              binary: str = "nmap") -> AsyncIterator[List[NmapHost]]:
+    """
+    Run nmap as a subprocess and yield the hosts of each chunk of its output.
+
+    Hosts nmap finished together arrive in one batch, so callers can look
+    them up in bulk. Targets go to nmap's stdin (-iL -), so long target
+    lists are not bound by the command line limit. Closing the iterator
+    early kills nmap.
+
+    Args:
+        targets: Addresses or CIDR ranges to scan
+        arguments: nmap options, e.g. ["-sn", "-n"]
+        on_progress: Called with nmap's completion percentage whenever it
+            reports one (pass --stats-every in arguments to get them)
+        binary: nmap executable
+
+    Raises:
+        NmapError: nmap is missing or exited with an error
+    """
+    try:
+        process = await asyncio.create_subprocess_exec(
+            binary, *arguments, "-oX", "-", "-iL", "-",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError:
+        raise NmapError(f"{binary} not found, install it from https://nmap.org/download.html")
+
+    async def write_targets() -> None:
+        # Concurrently with reading, nmap may start writing before it read them all
+        try:
+            for target in targets:
+                process.stdin.write(f"{target}\n".encode())
+                await process.stdin.drain()
+            process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    writer = asyncio.create_task(write_targets())
+    # Drained alongside stdout so a chatty nmap cannot fill the pipe and stall
+    stderr = asyncio.create_task(process.stderr.read())
+    stream = HostStream()
+    percent = None
+    try:
+        while chunk := await process.stdout.read(CHUNK_SIZE):
+            hosts = stream.feed(chunk)
+            if on_progress is not None and stream.percent != percent:
+                percent = stream.percent
+                on_progress(percent)
+            if hosts:
+                yield hosts
+        returncode = await process.wait()
+        message = " ".join((await stderr).decode(errors="replace").split())
+        error = stream.error or (message if returncode else "")
+        if returncode and not error:
+            error = f"nmap exited with status {returncode}"
+        if error:
+            raise NmapError(error)
+        hosts = stream.close()
+        if hosts:
+            yield hosts
+    except ET.ParseError as e:
+        raise NmapError(f"Unreadable nmap output: {e}")
+    finally:
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+        writer.cancel()
+        stderr.cancel()
+        await asyncio.gather(writer, stderr, return_exceptions=True)
+
+
+async def stream_hosts(targets: Iterable[str], arguments: List[str],
+                       on_progress: Optional[Callable[[float], None]] = None,
+                       binary: str = "nmap") -> AsyncIterator[NmapHost]:
+    """Like stream_host_batches, one host at a time"""
+    batches = stream_host_batches(targets, arguments, on_progress, binary)
+    try:
+        async for hosts in batches:
+            for host in hosts:
+                yield host
+    finally:
+        await batches.aclose()
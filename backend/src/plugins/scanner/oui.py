@@ -0,0 +1,235 @@
+"""
+OUI Registry - Compact MAC vendor index with longest-prefix lookup
+
+The index covers all three IEEE assignment sizes (MA-L /24, MA-M /28 and
+MA-S /36). Each size is a sorted array of prefixes plus a parallel array of
+vendor numbers, so a lookup is at most three binary searches and the whole
+registry (~50k entries) fits in a couple of megabytes.
+
+Build it from local files, no network needed:
+
+    python -m src.plugins.scanner.oui oui.csv mam.csv oui36.csv -o data/oui.bin
+    python -m src.plugins.scanner.oui /usr/share/nmap/nmap-mac-prefixes -o data/oui.bin
+"""
+import argparse
+import csv
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Prefix lengths in bits, longest first so the most specific match wins
+PREFIX_BITS = (36, 28, 24)
+# Hex digits in an assignment -> prefix length in bits
+HEX_DIGITS = {9: 36, 7: 28, 6: 24}
+
+# Where nmap keeps its copy of the registry on common installs
+NMAP_PREFIX_FILES = (
+    "/usr/share/nmap/nmap-mac-prefixes",
+    "/usr/local/share/nmap/nmap-mac-prefixes",
+    "C:/Program Files (x86)/Nmap/nmap-mac-prefixes",
+    "C:/Program Files/Nmap/nmap-mac-prefixes",
+)
+
+# Used when no registry file is available
+SEED_ENTRIES = {
+    "005056": "VMware",
+    "080027": "VirtualBox",
+    "525400": "QEMU/KVM",
+    "001B63": "Apple",
+    "002500": "Apple",
+    "DCA632": "Raspberry Pi",
+    "B827EB": "Raspberry Pi",
+}
+
+
+def mac_to_int(mac: str) -> Optional[int]:
+    """Parse a MAC in any common notation (colons, dashes, dots, bare hex)"""
+    digits = "".join(c for c in mac if c not in ":-. ")
+    if len(digits) != 12:
+        return None
+    try:
+        return int(digits, 16)
+    except ValueError:
+        return None
+
+
+def parse_ieee_csv(path: Path) -> Iterator[Tuple[int, int, str]]:
+    """Read an IEEE registry export (oui.csv, mam.csv, oui36.csv)"""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            assignment = (row.get("Assignment") or "").strip()
+            vendor = (row.get("Organization Name") or "").strip()
+            bits = HEX_DIGITS.get(len(assignment))
+            if bits and vendor:
+                yield bits, int(assignment, 16), vendor
+
+
+def parse_nmap_prefixes(path: Path) -> Iterator[Tuple[int, int, str]]:
+    """Read nmap's nmap-mac-prefixes ("001122 Vendor" per line)"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            prefix, _, vendor = line.partition(" ")
+            bits = HEX_DIGITS.get(len(prefix))
+            if bits and vendor:
+                try:
+                    yield bits, int(prefix, 16), vendor.strip()
+                except ValueError:
+                    continue
+
+
+def read_entries(path: Path) -> Iterator[Tuple[int, int, str]]:
+    """Read (bits, prefix, vendor) entries from either supported source format"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        header = f.readline()
+    if "Assignment" in header:
+        return parse_ieee_csv(path)
+    return parse_nmap_prefixes(path)
+
+
+class OuiIndex:
+    """Immutable prefix -> vendor index"""
+
+    MAGIC = b"RSOUI1\n"
+
+    def __init__(self, tables: Dict[int, Tuple[array, array]], vendors: List[str]):
+        self.tables = tables
+        self.vendors = vendors
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[int, int, str]]) -> "OuiIndex":
+        """Build an index; later entries override earlier ones for the same prefix"""
+        by_bits: Dict[int, Dict[int, str]] = {bits: {} for bits in PREFIX_BITS}
+        for bits, prefix, vendor in entries:
+            by_bits[bits][prefix] = vendor
+
+        vendor_ids: Dict[str, int] = {}
+        tables = {}
+        for bits, prefixes in by_bits.items():
+            keys = array("Q", sorted(prefixes))
+            ids = array("I", (
+                vendor_ids.setdefault(prefixes[key], len(vendor_ids)) for key in keys
+            ))
+            tables[bits] = (keys, ids)
+        return cls(tables, list(vendor_ids))
+
+    @classmethod
+    def from_seed(cls) -> "OuiIndex":
+        return cls.build((24, int(prefix, 16), vendor) for prefix, vendor in SEED_ENTRIES.items())
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys, _ in self.tables.values())
+
+    def lookup(self, mac: str) -> Optional[str]:
+        """Return the vendor for the longest matching prefix, or None"""
+        value = mac_to_int(mac)
+        if value is None:
+            return None
+        for bits in PREFIX_BITS:
+            keys, ids = self.tables[bits]
+            prefix = value >> (48 - bits)
+            i = bisect_left(keys, prefix)
+            if i < len(keys) and keys[i] == prefix:
+                return self.vendors[ids[i]]
+        return None
+
+    def to_bytes(self) -> bytes:
+        vendor_blob = "\n".join(self.vendors).encode("utf-8")
+        parts = [self.MAGIC, struct.pack("<I", len(vendor_blob)), vendor_blob]
+        for bits in PREFIX_BITS:
+            keys, ids = self.tables[bits]
+            if sys.byteorder == "big":
+                keys, ids = array("Q", keys), array("I", ids)
+                keys.byteswap()
+                ids.byteswap()
+            parts.append(struct.pack("<BI", bits, len(keys)))
+            parts.append(keys.tobytes())
+            parts.append(ids.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "OuiIndex":
+        view = memoryview(data)
+        if bytes(view[:len(cls.MAGIC)]) != cls.MAGIC:
+            raise ValueError("Not an OUI index file")
+        offset = len(cls.MAGIC)
+        (blob_len,) = struct.unpack_from("<I", view, offset)
+        offset += 4
+        blob = bytes(view[offset:offset + blob_len]).decode("utf-8")
+        vendors = blob.split("\n") if blob else []
+        offset += blob_len
+
+        tables = {}
+        for _ in PREFIX_BITS:
+            bits, count = struct.unpack_from("<BI", view, offset)
+            offset += 5
+            keys = array("Q")
+            keys.frombytes(view[offset:offset + count * keys.itemsize])
+            offset += count * keys.itemsize
+            ids = array("I")
+            ids.frombytes(view[offset:offset + count * ids.itemsize])
+            offset += count * ids.itemsize
+            if sys.byteorder == "big":
+                keys.byteswap()
+                ids.byteswap()
+            tables[bits] = (keys, ids)
+        return cls(tables, vendors)
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so a running scanner never reads a half-written file
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(self.to_bytes())
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "OuiIndex":
+        return cls.from_bytes(Path(path).read_bytes())
+
+
+def load_index(path: Optional[Path] = None) -> OuiIndex:
+    """
+    Load the best available index.
+
+    Tries the compiled index file, then compiles nmap's prefix file in memory,
+    then falls back to the small built-in seed table.
+    """
+    if path and Path(path).exists():
+        try:
+            return OuiIndex.load(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"⚠️  Could not read OUI index {path}: {e}")
+
+    for candidate in NMAP_PREFIX_FILES:
+        if Path(candidate).exists():
+            return OuiIndex.build(parse_nmap_prefixes(Path(candidate)))
+
+    return OuiIndex.from_seed()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compile an OUI vendor index from local registry files")
+    parser.add_argument("sources", nargs="+", type=Path,
+                        help="IEEE CSV exports (oui.csv, mam.csv, oui36.csv) or nmap-mac-prefixes")
+    parser.add_argument("-o", "--output", type=Path, default=Path("data/oui.bin"),
+                        help="Index file to write (default: data/oui.bin)")
+    args = parser.parse_args(argv)
+
+    def all_entries() -> Iterator[Tuple[int, int, str]]:
+        for source in args.sources:
+            yield from read_entries(source)
+
+    index = OuiIndex.build(all_entries())
+    index.save(args.output)
+    print(f"Wrote {len(index)} prefixes ({len(index.vendors)} vendors) to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
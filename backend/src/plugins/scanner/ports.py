@@ -0,0 +1,245 @@
+"""
+Port Scanner - Unprivileged asyncio TCP connect scanning with adaptive pacing
+"""
+import asyncio
+import errno
+import socket
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Union
+
+# nmap's 100 most common TCP ports (-F), most frequent first
+TOP_PORTS = (
+    80, 23, 443, 21, 22, 25, 3389, 110, 445, 139, 143, 53, 135, 3306, 8080, 1723,
+    111, 995, 993, 5900, 1025, 587, 8888, 199, 1720, 465, 548, 113, 81, 6001, 10000,
+    514, 5060, 179, 1026, 2000, 8443, 8000, 32768, 554, 26, 1433, 49152, 2001, 515,
+    8008, 49154, 1027, 5666, 646, 5000, 5631, 631, 49153, 8081, 2049, 88, 79, 5800,
+    106, 2121, 1110, 49155, 6000, 513, 990, 5357, 427, 49156, 543, 544, 5101, 144,
+    7, 389, 8009, 3128, 444, 9999, 5009, 7070, 5190, 3000, 5432, 1900, 3986, 13,
+    1029, 9, 5051, 6646, 49157, 1028, 873, 1755, 2717, 4899, 9100, 119, 37,
+)
+
+# Local resource exhaustion: back off and retry rather than report the port
+RESOURCE_ERRORS = {
+    errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.EAGAIN, errno.EADDRNOTAVAIL,
+}
+
+PortSpec = Union[str, Iterable[Any]]
+
+
+def parse_ports(spec: PortSpec) -> List[int]:
+    """
+    Parse a port set into a sorted list of port numbers.
+
+    Accepts "topN" (the N most common ports, N <= 100), comma separated
+    ports and ranges ("22,80,8000-8100"), or an iterable of ports/strings.
+    """
+    items = spec.split(",") if isinstance(spec, str) else spec
+    ports = set()
+    for item in items:
+        if isinstance(item, int):
+            ports.add(item)
+            continue
+        item = str(item).strip().lower()
+        if not item:
+            continue
+        if item.startswith("top"):
+            count = int(item[3:])
+            if not 0 < count <= len(TOP_PORTS):
+                raise ValueError(f"top-N port sets go up to top{len(TOP_PORTS)}: {item}")
+            ports.update(TOP_PORTS[:count])
+        elif "-" in item:
+            first, last = (int(part) for part in item.split("-", 1))
+            ports.update(range(first, last + 1))
+        else:
+            ports.add(int(item))
+    if any(not 0 < port < 65536 for port in ports):
+        raise ValueError(f"Ports must be between 1 and 65535: {spec}")
+    return sorted(ports)
+
+
+class RttEstimator:
+    """Smoothed round-trip time and derived timeout (RFC 6298)"""
+
+    def __init__(self, initial_timeout: float = 1.0, min_timeout: float = 0.05,
+                 max_timeout: float = 1.0):
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.samples = 0
+
+    def update(self, rtt: float) -> None:
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.samples += 1
+
+    @property
+    def timeout(self) -> float:
+        if self.srtt is None:
+            return self.initial_timeout
+        return min(self.max_timeout, max(self.min_timeout, self.srtt + 4 * self.rttvar))
+
+    def fork(self) -> "RttEstimator":
+        """
+        A fresh per-host estimator with the same bounds.
+
+        It starts at the initial timeout: another host's RTT (localhost, the
+        next switch port) says little about this one until it answers.
+        """
+        return RttEstimator(self.initial_timeout, self.min_timeout, self.max_timeout)
+
+
+class AdaptiveWindow:
+    """
+    Limits connection attempts in flight, AIMD style.
+
+    Each answered probe grows the window (by one below the slow-start
+    threshold, by 1/size above it); congestion signals halve it, at most
+    once per cooldown so one burst of losses counts once.
+    """
+
+    def __init__(self, initial: int = 256, minimum: int = 8, maximum: int = 1024):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.size = float(min(self.maximum, max(self.minimum, initial)))
+        self.threshold = float(self.maximum)
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_shrink = 0.0
+
+    async def acquire(self) -> None:
+        while self.in_flight >= int(self.size):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    # Woken but cancelled before running: pass the slot on
+                    self._wake()
+                raise
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        free = int(self.size) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def grow(self) -> None:
+        self.size += 1 if self.size < self.threshold else 1 / self.size
+        self.size = min(self.size, float(self.maximum))
+        self._wake()
+
+    def shrink(self, cooldown: float) -> None:
+        now = time.monotonic()
+        if now - self._last_shrink < cooldown:
+            return
+        self._last_shrink = now
+        self.size = max(float(self.minimum), self.size / 2)
+        self.threshold = self.size
+
+    def saturate(self) -> None:
+        """The system ran out of sockets at the current load: drop below it right away"""
+        self.size = max(float(self.minimum), min(self.size, self.in_flight) / 2)
+        self.threshold = self.size
+
+
+class PortScanner:
+    """
+    TCP connect() scanner that needs no raw-socket privileges.
+
+    Connection attempts across all hosts share one AdaptiveWindow. Timeouts
+    follow each host's measured RTT once it has answered, and
+    running out of sockets or seeing a responsive host drop probes is
+    treated as congestion and shrinks the window.
+    """
+    # Attempts per port when the system runs out of sockets
+    RETRIES = 5
+
+    def __init__(self, concurrency: int = 256, max_concurrency: int = 1024,
+                 timeout: float = 1.0, min_timeout: float = 0.05, per_host: int = 64):
+        self.window = AdaptiveWindow(concurrency, maximum=max_concurrency)
+        self.rtt = RttEstimator(timeout, min_timeout, timeout)
+        self.per_host = max(1, per_host)
+        self.stats: Dict[str, int] = {
+            "attempts": 0, "open": 0, "closed": 0, "filtered": 0, "errors": 0,
+        }
+
+    async def _connect(self, ip: str, port: int, host_rtt: RttEstimator) -> Optional[bool]:
+        """One connection attempt: True if open, False if refused, None if no answer"""
+        loop = asyncio.get_running_loop()
+        sock = None
+        started = time.monotonic()
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), host_rtt.timeout)
+            result = True
+        except ConnectionRefusedError:
+            result = False
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            if sock is not None:
+                sock.close()
+        rtt = time.monotonic() - started
+        host_rtt.update(rtt)
+        self.rtt.update(rtt)
+        return result
+
+    async def _probe(self, ip: str, port: int, host_rtt: RttEstimator) -> Optional[bool]:
+        for _ in range(self.RETRIES):
+            await self.window.acquire()
+            self.stats["attempts"] += 1
+            try:
+                result = await self._connect(ip, port, host_rtt)
+            except OSError as e:
+                if e.errno in RESOURCE_ERRORS:
+                    self.stats["errors"] += 1
+                    self.window.saturate()
+                    continue
+                # Unreachable host/network and the like: no answer
+                result = None
+            finally:
+                self.window.release()
+
+            if result is None:
+                self.stats["filtered"] += 1
+                if host_rtt.samples:
+                    # The host answers other probes, so this drop looks like loss
+                    self.window.shrink(cooldown=host_rtt.timeout)
+            else:
+                self.stats["open" if result else "closed"] += 1
+                self.window.grow()
+            return result
+        print(f"   ⚠️  Out of sockets, could not check {ip}:{port}")
+        return None
+
+    async def scan(self, ip: str, ports: Iterable[int]) -> List[int]:
+        """Return the open ports of a host, in ascending order"""
+        ports = list(ports)
+        host_rtt = self.rtt.fork()
+        port_iter = iter(ports)
+        open_ports: List[int] = []
+
+        async def worker() -> None:
+            for port in port_iter:
+                if await self._probe(ip, port, host_rtt):
+                    open_ports.append(port)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.per_host, len(ports)))))
+        return sorted(open_ports)
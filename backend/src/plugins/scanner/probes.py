@@ -0,0 +1,37 @@
+"""
+Host Probes - Liveness checks shared by the plugin and shard worker processes
+"""
+import asyncio
+import platform
+
+
+async def ping_host(ip: str, timeout: float = 2.0) -> bool:
+    """Ping a host once with the system ping binary to check if it's alive"""
+    try:
+        windows = platform.system().lower() == 'windows'
+        param = '-n' if windows else '-c'
+        timeout_param = '-w' if windows else '-W'
+        # Windows expects milliseconds, Linux whole seconds
+        if windows:
+            timeout_value = str(int(timeout * 1000))
+        else:
+            timeout_value = str(max(1, round(timeout)))
+        command = ['ping', param, '1', timeout_param, timeout_value, ip]
+
+        result = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        await result.communicate()
+
+        # Debug: Print first successful ping
+        if result.returncode == 0 and ip.endswith('.1'):
+            print(f"✅ Successfully pinged {ip}")
+
+        return result.returncode == 0
+    except Exception as e:
+        # Only print error for gateway IP
+        if ip.endswith('.1'):
+            print(f"❌ Error pinging {ip}: {e}")
+        return False
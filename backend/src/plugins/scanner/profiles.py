@@ -0,0 +1,233 @@
+"""
+Scan Profiles - Named scan depths with their own timing, and pre-flight cost estimates
+"""
+import math
+from typing import Any, Dict, List, Optional
+
+from plugins.scanner.ports import parse_ports
+
+# Shipped profiles; plugin.json's scan_profiles can override them or add more.
+# "ports" unset means the default port selection (ports / port_profiles).
+BUILTIN_PROFILES: Dict[str, Dict[str, Any]] = {
+    "discovery": {
+        "description": "Who is up: liveness, MAC and hostname, no port scan",
+        "ports": "",
+    },
+    "quick": {
+        "description": "Liveness plus the 20 most common ports",
+        "ports": "top20",
+        "timing": {"host_timeout": 10.0},
+    },
+    "full": {
+        "description": "Default port set, plus OS detection when nmap may SYN scan",
+        "os_detection": True,
+    },
+}
+
+TIMING_KEYS = ("parallelism", "host_timeout", "max_retries", "min_rate", "max_rate")
+
+# Rough packet costs for estimates: a probe and its reply (or RST)
+PACKETS_PER_PROBE = 2
+# nmap's OS detection sends about 16 probes; with replies
+OS_DETECTION_PACKETS = 30
+# Reverse lookup: query and answer
+DNS_PACKETS = 2
+# Share of addresses expected up when nothing is known about a range
+DEFAULT_LIVE_RATIO = 0.1
+# Seconds a live host takes on average (ports and lookups run concurrently)
+LIVE_HOST_SECONDS = 0.5
+
+
+class ScanProfile:
+    """
+    How deep and how fast a scan goes.
+
+    Timing:
+        parallelism: Hosts probed at once (nmap: --max-parallelism)
+        host_timeout: Seconds allowed per host (nmap: --host-timeout)
+        max_retries: Extra liveness probes for hosts that stay silent
+        min_rate: Packets per second to keep up at least (nmap only: --min-rate)
+        max_rate: Rate never to exceed, 0 = unlimited (async backend: hosts
+            started per second; nmap: packets per second, --max-rate)
+    """
+
+    __slots__ = ("name", "description", "ports", "os_detection") + TIMING_KEYS
+
+    def __init__(self, name: str, description: str = "", ports: Optional[List[int]] = None,
+                 os_detection: bool = False, parallelism: int = 256, host_timeout: float = 30.0,
+                 max_retries: int = 0, min_rate: float = 0, max_rate: float = 0):
+        self.name = name
+        self.description = description
+        self.ports = ports
+        self.os_detection = os_detection
+        self.parallelism = parallelism
+        self.host_timeout = host_timeout
+        self.max_retries = max_retries
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+
+    @classmethod
+    def from_dict(cls, name: str, spec: Dict[str, Any],
+                  defaults: Dict[str, Any]) -> "ScanProfile":
+        """
+        Build a profile from its plugin.json form.
+
+        Timing values that are missing or null come from defaults (derived
+        from the plugin settings). Raises ValueError on bad values.
+        """
+        timing = spec.get("timing") or {}
+        unknown = set(timing) - set(TIMING_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown timing key(s) in profile {name}: {', '.join(sorted(unknown))}")
+        timing = {**defaults, **{key: value for key, value in timing.items() if value is not None}}
+        if int(timing["parallelism"]) < 1 or float(timing["host_timeout"]) <= 0:
+            raise ValueError(f"Profile {name} needs parallelism >= 1 and host_timeout > 0")
+        if int(timing["max_retries"]) < 0 or float(timing["min_rate"]) < 0 or float(timing["max_rate"]) < 0:
+            raise ValueError(f"Profile {name} has negative retries or rates")
+        if timing["max_rate"] and timing["min_rate"] > timing["max_rate"]:
+            raise ValueError(f"Profile {name} has min_rate above max_rate")
+
+        ports = spec.get("ports")
+        return cls(
+            name,
+            description=spec.get("description", ""),
+            ports=None if ports is None else parse_ports(ports),
+            os_detection=bool(spec.get("os_detection", False)),
+            parallelism=int(timing["parallelism"]),
+            host_timeout=float(timing["host_timeout"]),
+            max_retries=int(timing["max_retries"]),
+            min_rate=float(timing["min_rate"]),
+            max_rate=float(timing["max_rate"])
+        )
+
+    @property
+    def scans_ports(self) -> bool:
+        return self.ports is None or bool(self.ports)
+
+    def nmap_arguments(self, syn_scan: bool, default_ports: List[int]) -> List[str]:
+        """nmap options for this profile; without SYN privileges it is a ping scan"""
+        ports = self.ports if self.ports is not None else default_ports
+        if syn_scan and ports:
+            arguments = ['-sS', '-p', ','.join(map(str, ports))]
+            if self.os_detection:
+                arguments += ['-O', '--osscan-guess']
+        else:
+            arguments = ['-sn']
+        arguments += [
+            '--max-parallelism', str(self.parallelism),
+            '--host-timeout', f'{self.host_timeout:g}s',
+            '--max-retries', str(self.max_retries),
+        ]
+        if self.min_rate:
+            arguments += ['--min-rate', f'{self.min_rate:g}']
+        if self.max_rate:
+            arguments += ['--max-rate', f'{self.max_rate:g}']
+        return arguments
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "ports": self.ports,
+            "os_detection": self.os_detection,
+            "timing": {key: getattr(self, key) for key in TIMING_KEYS},
+        }
+
+
+def load_profiles(settings: Dict[str, Any]) -> Dict[str, ScanProfile]:
+    """The built-in profiles merged with the scan_profiles setting"""
+    defaults = {
+        "parallelism": settings.get('concurrency', 256),
+        "host_timeout": settings.get('fingerprint_timeout', 30.0),
+        "max_retries": 0,
+        "min_rate": 0,
+        "max_rate": settings.get('rate_limit', 0),
+    }
+    specs = {**BUILTIN_PROFILES, **(settings.get('scan_profiles') or {})}
+    return {name: ScanProfile.from_dict(name, spec, defaults) for name, spec in specs.items()}
+
+
+class CostModel:
+    """
+    Scan throughput measured per backend, mode and profile.
+
+    Each finished scan updates a moving average of addresses per second
+    and of the share of addresses that were up; estimate() prefers these
+    over the timing model once a scan of the same kind has run.
+    """
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self.measurements: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def key(backend: str, mode: str, profile: str) -> str:
+        return f"{backend}/{mode}/{profile}"
+
+    def record(self, backend: str, mode: str, profile: str,
+               addresses: int, seconds: float, found: int) -> None:
+        if addresses <= 0 or seconds <= 0:
+            return
+        key = self.key(backend, mode, profile)
+        rate, live = addresses / seconds, found / addresses
+        previous = self.measurements.get(key)
+        if previous is None:
+            self.measurements[key] = {"addresses_per_second": rate, "live_ratio": live, "samples": 1}
+            return
+        previous["addresses_per_second"] += self.alpha * (rate - previous["addresses_per_second"])
+        previous["live_ratio"] += self.alpha * (live - previous["live_ratio"])
+        previous["samples"] += 1
+
+    def estimate(self, profile: ScanProfile, backend: str, mode: str, addresses: int,
+                 ports_per_host: int, ping_timeout: float, os_detection: bool = False,
+                 known_hosts: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Expected duration and packets of a scan before it runs.
+
+        Args:
+            addresses: Addresses in the requested ranges
+            ports_per_host: Ports each live host gets probed on
+            ping_timeout: What a silent address costs per liveness probe
+            os_detection: Whether this scan will run nmap OS detection
+            known_hosts: Inventory devices inside the ranges, a live-host
+                guess when nothing was measured yet
+        """
+        measured = self.measurements.get(self.key(backend, mode, profile.name))
+        if measured is not None:
+            live_ratio = measured["live_ratio"]
+        elif known_hosts:
+            live_ratio = min(1.0, known_hosts / max(1, addresses))
+        else:
+            live_ratio = DEFAULT_LIVE_RATIO
+        live = addresses * live_ratio
+        silent = addresses - live
+
+        # Silent addresses get every retry and never answer
+        packets = live * PACKETS_PER_PROBE + silent * (1 + profile.max_retries)
+        packets += live * (ports_per_host * PACKETS_PER_PROBE + DNS_PACKETS)
+        if os_detection:
+            packets += live * OS_DETECTION_PACKETS
+
+        if measured is not None:
+            seconds = addresses / measured["addresses_per_second"]
+        else:
+            per_address = (silent * ping_timeout * (1 + profile.max_retries)
+                           + live * LIVE_HOST_SECONDS) / max(1, addresses)
+            seconds = math.ceil(addresses / profile.parallelism) * per_address
+            if profile.max_rate and backend == 'nmap':
+                # nmap paces what it sends, about half of the packets
+                seconds = max(seconds, packets / PACKETS_PER_PROBE / profile.max_rate)
+            elif profile.max_rate:
+                seconds = max(seconds, addresses / profile.max_rate)
+
+        return {
+            "profile": profile.name,
+            "backend": backend,
+            "mode": mode,
+            "addresses": addresses,
+            "expected_hosts": round(live),
+            "seconds": round(seconds, 1),
+            "packets": round(packets),
+            "basis": "measured" if measured is not None else "model",
+            "samples": int(measured["samples"]) if measured is not None else 0,
+        }
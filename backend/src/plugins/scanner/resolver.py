@@ -0,0 +1,98 @@
+"""
+Reverse DNS - Cached, bounded PTR lookups that stay off the default thread pool
+"""
+import asyncio
+import socket
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class ReverseResolver:
+    """
+    Resolves IPs to hostnames with an LRU cache.
+
+    Lookups run on a dedicated, fixed-size thread pool so a slow resolver
+    cannot starve asyncio.to_thread users elsewhere in the API. Successful
+    answers are cached for ttl seconds, failures and timeouts for
+    negative_ttl, and concurrent lookups for the same IP share one query.
+    """
+
+    def __init__(self, max_workers: int = 16, cache_size: int = 4096,
+                 ttl: float = 3600, negative_ttl: float = 300, timeout: float = 2.0):
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rdns")
+        self._cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, ip: str) -> Optional[str]:
+        """Return the cached hostname ("" for a cached failure), or None if unknown/expired"""
+        entry = self._cache.get(ip)
+        if entry is None:
+            return None
+        hostname, expires = entry
+        if expires < time.monotonic():
+            del self._cache[ip]
+            return None
+        self._cache.move_to_end(ip)
+        return hostname
+
+    def _store(self, ip: str, hostname: str) -> None:
+        ttl = self.ttl if hostname else self.negative_ttl
+        self._cache[ip] = (hostname, time.monotonic() + ttl)
+        self._cache.move_to_end(ip)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _lookup(ip: str) -> str:
+        try:
+            return socket.gethostbyaddr(ip)[0]
+        except (OSError, UnicodeError):
+            return ""
+
+    async def _query(self, ip: str) -> str:
+        loop = asyncio.get_running_loop()
+        try:
+            hostname = await asyncio.wait_for(
+                loop.run_in_executor(self._executor, self._lookup, ip),
+                timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            hostname = ""
+        self._store(ip, hostname)
+        return hostname
+
+    async def resolve(self, ip: str) -> str:
+        """Return the PTR name for an IP, or "" if it has none"""
+        hostname = self.cached(ip)
+        if hostname is not None:
+            self.hits += 1
+            return hostname
+
+        self.misses += 1
+        future = self._inflight.get(ip)
+        if future is None:
+            future = asyncio.ensure_future(self._query(ip))
+            self._inflight[ip] = future
+            future.add_done_callback(lambda _: self._inflight.pop(ip, None))
+        # Shield so one caller timing out does not cancel the shared lookup
+        return await asyncio.shield(future)
+
+    async def resolve_many(self, ips: Iterable[str]) -> Dict[str, str]:
+        """Resolve a batch of IPs concurrently (bounded by the pool size)"""
+        unique = list(dict.fromkeys(ips))
+        names = await asyncio.gather(*(self.resolve(ip) for ip in unique))
+        return dict(zip(unique, names))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -2,49 +2,107 @@
 Scanner Plugin - Network device discovery and monitoring
 """
 import asyncio
-import socket
+import ipaddress
+import os
 import netifaces
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Set
 from datetime import datetime
 import platform
 import subprocess
-import re
+import time
 
-
-class Device:
-    """Represents a network device"""
-    def __init__(self, ip: str, mac: str = "", hostname: str = "", 
-                 vendor: str = "", status: str = "active"):
-        self.ip = ip
-        self.mac = mac
-        self.hostname = hostname
-        self.vendor = vendor
-        self.status = status
-        self.first_seen = datetime.now()
-        self.last_seen = datetime.now()
-        self.ports = []
-    
-    def to_dict(self) -> Dict[str, Any]:
-        return {
-            "ip": self.ip,
-            "mac": self.mac,
-            "hostname": self.hostname,
-            "vendor": self.vendor,
-            "status": self.status,
-            "first_seen": self.first_seen.isoformat(),
-            "last_seen": self.last_seen.isoformat(),
-            "ports": self.ports
-        }
+from plugins.scanner.capabilities import detect_capabilities
+from plugins.scanner.device import Device, serialize_devices
+from plugins.scanner.device_index import DeviceIndex
+from plugins.scanner.history import Observation
+from plugins.scanner.jobs import ScanJob, ScanScheduler
+from plugins.scanner.monitor import ChangeFeed, Monitor
+from plugins.scanner.neighbors import NeighborTable
+from plugins.scanner.nmap_xml import NmapError, NmapHost, stream_host_batches
+from plugins.scanner.oui import load_index
+from plugins.scanner.ports import PortScanner, parse_ports
+from plugins.scanner.profiles import CostModel, ScanProfile, load_profiles
+from plugins.scanner.probes import ping_host
+from plugins.scanner.resolver import ReverseResolver
+from plugins.scanner.shards import ShardPool, resolve_processes, split_shards
+from plugins.scanner.snapshot import VersionedSnapshot
+from plugins.scanner.sweep import (
+    ScanProgress, SweepEngine, count_hosts, host_ranges, iter_hosts, parse_networks
+)
 
 
 class ScannerPlugin(BasePlugin):
     """Network Scanner Plugin"""
     
+    BACKENDS = ("async", "nmap")
+    MODES = ("full", "incremental")
+    
     def __init__(self, plugin_dir: Path):
         super().__init__(plugin_dir)
+        self.settings = self.metadata.settings
+        # In-memory write-through cache over the persistent store
         self.devices: Dict[str, Device] = {}
-        self.is_scanning = False
+        self.snapshot = VersionedSnapshot(self._list_devices)
+        self.index = DeviceIndex()
+        self.store = None
+        self.history = None
+        self._oui = None
+        self.neighbors = NeighborTable(self.settings.get('neighbor_refresh_interval', 0.5))
+        self.resolver = ReverseResolver(
+            max_workers=self.settings.get('dns_workers', 16),
+            cache_size=self.settings.get('dns_cache_size', 4096),
+            ttl=self.settings.get('dns_ttl', 3600),
+            negative_ttl=self.settings.get('dns_negative_ttl', 300),
+            timeout=self.settings.get('dns_timeout', 2.0)
+        )
+        self.scheduler = ScanScheduler(
+            self._run_scan,
+            workers=self.settings.get('scan_workers', 2),
+            history=self.settings.get('scan_history', 100),
+            on_event=self._on_job_event
+        )
+        self.port_scanner = PortScanner(
+            concurrency=self.settings.get('port_concurrency', 256),
+            max_concurrency=self.settings.get('port_max_concurrency', 1024),
+            timeout=self.settings.get('port_timeout', 1.0)
+        )
+        self.ports = parse_ports(self.settings.get('ports', 'top100'))
+        # Named scan depths and timing, and what past scans of each cost
+        self.profiles = load_profiles(self.settings)
+        self.cost_model = CostModel()
+        # Per-device port sets, most specific range first
+        self.port_profiles = sorted(
+            (
+                (ipaddress.ip_network(target, strict=False), parse_ports(spec))
+                for target, spec in self.settings.get('port_profiles', {}).items()
+            ),
+            key=lambda profile: profile[0].prefixlen,
+            reverse=True
+        )
+        self.changes = ChangeFeed(
+            self.settings.get('change_history', 1000),
+            on_publish=lambda event: self.publish("change", event)
+        )
+        # Consecutive missed checks per known IP, reset whenever it answers
+        self.misses: Dict[str, int] = {}
+        self.monitor = Monitor(
+            self._liveness_check,
+            self._monitor_scan,
+            interval=self.settings.get('monitor_interval', 60),
+            scan_interval=self.settings.get('monitor_scan_interval', 3600),
+            jitter=self.settings.get('monitor_jitter', 0.1)
+        )
+        # Liveness sweeps of large ranges run in worker processes when enabled
+        processes = resolve_processes(self.settings.get('scan_processes', 0))
+        self.shard_pool = ShardPool(processes) if processes > 1 else None
+        # Set when taking over from a hot-reloaded instance that was monitoring
+        self._resume_monitor = False
+        # Whether monitoring ran when export_state() stopped it for a reload
+        self._handed_over_monitor = False
+        # What this host lets us do (privileges, nmap, ping); see _capability_profile
+        self.capabilities: Optional[Dict[str, Any]] = None
+        self._capability_task: Optional[asyncio.Task] = None
         
     async def initialize(self) -> bool:
         """Initialize the scanner plugin"""
@@ -53,303 +111,1291 @@ class ScannerPlugin(BasePlugin):
             interfaces = netifaces.interfaces()
             if not interfaces:
                 return False
+            self._register_metrics()
+            if self.capabilities is None:
+                # In the background, so startup does not wait for nmap
+                self._capability_task = asyncio.create_task(
+                    detect_capabilities(self.settings.get('nmap_path', 'nmap'))
+                )
+            await self._open_store()
+            self.scheduler.start()
+            if self.settings.get('monitor', False) or self._resume_monitor:
+                self.monitor.start()
             return True
         except Exception as e:
             print(f"Scanner initialization failed: {e}")
             return False
     
+    def _register_metrics(self) -> None:
+        """Scan metrics on the shared registry; gauges read the live state on each scrape"""
+        self._phase_seconds = self.metrics.histogram(
+            "scanner_scan_phase_duration_seconds",
+            "Time per scan phase (enrichment_host_seconds adds up across concurrently fingerprinted hosts)",
+            ("phase", "backend", "mode")
+        )
+        self._hosts_per_second = self.metrics.histogram(
+            "scanner_scan_hosts_per_second",
+            "Addresses probed per second of probing, per scan",
+            ("backend", "mode"),
+            buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+        )
+        self._fingerprint_seconds = self.metrics.histogram(
+            "scanner_fingerprint_duration_seconds",
+            "Time to fingerprint one host (hostname, ports, MAC, vendor)"
+        )
+        self._persist_seconds = self.metrics.histogram(
+            "scanner_persist_duration_seconds",
+            "Time to write one batch of devices to the inventory store"
+        )
+        self._scans = self.metrics.counter(
+            "scanner_scans_total",
+            "Finished scan jobs by outcome",
+            ("status",)
+        )
+        self.metrics.gauge(
+            "scanner_scan_jobs",
+            "Scan jobs waiting or running",
+            ("state",),
+            collect=lambda: {
+                ("queued",): len(self.scheduler.pending),
+                ("running",): self.scheduler.running
+            }
+        )
+        self.metrics.gauge(
+            "scanner_devices",
+            "Devices in the inventory",
+            collect=lambda: len(self.devices)
+        )
+        self.metrics.gauge(
+            "scanner_port_window",
+            "Adaptive limit on TCP connects in flight",
+            collect=lambda: int(self.port_scanner.window.size)
+        )
+        self.metrics.gauge(
+            "scanner_port_connects_in_flight",
+            "TCP connects in flight",
+            collect=lambda: self.port_scanner.window.in_flight
+        )
+    
+    def _on_job_event(self, job: ScanJob, event: Dict[str, Any]) -> None:
+        self.publish("scan", {"job_id": job.id, **event})
+        if event.get("event") in ("complete", "error", "cancelled"):
+            self._scans.inc(status=event["event"])
+    
+    async def export_state(self) -> Dict[str, Any]:
+        """
+        Hand the inventory, change feed, scan jobs and monitor state to a reloaded instance.
+        
+        Scans and monitoring stop first, so nothing changes the inventory
+        after it was exported; resume() restarts them if the reload fails.
+        """
+        self._handed_over_monitor = self.monitor.running
+        await self.monitor.stop()
+        jobs = await self.scheduler.hand_over()
+        return {
+            "devices": [device.to_record() for device in self.devices.values()],
+            "misses": dict(self.misses),
+            "changes": list(self.changes.events),
+            "last_change_id": self.changes.last_id,
+            "jobs": jobs,
+            "monitor": self._handed_over_monitor,
+            "capabilities": self.capabilities,
+            "scan_costs": self.cost_model.measurements
+        }
+    
+    async def resume(self) -> None:
+        """The reload failed: carry on with the scans and monitoring export_state() stopped"""
+        self.scheduler.resume()
+        if self._handed_over_monitor:
+            self.monitor.start()
+    
+    async def import_state(self, state: Dict[str, Any]) -> None:
+        """Take over from the previous instance; queued and running scans are run again"""
+        for record in state.get("devices", []):
+            device = Device(**{key: value for key, value in record.items() if key != "ports"})
+            device.ports = record["ports"]
+            self.devices[device.ip] = device
+            self.index.update(device)
+        self.snapshot.touch()
+        self.misses.update(state.get("misses", {}))
+        self.changes.events.extend(state.get("changes", []))
+        self.changes.last_id = state.get("last_change_id", 0)
+        self.scheduler.restore_jobs(state.get("jobs", []))
+        self._resume_monitor = state.get("monitor", False)
+        self.capabilities = state.get("capabilities")
+        self.cost_model.measurements.update(state.get("scan_costs", {}))
+    
+    async def _open_store(self) -> None:
+        """Open the inventory database and warm the device cache from it"""
+        if not self.settings.get('persist', True):
+            return
+        
+        url = os.environ.get('DATABASE_URL') or self.settings.get(
+            'database_url', 'sqlite+aiosqlite:///./data/redsec.db'
+        )
+        try:
+            from plugins.scanner.inventory import DeviceStore
+            
+            store = DeviceStore(url)
+            await store.open()
+            for record in await store.load_all():
+                device = Device.from_record(record)
+                if device.ip in self.devices:
+                    # Taken over from a reloaded instance, which may be newer
+                    continue
+                self.devices[device.ip] = device
+                self.index.update(device)
+            self.snapshot.touch()
+            self.store = store
+            print(f"💾 Loaded {len(self.devices)} device(s) from inventory")
+        except Exception as e:
+            # Scanning still works without persistence
+            print(f"⚠️  Inventory database unavailable, keeping devices in memory only: {e}")
+            return
+        
+        if self.settings.get('history', True):
+            try:
+                from plugins.scanner.history import HistoryStore
+                
+                history = HistoryStore(
+                    self.store.engine,
+                    raw_days=self.settings.get('history_raw_days', 7),
+                    hourly_days=self.settings.get('history_hourly_days', 90),
+                    daily_days=self.settings.get('history_daily_days', 730),
+                    compact_interval=self.settings.get('history_compact_interval', 3600)
+                )
+                await history.open()
+                self.history = history
+            except Exception as e:
+                print(f"⚠️  Scan history unavailable: {e}")
+    
+    async def _persist(self, devices: List[Device]) -> None:
+        """Write a batch of devices through to the inventory store"""
+        if not self.store or not devices:
+            return
+        try:
+            with self._persist_seconds.time():
+                await self.store.upsert_many(d.to_record() for d in devices)
+        except Exception as e:
+            print(f"⚠️  Failed to persist {len(devices)} device(s): {e}")
+    
+    async def _record_history(self, kind: str, observations: List[Observation], started_at: float,
+                              backend: str = "", network: str = "") -> None:
+        """Append one scan's per-host observations to the scan history"""
+        if not self.history or not observations:
+            return
+        try:
+            await self.history.record(kind, observations, started_at, backend, network or "")
+        except Exception as e:
+            print(f"⚠️  Failed to record scan history: {e}")
+    
+    @staticmethod
+    def _observation(device: Device, up: bool, probed: bool = True) -> Observation:
+        """A history entry for a host; ports are None when this pass did not scan them"""
+        return device.ip_int, up, list(device.ports) if probed else None, device.os_info, device.mac
+    
+    def _record_device(self, device: Device) -> Device:
+        """Merge a fresh observation into the cache, keeping first_seen"""
+        previous = self.devices.get(device.ip)
+        if previous:
+            device.merge(previous)
+        self.devices[device.ip] = device
+        self.index.update(device)
+        self.snapshot.touch()
+        return device
+    
+    def _observe(self, device: Device) -> tuple[str, List[str]]:
+        """
+        Record a host that answered and publish what changed about it.
+        
+        Returns:
+            ("added" | "changed" | "unchanged", names of the changed fields)
+        """
+        previous = self.devices.get(device.ip)
+        self._record_device(device)
+        self.misses.pop(device.ip, None)
+        if previous is None:
+            self.changes.publish("appeared", device.ip, device=device.to_dict())
+            return "added", []
+        
+        if previous.status != "active":
+            self.changes.publish("appeared", device.ip, device=device.to_dict())
+        if previous.mac and device.mac and previous.mac != device.mac:
+            self.changes.publish("mac_changed", device.ip, old=previous.mac, new=device.mac)
+        old_ports, new_ports = set(previous.ports), set(device.ports)
+        for port in sorted(new_ports - old_ports):
+            self.changes.publish("port_opened", device.ip, port=port)
+        for port in sorted(old_ports - new_ports):
+            self.changes.publish("port_closed", device.ip, port=port)
+        
+        fields = device.changes_from(previous)
+        return ("changed" if fields else "unchanged"), fields
+    
+    def _observe_missing(self, device: Device) -> bool:
+        """
+        Count a missed check for a known host.
+        
+        Returns:
+            True if this miss reached miss_threshold and the host is now inactive
+        """
+        misses = self.misses.get(device.ip, 0) + 1
+        self.misses[device.ip] = misses
+        if device.status != "active" or misses < self.settings.get('miss_threshold', 3):
+            return False
+        device.status = "inactive"
+        self.index.update(device)
+        self.snapshot.touch()
+        self.changes.publish("disappeared", device.ip, misses=misses)
+        return True
+    
     def _get_default_gateway_and_subnet(self) -> tuple[Optional[str], Optional[str]]:
-        """Get the default gateway and subnet"""
+        """Get the default gateway and the CIDR subnet of its interface"""
         try:
             gws = netifaces.gateways()
             default_gw = gws['default'][netifaces.AF_INET]
-            interface = default_gw[1]
-            
-            addrs = netifaces.ifaddresses(interface)
-            if netifaces.AF_INET in addrs:
-                addr_info = addrs[netifaces.AF_INET][0]
-                ip = addr_info['addr']
-                netmask = addr_info.get('netmask', '255.255.255.0')
-                
-                # Calculate network range
-                ip_parts = ip.split('.')
-                netmask_parts = netmask.split('.')
-                
-                network = '.'.join([
-                    str(int(ip_parts[i]) & int(netmask_parts[i])) 
-                    for i in range(4)
-                ])
-                
-                return default_gw[0], network
+            networks = self._get_interface_networks([default_gw[1]])
+            if networks:
+                return default_gw[0], networks[0]
         except Exception as e:
             print(f"Error getting network info: {e}")
         
         return None, None
     
-    async def _ping_host(self, ip: str) -> bool:
-        """Ping a host to check if it's alive"""
-        try:
-            param = '-n' if platform.system().lower() == 'windows' else '-c'
-            timeout_param = '-w' if platform.system().lower() == 'windows' else '-W'
-            # Increased timeout to 2000ms for Windows, 2s for Linux
-            timeout_value = '2000' if platform.system().lower() == 'windows' else '2'
-            command = ['ping', param, '1', timeout_param, timeout_value, ip]
-            
-            result = await asyncio.create_subprocess_exec(
-                *command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await result.communicate()
-            
-            # Debug: Print first successful ping
-            if result.returncode == 0 and ip.endswith('.1'):
-                print(f"✅ Successfully pinged {ip}")
+    def _get_interface_networks(self, interfaces: Optional[List[str]] = None) -> List[str]:
+        """
+        Subnets (CIDR, using each address's real netmask) attached to interfaces.
+        
+        Args:
+            interfaces: Interface names to inspect (all interfaces if None)
             
-            return result.returncode == 0
-        except Exception as e:
-            # Only print error for gateway IP
-            if ip.endswith('.1'):
-                print(f"❌ Error pinging {ip}: {e}")
-            return False
+        Returns:
+            Unique subnets, skipping loopback and link-local addresses
+        """
+        networks: List[str] = []
+        for interface in interfaces if interfaces is not None else netifaces.interfaces():
+            try:
+                addrs = netifaces.ifaddresses(interface).get(netifaces.AF_INET, [])
+            except ValueError:
+                print(f"   ⚠️  Unknown interface: {interface}")
+                continue
+            for addr_info in addrs:
+                try:
+                    address = ipaddress.ip_interface(
+                        f"{addr_info['addr']}/{addr_info.get('netmask', '255.255.255.0')}"
+                    )
+                except (KeyError, ValueError):
+                    continue
+                if address.ip.is_loopback or address.ip.is_link_local:
+                    continue
+                network = str(address.network)
+                if network not in networks:
+                    networks.append(network)
+        return networks
+    
+    async def _ping_host(self, ip: str, timeout: float = 2.0) -> bool:
+        """Ping a host to check if it's alive"""
+        return await ping_host(ip, timeout)
     
     async def _get_hostname(self, ip: str) -> str:
-        """Try to get hostname for an IP"""
-        try:
-            hostname = await asyncio.to_thread(socket.gethostbyaddr, ip)
-            return hostname[0]
-        except:
-            return ""
+        """Try to get hostname for an IP (cached reverse DNS)"""
+        return await self.resolver.resolve(ip)
     
-    async def _get_mac_address(self, ip: str) -> str:
-        """Get MAC address for an IP (platform dependent)"""
-        try:
-            if platform.system().lower() == 'windows':
-                result = await asyncio.create_subprocess_exec(
-                    'arp', '-a', ip,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                stdout, _ = await result.communicate()
-                output = stdout.decode()
-                
-                # Parse ARP output
-                mac_pattern = r'([0-9a-fA-F]{2}[:-]){5}([0-9a-fA-F]{2})'
-                match = re.search(mac_pattern, output)
-                if match:
-                    return match.group(0).replace('-', ':').upper()
-            else:
-                # Linux/Mac
-                result = await asyncio.create_subprocess_exec(
-                    'arp', '-n', ip,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                stdout, _ = await result.communicate()
-                output = stdout.decode()
-                
-                mac_pattern = r'([0-9a-fA-F]{2}:){5}([0-9a-fA-F]{2})'
-                match = re.search(mac_pattern, output)
-                if match:
-                    return match.group(0).upper()
-        except Exception as e:
-            print(f"Error getting MAC for {ip}: {e}")
+    async def _get_mac_address(self, ip: str, probed_at: Optional[float] = None) -> str:
+        """
+        Get MAC address for an IP from the shared neighbor table.
         
-        return ""
+        Args:
+            ip: Address to resolve
+            probed_at: Monotonic time the host answered; lets a miss trigger
+                a table re-read that would include the fresh ARP entry
+        """
+        return await self.neighbors.lookup(ip, probed_at)
     
     def _get_vendor_from_mac(self, mac: str) -> str:
         """Get vendor name from MAC address (OUI lookup)"""
-        # This is a simplified version. In production, use an OUI database
-        oui_db = {
-            "00:50:56": "VMware",
-            "08:00:27": "VirtualBox",
-            "52:54:00": "QEMU/KVM",
-            "00:1B:63": "Apple",
-            "00:25:00": "Apple",
-            "DC:A6:32": "Raspberry Pi",
-            "B8:27:EB": "Raspberry Pi",
-        }
+        if not mac:
+            return ""
+        if self._oui is None:
+            # Loaded on first use, then shared by every lookup
+            self._oui = load_index(self.settings.get('oui_database', 'data/oui.bin'))
+        return self._oui.lookup(mac) or "Unknown"
+    
+    async def _check_alive(self, ip: str, retries: int = 0) -> Optional[tuple[str, str]]:
+        """Cheap liveness probe: ping (again up to retries times), then read the MAC. Returns (ip, mac) if up."""
+        for _ in range(1 + retries):
+            if await self._ping_host(ip, self.settings.get('ping_timeout', 2.0)):
+                return ip, await self._get_mac_address(ip, time.monotonic())
+        return None
+    
+    def _ports_for(self, ip: str) -> List[int]:
+        """Ports to check on a host: its port profile if one matches, else the default set"""
+        address = ipaddress.ip_address(ip)
+        for network, ports in self.port_profiles:
+            if address in network:
+                return ports
+        return self.ports
+    
+    async def _scan_ports(self, ip: str, ports: Optional[List[int]] = None) -> List[int]:
+        """Open TCP ports of a host among ports (default: _ports_for), found with the built-in connect scanner"""
+        if ports is None:
+            ports = self._ports_for(ip)
+        if not self.settings.get('port_scan', True) or not ports:
+            return []
+        return await self.port_scanner.scan(ip, ports)
+    
+    async def _fingerprint_device(self, ip: str, mac: str = "",
+                                  progress: Optional[ScanProgress] = None,
+                                  profile: Optional[ScanProfile] = None) -> Device:
+        """Run the expensive identification stage for a host known to be up"""
+        started = time.perf_counter()
+        port_set = profile.ports if profile is not None else None
+        hostname, ports = await asyncio.gather(self._get_hostname(ip), self._scan_ports(ip, port_set))
+        if not mac:
+            mac = await self._get_mac_address(ip)
+        vendor = self._get_vendor_from_mac(mac)
         
-        if mac:
-            oui = mac[:8].upper()
-            return oui_db.get(oui, "Unknown")
-        return ""
+        device = Device(
+            ip=ip,
+            mac=mac,
+            hostname=hostname,
+            vendor=vendor,
+            status="active"
+        )
+        self._set_ports(device, ports, profile)
+        elapsed = time.perf_counter() - started
+        self._fingerprint_seconds.observe(elapsed)
+        if progress is not None:
+            progress.add_span("enrichment", started, elapsed)
+            progress.add_time("enrichment_host_seconds", elapsed)
+        return device
+    
+    def _set_ports(self, device: Device, ports: List[int], profile: Optional[ScanProfile]) -> None:
+        """Store a scan's port findings; a profile that scans no ports keeps the known ones"""
+        previous = self.devices.get(device.ip)
+        if profile is not None and not profile.scans_ports and previous is not None:
+            device.ports = previous.ports
+            device.fingerprinted_at = previous.fingerprinted_at
+            return
+        device.ports = ports
+        device.fingerprinted_at = device.last_seen
     
-    async def _scan_device(self, ip: str) -> Optional[Device]:
+    async def _scan_device(self, ip: str, progress: Optional[ScanProgress] = None,
+                           profile: Optional[ScanProfile] = None) -> Optional[Device]:
         """Scan a single device"""
-        if await self._ping_host(ip):
-            hostname = await self._get_hostname(ip)
-            mac = await self._get_mac_address(ip)
-            vendor = self._get_vendor_from_mac(mac)
-            
-            device = Device(
-                ip=ip,
-                mac=mac,
-                hostname=hostname,
-                vendor=vendor,
-                status="active"
-            )
-            return device
+        alive = await self._check_alive(ip, profile.max_retries if profile is not None else 0)
+        if alive:
+            return await self._fingerprint_device(*alive, progress, profile)
         return None
     
-    async def scan_network(self, network_range: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Scan the network for devices using nmap"""
-        if self.is_scanning:
-            return [d.to_dict() for d in self.devices.values()]
+    def _needs_fingerprint(self, previous: Optional[Device], mac: str) -> bool:
+        """Whether an incremental scan must re-run the expensive stage for a host"""
+        if previous is None or previous.fingerprinted_at is None:
+            return True
+        if mac and previous.mac and mac != previous.mac:
+            return True
+        age = (datetime.now() - previous.fingerprinted_at).total_seconds()
+        return age > self.settings.get('fingerprint_ttl', 3600)
+    
+    def _detect_network_range(self) -> Optional[str]:
+        """
+        Work out the range(s) to scan from the local interfaces.
+        
+        The "interfaces" setting picks them: "default" (the default route
+        interface), "all", or a list of interface names.
+        """
+        print("🔍 Detecting network configuration...")
+        interfaces = self.settings.get('interfaces', 'default')
+        if interfaces == 'default':
+            gateway, subnet = self._get_default_gateway_and_subnet()
+            print(f"   Gateway: {gateway}")
+            networks = [subnet] if subnet else []
+        else:
+            networks = self._get_interface_networks(None if interfaces == 'all' else interfaces)
+        print(f"   Subnet: {', '.join(networks) or None}")
+        
+        if not networks:
+            print("❌ Could not detect network subnet")
+            return None
+        return ', '.join(networks)
+    
+    def _sweep_engine(self, probe, progress: ScanProgress, fingerprint: bool = False,
+                      profile: Optional[ScanProfile] = None) -> SweepEngine:
+        """
+        Build a sweep engine configured from the scan profile (default: the settings).
         
-        self.is_scanning = True
-        discovered_devices = []
+        Probes that fingerprint (hostname, ports) get the profile's
+        host_timeout per host; liveness probes get host_timeout from the
+        settings, stretched for the profile's retries.
+        """
+        profile = profile or self.profiles[self.settings.get('scan_profile', 'full')]
+        if fingerprint:
+            host_timeout = profile.host_timeout
+        else:
+            host_timeout = self.settings.get('host_timeout', 3.0) * (1 + profile.max_retries)
+        return SweepEngine(
+            probe,
+            concurrency=profile.parallelism,
+            host_timeout=host_timeout,
+            rate=profile.max_rate,
+            progress=progress
+        )
+    
+    def _shard_plan(self, networks: List[Any]) -> Optional[List[List[tuple[int, int]]]]:
+        """Split a scan into shards for the worker processes, or None to sweep in-process"""
+        if not self.shard_pool:
+            return None
+        shard_size = self.settings.get('shard_size', 1024)
+        ranges = host_ranges(networks)
+        if sum(last - first + 1 for first, last in ranges) <= shard_size:
+            return None
+        return split_shards(ranges, shard_size)
+    
+    async def _shard_batches(self, shards: List[List[tuple[int, int]]], progress: ScanProgress,
+                             profile: ScanProfile) -> AsyncIterator[Optional[Dict[str, str]]]:
+        """Run liveness sweeps in the shard pool, yielding {ip: mac} per finished shard"""
+        print(f"🚀 Checking liveness in {len(shards)} shard(s) "
+              f"across {self.shard_pool.processes} process(es)...")
+        batches = self.shard_pool.sweep(
+            shards, progress,
+            heartbeat=self.settings.get('progress_interval', 1.0),
+            concurrency=profile.parallelism,
+            ping_timeout=self.settings.get('ping_timeout', 2.0),
+            host_timeout=self.settings.get('host_timeout', 3.0) * (1 + profile.max_retries),
+            rate=profile.max_rate,
+            retries=profile.max_retries
+        )
+        async for alive in batches:
+            if alive is None:
+                yield None
+                continue
+            # The workers' pings filled the (system-wide) neighbor table
+            probed_at = time.monotonic()
+            yield {ip: await self._get_mac_address(ip, probed_at) for ip in alive}
+    
+    async def _alive_hosts(self, networks: List[Any], progress: ScanProgress,
+                           profile: ScanProfile) -> AsyncIterator[Optional[tuple[str, str]]]:
+        """Yield (ip, mac) for every host that answers, sharded when the range is large"""
+        shards = self._shard_plan(networks)
+        if shards is None:
+            engine = self._sweep_engine(
+                lambda ip: self._check_alive(ip, profile.max_retries), progress, profile=profile
+            )
+            print(f"🚀 Checking liveness ({engine.concurrency} in flight)...")
+            hosts = iter_hosts(networks, self.settings.get('max_hosts', 0))
+            heartbeat = self.settings.get('progress_interval', 1.0)
+            async for alive in engine.sweep(hosts, heartbeat=heartbeat):
+                yield alive
+            return
+        
+        async for batch in self._shard_batches(shards, progress, profile):
+            if batch is None:
+                yield None
+                continue
+            for alive in batch.items():
+                yield alive
+    
+    async def _sweep_devices(self, networks: List[Any], progress: ScanProgress,
+                             profile: ScanProfile) -> AsyncIterator[Optional[Device]]:
+        """Discover devices with the built-in asyncio sweep engine"""
+        heartbeat = self.settings.get('progress_interval', 1.0)
+        shards = self._shard_plan(networks)
+        if shards is not None:
+            # Liveness runs in the worker processes; fingerprint each shard's hosts here
+            async for batch in self._shard_batches(shards, progress, profile):
+                if batch is None:
+                    yield None
+                    continue
+                engine = self._sweep_engine(
+                    lambda ip: self._fingerprint_device(ip, batch[ip], progress, profile),
+                    ScanProgress(len(batch)),
+                    fingerprint=True,
+                    profile=profile
+                )
+                async for device in engine.sweep(batch, heartbeat=heartbeat):
+                    yield device
+            print(f"   Probed {progress.probed} host(s)")
+            return
         
+        hosts = iter_hosts(networks, self.settings.get('max_hosts', 0))
+        engine = self._sweep_engine(
+            lambda ip: self._scan_device(ip, progress, profile), progress,
+            fingerprint=True, profile=profile
+        )
+        
+        print(f"🚀 Starting async sweep ({engine.concurrency} in flight)...")
+        async for device in engine.sweep(hosts, heartbeat=heartbeat):
+            yield device
+        print(f"   Probed {progress.probed} host(s)")
+    
+    async def _incremental_devices(self, networks: List[Any], backend: str, progress: ScanProgress,
+                                   profile: ScanProfile) -> AsyncIterator[Optional[Device]]:
+        """
+        Check liveness across the range, then fingerprint only what changed.
+        
+        Hosts that are new, whose MAC changed, or whose fingerprint is older
+        than fingerprint_ttl go through the expensive stage; everything else
+        is refreshed from the cached device.
+        """
+        heartbeat = self.settings.get('progress_interval', 1.0)
+        stale: Dict[str, str] = {}
+        async for alive in self._alive_hosts(networks, progress, profile):
+            if alive is None:
+                yield None
+                continue
+            ip, mac = alive
+            previous = self.devices.get(ip)
+            if self._needs_fingerprint(previous, mac):
+                stale[ip] = mac
+            else:
+                yield previous.refreshed(mac)
+        
+        print(f"   {progress.found} host(s) up, {len(stale)} need fingerprinting")
+        if not stale:
+            return
+        
+        if backend == 'nmap':
+            devices = self._nmap_devices(list(stale), ScanProgress(len(stale)), profile)
+        else:
+            engine = self._sweep_engine(
+                lambda ip: self._fingerprint_device(ip, stale[ip], progress, profile),
+                ScanProgress(len(stale)),
+                fingerprint=True,
+                profile=profile
+            )
+            devices = engine.sweep(stale, heartbeat=heartbeat)
+        started = time.perf_counter()
+        async for device in devices:
+            yield device
+        if backend == 'nmap':
+            # The whole nmap pass is fingerprinting here
+            progress.add_span("enrichment", started, time.perf_counter() - started)
+    
+    async def _capability_profile(self, refresh: bool = False) -> Dict[str, Any]:
+        """
+        The cached capability profile.
+        
+        Detected at initialize, then again only when asked to (refresh) or
+        when nmap_path no longer matches the nmap that was checked.
+        """
+        binary = self.settings.get('nmap_path', 'nmap')
+        while True:
+            task = self._capability_task
+            if task is None:
+                stale = self.capabilities is not None and self.capabilities['nmap']['binary'] != binary
+                if not (refresh or stale or self.capabilities is None):
+                    return self.capabilities
+                task = self._capability_task = asyncio.create_task(detect_capabilities(binary))
+                refresh = False
+            # A detection already running may be for an earlier nmap_path: checked on the next pass
+            try:
+                self.capabilities = await task
+            finally:
+                if self._capability_task is task:
+                    self._capability_task = None
+    
+    async def _nmap_arguments(self, profile: ScanProfile) -> List[str]:
+        """Pick nmap options for a profile from the cached capability profile"""
+        syn_scan = (await self._capability_profile())['nmap']['syn_scan']
+        if not syn_scan and profile.scans_ports:
+            # No privileges for SYN scan, use simple ping scan
+            print(f"   ℹ️  Running basic network scan (ping + ARP)")
+            if platform.system().lower() == 'windows':
+                print(f"   💡 For OS detection: Run as Administrator + allow firewall")
+            else:
+                print(f"   💡 For OS detection: Run with sudo")
+        elif syn_scan and profile.os_detection:
+            print(f"   ✅ Running with OS detection enabled (SYN scan)")
+            print(f"   ⏱️  This will take longer (scanning ports + OS detection)")
+        return profile.nmap_arguments(syn_scan, self.ports)
+    
+    async def _nmap_hosts(self, targets: List[str], progress: ScanProgress,
+                          found: Dict[str, NmapHost], profile: ScanProfile) -> AsyncIterator[str]:
+        """
+        Run nmap over the targets and yield each live host's address as nmap reports it.
+        
+        The host's details are left in found for the caller to pick up.
+        Each batch of hosts nmap reports is reverse-resolved in bulk right
+        away, so the lookups overlap with the enrichment of earlier hosts.
+        A scan that fails before reporting anything is retried as a ping scan.
+        """
+        arguments = await self._nmap_arguments(profile)
+        ping_scan = profile.nmap_arguments(False, self.ports)
+        interval = max(1.0, self.settings.get('progress_interval', 1.0))
+        
+        def on_progress(percent: float) -> None:
+            progress.probed = max(progress.probed, int(progress.total * percent / 100))
+        
+        reported = 0
+        lookups: Set[asyncio.Task] = set()
         try:
-            # Import nmap
-            import nmap
+            while True:
+                # -n: skip nmap's own reverse DNS, hostnames come from the cached resolver
+                batches = stream_host_batches(
+                    targets, [*arguments, '-n', '--stats-every', f'{interval:g}s'], on_progress,
+                    binary=self.settings.get('nmap_path', 'nmap')
+                )
+                try:
+                    async for hosts in batches:
+                        up = [host for host in hosts if host.state == 'up' and host.ip]
+                        if not up:
+                            continue
+                        # _get_hostname joins these in-flight lookups
+                        lookup = asyncio.create_task(self.resolver.resolve_many(host.ip for host in up))
+                        lookups.add(lookup)
+                        lookup.add_done_callback(lookups.discard)
+                        for host in up:
+                            reported += 1
+                            found[host.ip] = host
+                            yield host.ip
+                    break
+                except NmapError as e:
+                    if reported or arguments == ping_scan:
+                        raise
+                    print(f"   ❌ Scan error: {str(e)[:100]}...")
+                    # Try fallback to basic ping scan
+                    print(f"   🔄 Retrying with basic scan...")
+                    arguments = ping_scan
+                finally:
+                    await batches.aclose()
+            progress.probed = progress.total
+        finally:
+            # Lookups themselves finish into the resolver's cache
+            for lookup in lookups:
+                lookup.cancel()
+    
+    async def _nmap_device(self, host: NmapHost, progress: ScanProgress,
+                           profile: ScanProfile) -> Device:
+        """Turn a host nmap reported up into a device, filling in what nmap did not see"""
+        started = time.perf_counter()
+        # Unprivileged nmap cannot see MACs; the ARP cache it just filled can
+        mac = host.mac or await self._get_mac_address(host.ip, time.monotonic())
+        vendor = host.vendor or self._get_vendor_from_mac(mac)
+        if host.ports is None:
+            # A ping-only nmap scan finds no ports; fill them in with the connect scanner
+            hostname, ports = await asyncio.gather(
+                self._get_hostname(host.ip), self._scan_ports(host.ip, profile.ports)
+            )
+        else:
+            hostname, ports = await self._get_hostname(host.ip), host.ports
+        
+        device = Device(
+            ip=host.ip,
+            mac=mac,
+            hostname=hostname,
+            vendor=vendor,
+            status="active"
+        )
+        self._set_ports(device, ports, profile)
+        if host.os_info:
+            device.os_info = host.os_info
+        progress.found += 1
+        elapsed = time.perf_counter() - started
+        progress.add_span("enrichment", started, elapsed)
+        progress.add_time("enrichment_host_seconds", elapsed)
+        return device
+    
+    async def _nmap_devices(self, networks: List[Any], progress: ScanProgress,
+                            profile: ScanProfile) -> AsyncIterator[Optional[Device]]:
+        """
+        Discover devices by handing the whole range to nmap.
+        
+        nmap's XML output is parsed as it streams in, and each live host is
+        enriched (hostname, MAC, ports) while nmap works on the rest.
+        """
+        found: Dict[str, NmapHost] = {}
+        engine = self._sweep_engine(
+            lambda ip: self._nmap_device(found.pop(ip), progress, profile),
+            ScanProgress(),
+            fingerprint=True,
+            profile=profile
+        )
+        print(f"🚀 Starting nmap scan (this may take 30-60 seconds)...")
+        # nmap takes several targets and parallelizes them itself
+        hosts = self._nmap_hosts([str(network) for network in networks], progress, found, profile)
+        async for device in engine.sweep(hosts, heartbeat=self.settings.get('progress_interval', 1.0)):
+            yield device
+    
+    async def _pick_backend(self, requested: Optional[str]) -> str:
+        """
+        The backend to scan with, checked against the cached capability profile.
+        
+        A backend asked for by name must work on this host; the configured
+        default falls back to one that does (no ping command, no nmap).
+        """
+        backend = requested or self.settings.get('backend', 'async')
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown scan backend: {backend}")
+        capabilities = await self._capability_profile()
+        available = capabilities['backends']
+        if backend in available:
+            return backend
+        if backend == 'async':
+            reason = "no ping command found"
+        else:
+            reason = capabilities['nmap']['error'] or "nmap not found"
+        if requested or not available:
+            raise ValueError(
+                f"Scan backend {backend} is not available here: {reason} "
+                f"(POST /api/capabilities/refresh after installing it)"
+            )
+        print(f"   ℹ️  Backend {backend} not available ({reason}), using {available[0]}")
+        return available[0]
+    
+    async def _validate_scan(self, network_range: Optional[str], backend: Optional[str],
+                             mode: Optional[str] = None,
+                             profile: Optional[str] = None) -> tuple[str, str, str]:
+        """Check scan parameters up front and return the backend, mode and profile to use"""
+        backend = await self._pick_backend(backend)
+        mode = mode or self.settings.get('mode', 'full')
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown scan mode: {mode}")
+        profile = profile or self.settings.get('scan_profile', 'full')
+        if profile not in self.profiles:
+            raise ValueError(f"Unknown scan profile: {profile} (known: {', '.join(self.profiles)})")
+        if network_range:
+            # Reject malformed or oversized ranges before claiming the scanner
+            iter_hosts(network_range, self.settings.get('max_hosts', 0))
+        return backend, mode, profile
+    
+    async def estimate_scan(self, network_range: Optional[str] = None,
+                            backend: Optional[str] = None, mode: Optional[str] = None,
+                            profile: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Pre-flight estimate of a scan's duration and packets.
+        
+        Based on the range size and the profile's timing, or on the measured
+        throughput of earlier scans with the same backend, mode and profile.
+        """
+        return await self._estimate(*await self._scan_request(network_range, backend, mode, profile))
+    
+    async def _scan_request(self, network_range: Optional[str], backend: Optional[str],
+                            mode: Optional[str], profile: Optional[str]) -> tuple[str, str, str, str]:
+        """Validate a scan request once and fill in the range, auto-detected if not given"""
+        backend, mode, profile = await self._validate_scan(network_range, backend, mode, profile)
+        network_range = network_range or self._detect_network_range()
+        if not network_range:
+            raise ValueError("Could not detect network subnet")
+        return network_range, backend, mode, profile
+    
+    async def _estimate(self, network_range: str, backend: str, mode: str,
+                        profile: str) -> Dict[str, Any]:
+        """estimate_scan for a request _scan_request already checked"""
+        scan_profile = self.profiles[profile]
+        ranges = host_ranges(network_range)
+        known = sum(self.index.count_range(first, last) for first, last in ranges)
+        ports = scan_profile.ports if scan_profile.ports is not None else self.ports
+        os_detection = False
+        if backend == 'nmap' and scan_profile.os_detection and scan_profile.scans_ports:
+            os_detection = (await self._capability_profile())['nmap']['syn_scan']
+        return self.cost_model.estimate(
+            scan_profile, backend, mode,
+            addresses=sum(last - first + 1 for first, last in ranges),
+            ports_per_host=len(ports) if self.settings.get('port_scan', True) else 0,
+            ping_timeout=self.settings.get('ping_timeout', 2.0),
+            os_detection=os_detection,
+            known_hosts=known
+        )
+    
+    async def _run_scan(self, network_range: Optional[str] = None, backend: str = "async",
+                        mode: str = "full", profile: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Scan the network, yielding events as the scan progresses.
+        
+        Called by the scan scheduler; use submit_scan to start a scan.
+        
+        Args:
+            network_range: Optional CIDR range(s), comma or space separated
+            backend: Discovery backend, already checked by _validate_scan
+            mode: "full" re-probes every host, "incremental" only new/changed/stale ones
+            profile: Scan profile name (depth and timing), default scan_profile
             
+        Returns:
+            Async iterator of event dicts: "start", "device" (one per host
+            found, tagged added/changed/unchanged), "progress"
+            (probed/remaining/ETA), then "complete" (with the added/changed/
+            removed diff) or "error". Host-level changes also go to the
+            change feed.
+        """
+        found = 0
+        devices = None
+        seen = set()
+        diff: Dict[str, List[Any]] = {"added": [], "changed": [], "removed": []}
+        unsaved: List[Device] = []
+        # One history entry per host checked, written when the scan ends
+        observed: List[Observation] = []
+        batch_size = self.settings.get('persist_batch', 200)
+        started = time.perf_counter()
+        started_at = time.time()
+        # Jobs restored from before profiles existed have none
+        scan_profile = self.profiles.get(profile or self.settings.get('scan_profile', 'full'))
+        
+        try:
+            if scan_profile is None:
+                yield {"event": "error", "message": f"Unknown scan profile: {profile}"}
+                return
             # Get network range if not provided
             if not network_range:
-                print("🔍 Detecting network configuration...")
-                gateway, subnet = self._get_default_gateway_and_subnet()
-                print(f"   Gateway: {gateway}")
-                print(f"   Subnet: {subnet}")
-                
-                if not subnet:
-                    print("❌ Could not detect network subnet")
-                    return []
-                
-                # Generate network range in CIDR notation
-                base_ip = '.'.join(subnet.split('.')[:3])
-                network_range = f"{base_ip}.0/24"
-                print(f"📡 Scanning network: {network_range}")
+                network_range = self._detect_network_range()
+                if not network_range:
+                    yield {"event": "error", "message": "Could not detect network subnet"}
+                    return
+            print(f"📡 Scanning network: {network_range}")
             
-            # Initialize nmap scanner
-            nm = nmap.PortScanner()
-            
-            print(f"🚀 Starting nmap scan (this may take 30-60 seconds)...")
+            networks = parse_networks(network_range)
+            progress = ScanProgress(count_hosts(networks))
+            progress.add_time("range_detection", time.perf_counter() - started)
+            # One bulk read up front; probes only re-read on a miss
+            phase_started = time.perf_counter()
+            await self.neighbors.refresh()
+            progress.add_time("neighbor_refresh", time.perf_counter() - phase_started)
+            yield {
+                "event": "start",
+                "network": network_range,
+                "backend": backend,
+                "mode": mode,
+                "profile": scan_profile.name,
+                "total": progress.total
+            }
             
-            # Determine scan arguments based on privileges and OS
-            scan_args = '-sn'  # Basic ping scan (no OS detection)
-            os_detection_enabled = False
+            if mode == 'incremental':
+                devices = self._incremental_devices(networks, backend, progress, scan_profile)
+            elif backend == 'nmap':
+                devices = self._nmap_devices(networks, progress, scan_profile)
+            else:
+                devices = self._sweep_devices(networks, progress, scan_profile)
             
-            # Try to detect if we have necessary privileges for advanced scanning
-            try:
-                # Test nmap capabilities with a quick scan on localhost
-                test_nm = nmap.PortScanner()
-                test_nm.scan('127.0.0.1', arguments='-sS -p 80', sudo=False)
-                # If we get here, we have privileges for SYN scan
-                # For OS detection, we need port scan + OS detection
-                # -sS: SYN scan (requires privileges but faster than full connect)
-                # -O: OS detection
-                # -F: Fast scan (top 100 ports instead of 1000)
-                # --osscan-guess: Guess OS more aggressively
-                scan_args = '-sS -F -O --osscan-guess'
-                os_detection_enabled = True
-                print(f"   ✅ Running with OS detection enabled (SYN scan)")
-                print(f"   ⏱️  This will take longer (scanning ports + OS detection)")
-            except Exception:
-                # No privileges for SYN scan, use simple ping scan
-                print(f"   ℹ️  Running basic network scan (ping + ARP)")
-                if platform.system().lower() == 'windows':
-                    print(f"   💡 For OS detection: Run as Administrator + allow firewall")
-                else:
-                    print(f"   💡 For OS detection: Run with sudo")
+            interval = self.settings.get('progress_interval', 1.0)
+            next_report = time.monotonic() + interval
+            probe_started = time.perf_counter()
+            async for device in devices:
+                if device is not None:
+                    handled = time.perf_counter()
+                    change, fields = self._observe(device)
+                    seen.add(device.ip)
+                    observed.append(self._observation(device, True, scan_profile.scans_ports))
+                    if change == "added":
+                        diff["added"].append(device.ip)
+                    elif fields:
+                        diff["changed"].append({"ip": device.ip, "fields": fields})
+                    unsaved.append(device)
+                    if len(unsaved) >= batch_size:
+                        persist_started = time.perf_counter()
+                        await self._persist(unsaved)
+                        unsaved = []
+                        progress.add_time("persistence", time.perf_counter() - persist_started)
+                        handled += time.perf_counter() - persist_started
+                    found += 1
+                    
+                    print(f"   ✅ Found: {device.ip} ({device.hostname or 'Unknown'}) - {device.vendor or 'Unknown vendor'}")
+                    event = {"event": "device", "change": change, "device": device.to_dict()}
+                    progress.add_time("serialization", time.perf_counter() - handled)
+                    yield event
+                
+                if time.monotonic() >= next_report:
+                    next_report = time.monotonic() + interval
+                    yield {"event": "progress", **progress.snapshot()}
             
-            # Perform the actual scan
-            try:
-                await asyncio.to_thread(
-                    nm.scan,
-                    hosts=network_range,
-                    arguments=scan_args
-                )
-            except Exception as e:
-                print(f"   ❌ Scan error: {str(e)[:100]}...")
-                # Try fallback to basic ping scan
-                print(f"   🔄 Retrying with basic scan...")
-                scan_args = '-sn'
-                os_detection_enabled = False
-                await asyncio.to_thread(
-                    nm.scan,
-                    hosts=network_range,
-                    arguments=scan_args
-                )
+            # Known hosts in these ranges that did not answer count a miss, and
+            # are marked gone after miss_threshold misses in a row
+            for ip, device in list(self.devices.items()):
+                if ip in seen or not any(ipaddress.ip_address(ip) in network for network in networks):
+                    continue
+                observed.append(self._observation(device, False, probed=False))
+                if self._observe_missing(device):
+                    diff["removed"].append(ip)
+                    unsaved.append(device)
             
-            # Process results
-            device_count = 0
-            for host in nm.all_hosts():
-                if nm[host].state() == 'up':
-                    hostname = nm[host].hostname() if nm[host].hostname() else ""
-                    
-                    # Get MAC address and vendor
-                    mac = ""
-                    vendor = ""
-                    if 'mac' in nm[host]['addresses']:
-                        mac = nm[host]['addresses']['mac']
-                        if 'vendor' in nm[host] and nm[host]['vendor']:
-                            vendor = list(nm[host]['vendor'].values())[0] if nm[host]['vendor'] else ""
-                    
-                    # Get OS information if available
-                    os_info = ""
-                    if 'osmatch' in nm[host] and nm[host]['osmatch']:
-                        os_match = nm[host]['osmatch'][0]
-                        os_info = os_match.get('name', '')
-                    
-                    # Get open ports if any were scanned
-                    ports = []
-                    if 'tcp' in nm[host]:
-                        ports = [port for port in nm[host]['tcp'].keys()]
-                    
-                    # Create device object
-                    device = Device(
-                        ip=host,
-                        mac=mac,
-                        hostname=hostname,
-                        vendor=vendor,
-                        status="active"
-                    )
-                    device.ports = ports
-                    if os_info:
-                        device.os_info = os_info
-                    
-                    self.devices[host] = device
-                    device_dict = device.to_dict()
-                    if os_info:
-                        device_dict['os_info'] = os_info
-                    discovered_devices.append(device_dict)
-                    device_count += 1
-                    
-                    print(f"   ✅ Found: {host} ({hostname or 'Unknown'}) - {vendor or 'Unknown vendor'}")
+            # Probing is the device loop minus the per-device handling above
+            timings = progress.timings
+            timings["probe"] = (time.perf_counter() - probe_started
+                                - timings.get("serialization", 0.0)
+                                - timings.get("persistence", 0.0))
+            persist_started = time.perf_counter()
+            await self._persist(unsaved)
+            unsaved = []
+            await self._record_history(mode, observed, started_at, backend, network_range)
+            observed = []
+            progress.add_time("persistence", time.perf_counter() - persist_started)
+            timings["total"] = time.perf_counter() - started
+            self._observe_timings(progress, backend, mode)
+            self.cost_model.record(backend, mode, scan_profile.name, progress.total, timings["total"], found)
             
-            print(f"✅ Scan complete! Found {device_count} device(s)")
+            print(f"✅ Scan complete! Found {found} device(s) "
+                  f"(+{len(diff['added'])} ~{len(diff['changed'])} -{len(diff['removed'])})")
+            yield {
+                "event": "complete",
+                "devices": found,
+                "diff": diff,
+                "timings": {phase: round(seconds, 4) for phase, seconds in timings.items()},
+                **progress.snapshot()
+            }
         
-        except ImportError:
-            print("❌ Error: python-nmap not installed. Run: pip install python-nmap")
         except Exception as e:
             print(f"❌ Error during scan: {e}")
             import traceback
             traceback.print_exc()
+            yield {"event": "error", "message": str(e)}
         finally:
-            self.is_scanning = False
+            # Stop in-flight probes if the consumer went away mid-scan
+            if devices is not None:
+                await devices.aclose()
+            # Keep whatever was found, even if the scan was cut short
+            await self._persist(unsaved)
+            await self._record_history(mode, observed, started_at, backend, network_range)
+    
+    def _observe_timings(self, progress: ScanProgress, backend: str, mode: str) -> None:
+        for phase, seconds in progress.timings.items():
+            self._phase_seconds.observe(seconds, phase=phase, backend=backend, mode=mode)
+        probe_seconds = progress.timings.get("probe", 0.0)
+        if progress.probed and probe_seconds > 0:
+            self._hosts_per_second.observe(progress.probed / probe_seconds, backend=backend, mode=mode)
+    
+    async def _liveness_check(self) -> Optional[Dict[str, Any]]:
+        """
+        Cheap monitoring pass: ping every known host, and only fingerprint
+        hosts whose MAC changed (stale fingerprints wait for the next scan).
+        """
+        if self.scheduler.running:
+            # A scan is already probing these hosts
+            return None
+        
+        known = list(self.devices.values())
+        started_at = time.time()
+        progress = ScanProgress(len(known))
+        engine = self._sweep_engine(self._check_alive, progress)
+        up: Dict[str, str] = {}
+        await self.neighbors.refresh()
+        async for alive in engine.sweep([device.ip for device in known]):
+            if alive is not None:
+                up[alive[0]] = alive[1]
+        
+        replaced = [
+            previous for previous in known
+            if previous.ip in up and up[previous.ip] and previous.mac
+            and up[previous.ip] != previous.mac
+        ]
+        fingerprinted = await asyncio.gather(*(
+            self._fingerprint_device(previous.ip, up[previous.ip]) for previous in replaced
+        ))
+        fresh = {device.ip: device for device in fingerprinted}
+        
+        unsaved: List[Device] = []
+        observed: List[Observation] = []
+        appeared = disappeared = 0
+        for previous in known:
+            if previous.ip in up:
+                device = fresh.get(previous.ip) or previous.refreshed(up[previous.ip])
+                appeared += previous.status != "active"
+                self._observe(device)
+                unsaved.append(device)
+                observed.append(self._observation(device, True, probed=previous.ip in fresh))
+            else:
+                observed.append(self._observation(previous, False, probed=False))
+                if self._observe_missing(previous):
+                    disappeared += 1
+                    unsaved.append(previous)
+        await self._persist(unsaved)
+        await self._record_history("check", observed, started_at)
         
-        return discovered_devices
+        result = {
+            "checked": len(known),
+            "up": len(up),
+            "appeared": appeared,
+            "disappeared": disappeared
+        }
+        self.publish("monitor", result)
+        return result
+    
+    async def _monitor_scan(self) -> None:
+        """Periodic discovery scan run by the monitor, to find hosts not yet known"""
+        job, _ = await self.submit_scan(
+            self.settings.get('monitor_networks') or None,
+            mode=self.settings.get('monitor_mode', 'incremental')
+        )
+        await job.wait()
+        if job.status != "completed":
+            # So the monitor counts it as failed and backs off
+            raise RuntimeError(f"Monitor scan {job.status}: {job.error or 'no details'}")
+    
+    async def submit_scan(self, network_range: Optional[str] = None,
+                          backend: Optional[str] = None,
+                          mode: Optional[str] = None,
+                          profile: Optional[str] = None) -> tuple[ScanJob, bool]:
+        """
+        Queue a scan job, or join an identical one already in flight.
+        
+        Args:
+            network_range: Optional CIDR range(s), comma or space separated
+            backend: Discovery backend, "async" (built-in sweep) or "nmap"
+            mode: "full" or "incremental"
+            profile: Scan profile name, e.g. "discovery", "quick" or "full"
+            
+        Returns:
+            The scan job and whether it was newly created
+        """
+        backend, mode, profile = await self._validate_scan(network_range, backend, mode, profile)
+        return await self._submit(network_range, backend, mode, profile)
+    
+    async def _submit(self, network_range: Optional[str], backend: str, mode: str,
+                      profile: str) -> tuple[ScanJob, bool]:
+        """submit_scan for parameters _validate_scan already checked"""
+        if network_range:
+            # Canonical form, so equivalent range lists share one job
+            network_range = ', '.join(str(network) for network in parse_networks(network_range))
+        return await self.scheduler.submit(network_range, backend, {"mode": mode, "profile": profile})
+    
+    async def scan_network(self, network_range: Optional[str] = None,
+                           backend: Optional[str] = None,
+                           mode: Optional[str] = None,
+                           profile: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Scan the network for devices and wait for the result.
+        
+        Args:
+            network_range: Optional CIDR range(s), comma or space separated
+            backend: Discovery backend, "async" (built-in sweep) or "nmap"
+            mode: "full" or "incremental"
+            profile: Scan profile name, e.g. "discovery", "quick" or "full"
+            
+        Returns:
+            List of discovered devices with their information
+        """
+        job, _ = await self.submit_scan(network_range, backend, mode, profile)
+        await job.wait()
+        return job.devices
+    
+    @staticmethod
+    def _timestamp(value: Any, default: float) -> float:
+        """Epoch seconds from a datetime, an ISO string or epoch seconds"""
+        if value is None:
+            return default
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if isinstance(value, datetime):
+            return value.timestamp()
+        return float(value)
+    
+    def _list_devices(self) -> Dict[str, Any]:
+        return {
+            "status": "success",
+            "action": "list",
+            "devices": serialize_devices(self.devices.values()),
+            "total": len(self.devices)
+        }
+    
+    def query_devices(self, fields: Optional[List[str]] = None, limit: int = 100,
+                      **filters) -> Dict[str, Any]:
+        """
+        Filter and page through the inventory using the secondary indexes.
+        
+        Args:
+            fields: Only include these keys in each device (all if None)
+            limit: Page size, capped at max_page_size
+            **filters: vendor, status, port, subnet, os, seen_after,
+                seen_before (ISO timestamps) and cursor
+            
+        Returns:
+            One page of devices, the total match count and the next cursor
+        """
+        for name in ('seen_after', 'seen_before'):
+            if isinstance(filters.get(name), str):
+                filters[name] = datetime.fromisoformat(filters[name])
+        limit = max(1, min(limit, self.settings.get('max_page_size', 1000)))
+        
+        ips, total, next_cursor = self.index.query(limit=limit, **filters)
+        devices = serialize_devices(self.devices[ip] for ip in ips)
+        if fields:
+            devices = [{k: d[k] for k in fields if k in d} for d in devices]
+        
+        return {
+            "status": "success",
+            "action": "query",
+            "devices": devices,
+            "total": total,
+            "next_cursor": next_cursor
+        }
     
     async def execute(self, **kwargs) -> Dict[str, Any]:
         """Execute scan operation"""
         action = kwargs.get('action', 'scan')
         
-        if action == 'scan':
+        if action in ('scan', 'stream', 'estimate'):
             network = kwargs.get('network', None)
-            devices = await self.scan_network(network)
+            scan = (network, kwargs.get('backend', None), kwargs.get('mode', None),
+                    kwargs.get('profile', None))
+            try:
+                # Validated and range-detected once; the job scans the range that was estimated
+                scan = await self._scan_request(*scan)
+                estimate = await self._estimate(*scan)
+                if action == 'estimate':
+                    return {
+                        "status": "success",
+                        "action": action,
+                        "estimate": estimate
+                    }
+                job, created = await self._submit(*scan)
+            except ValueError as e:
+                return {
+                    "status": "error",
+                    "message": str(e)
+                }
+            result = {
+                "status": "success",
+                "action": action,
+                "job_id": job.id,
+                "deduplicated": not created,
+                "estimate": estimate,
+                "job": job.to_dict()
+            }
+            if action == 'stream':
+                result["events"] = job.follow()
+            return result
+        
+        elif action in ('scan_status', 'follow_scan', 'cancel_scan'):
+            job = self.scheduler.get(kwargs.get('job_id'))
+            if not job:
+                return {
+                    "status": "error",
+                    "message": f"Scan {kwargs.get('job_id')} not found"
+                }
+            if action == 'cancel_scan':
+                cancelled = await self.scheduler.cancel(job.id)
+                return {
+                    "status": "success",
+                    "action": action,
+                    "cancelled": cancelled,
+                    "job": job.to_dict()
+                }
+            if action == 'follow_scan':
+                return {
+                    "status": "success",
+                    "action": action,
+                    "events": job.follow()
+                }
+            return {
+                "status": "success",
+                "action": action,
+                "job": job.to_dict(include_devices=True,
+                                   include_timings=bool(kwargs.get('timings')))
+            }
+        
+        elif action == 'list_scans':
+            return {
+                "status": "success",
+                "action": action,
+                "scans": [job.to_dict() for job in self.scheduler.list()],
+                "queued": len(self.scheduler.pending),
+                "running": self.scheduler.running
+            }
+        
+        elif action == 'monitor_status':
+            return {
+                "status": "success",
+                "action": action,
+                "monitor": self.monitor.to_dict()
+            }
+        
+        elif action in ('start_monitor', 'stop_monitor'):
+            if action == 'start_monitor':
+                self.monitor.start()
+            else:
+                await self.monitor.stop()
             return {
                 "status": "success",
-                "action": "scan",
-                "devices": devices,
-                "total": len(devices)
+                "action": action,
+                "monitor": self.monitor.to_dict()
+            }
+        
+        elif action == 'changes':
+            since = kwargs.get('since') or 0
+            return {
+                "status": "success",
+                "action": action,
+                "changes": self.changes.since(since, kwargs.get('limit')),
+                "last_id": self.changes.last_id
+            }
+        
+        elif action == 'follow_changes':
+            return {
+                "status": "success",
+                "action": action,
+                "events": self.changes.follow(kwargs.get('since'))
             }
         
         elif action == 'list':
+            return self._list_devices()
+        
+        elif action == 'list_snapshot':
+            # Pre-serialized JSON of the 'list' result, rebuilt only after a change
+            etag, body = self.snapshot.get()
+            return {
+                "status": "success",
+                "action": action,
+                "etag": etag,
+                "body": body
+            }
+        
+        elif action == 'query':
+            filters = {
+                k: v for k, v in kwargs.items()
+                if k not in ('action',) and v is not None
+            }
+            try:
+                return self.query_devices(**filters)
+            except (TypeError, ValueError) as e:
+                return {
+                    "status": "error",
+                    "message": str(e)
+                }
+        
+        elif action in ('history_hosts', 'history_timeline', 'history_status'):
+            if not self.history:
+                return {
+                    "status": "error",
+                    "message": "Scan history is not enabled"
+                }
+            if action == 'history_status':
+                return {
+                    "status": "success",
+                    "action": action,
+                    "history": await self.history.stats()
+                }
+            try:
+                end = self._timestamp(kwargs.get('end'), time.time())
+                if action == 'history_hosts':
+                    start = self._timestamp(kwargs.get('start'), end - 86400)
+                    result = await self.history.hosts_up(start, end, kwargs.get('subnet'))
+                else:
+                    start = self._timestamp(kwargs.get('start'), end - 7 * 86400)
+                    result = await self.history.timeline(
+                        kwargs.get('ip'), start, end,
+                        resolution=kwargs.get('resolution') or 'auto',
+                        limit=kwargs.get('limit') or 5000
+                    )
+            except ValueError as e:
+                return {
+                    "status": "error",
+                    "message": str(e)
+                }
+            return {
+                "status": "success",
+                "action": action,
+                **result
+            }
+        
+        elif action == 'profiles':
+            return {
+                "status": "success",
+                "action": action,
+                "default": self.settings.get('scan_profile', 'full'),
+                "profiles": [profile.to_dict() for profile in self.profiles.values()]
+            }
+        
+        elif action == 'capabilities':
             return {
                 "status": "success",
-                "action": "list",
-                "devices": [d.to_dict() for d in self.devices.values()],
-                "total": len(self.devices)
+                "action": action,
+                "capabilities": await self._capability_profile(bool(kwargs.get('refresh')))
             }
         
         elif action == 'get_device':
@@ -372,5 +1418,21 @@ class ScannerPlugin(BasePlugin):
     
     async def cleanup(self) -> None:
         """Cleanup resources"""
+        if self._capability_task is not None:
+            self._capability_task.cancel()
+            await asyncio.gather(self._capability_task, return_exceptions=True)
+            self._capability_task = None
+        await self.monitor.stop()
+        await self.scheduler.stop()
+        self.resolver.close()
+        if self.shard_pool:
+            self.shard_pool.close()
+        if self.history:
+            await self.history.close()
+            self.history = None
+        if self.store:
+            await self.store.close()
+            self.store = None
         self.devices.clear()
-        self.is_scanning = False
+        self.index.clear()
+        self.snapshot.touch()
@@ -0,0 +1,147 @@
+"""
+Sharded Sweeps - Split large scans into shards probed by worker processes
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+
+from plugins.scanner.probes import ping_host
+from plugins.scanner.sweep import ScanProgress, SweepEngine, iter_ranges
+
+HostRanges = List[Tuple[int, int]]
+
+
+def resolve_processes(value) -> int:
+    """Turn the scan_processes setting ("auto" or a count) into a process count"""
+    if value == "auto":
+        return os.cpu_count() or 1
+    return max(0, int(value or 0))
+
+
+def split_shards(ranges: HostRanges, shard_size: int) -> List[HostRanges]:
+    """
+    Cut host ranges into shards of at most shard_size addresses.
+
+    Large networks are split across several shards and small ones are
+    packed together, so every worker gets a similar amount of work.
+    """
+    shard_size = max(1, shard_size)
+    shards: List[HostRanges] = []
+    current: HostRanges = []
+    room = shard_size
+    for first, last in ranges:
+        while first <= last:
+            end = min(last, first + room - 1)
+            current.append((first, end))
+            room -= end - first + 1
+            first = end + 1
+            if room == 0:
+                shards.append(current)
+                current, room = [], shard_size
+    if current:
+        shards.append(current)
+    return shards
+
+
+async def _probe_shard(ranges: HostRanges, concurrency: int, ping_timeout: float,
+                       host_timeout: float, rate: float, retries: int) -> Tuple[List[str], int]:
+    async def probe(ip: str) -> Optional[str]:
+        for _ in range(1 + retries):
+            if await ping_host(ip, ping_timeout):
+                return ip
+        return None
+
+    engine = SweepEngine(probe, concurrency=concurrency, host_timeout=host_timeout, rate=rate)
+    alive = [ip async for ip in engine.sweep(iter_ranges(ranges))]
+    return alive, engine.progress.probed
+
+
+def probe_shard(ranges: HostRanges, concurrency: int, ping_timeout: float,
+                host_timeout: float, rate: float, retries: int = 0) -> Tuple[List[str], int]:
+    """
+    Ping every address of a shard (runs inside a worker process).
+
+    Silent addresses are pinged again up to retries times.
+
+    Returns:
+        (addresses that answered, number of addresses probed)
+    """
+    return asyncio.run(_probe_shard(ranges, concurrency, ping_timeout, host_timeout, rate, retries))
+
+
+class ShardPool:
+    """
+    Process pool that runs liveness sweeps for scan shards.
+
+    Each worker process runs its own event loop and SweepEngine, so probe
+    scheduling and subprocess handling spread across cores. The pool uses
+    the spawn start method (forking a process with a running event loop
+    and thread pools is unsafe) and is created on first use.
+    """
+
+    def __init__(self, processes: int):
+        self.processes = max(1, processes)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def sweep(self, shards: List[HostRanges], progress: ScanProgress,
+                    heartbeat: Optional[float] = None, concurrency: int = 256,
+                    ping_timeout: float = 2.0, host_timeout: float = 3.0,
+                    rate: float = 0, retries: int = 0) -> AsyncIterator[Optional[List[str]]]:
+        """
+        Probe all shards in parallel, yielding each shard's live hosts as it finishes.
+
+        Args:
+            concurrency: Probes in flight per worker process
+            rate: Global probe rate limit, split evenly across the workers
+            retries: Extra pings for addresses that stay silent
+
+        Returns:
+            Async iterator of lists of live addresses; None is yielded when
+            no shard finished for heartbeat seconds
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        worker_rate = rate / self.processes if rate > 0 else 0
+        pending = {
+            loop.run_in_executor(
+                executor, probe_shard, shard,
+                concurrency, ping_timeout, host_timeout, worker_rate, retries
+            )
+            for shard in shards
+        }
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=heartbeat, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    yield None
+                    continue
+                for future in done:
+                    try:
+                        alive, probed = future.result()
+                    except Exception as e:
+                        print(f"   ⚠️  Scan shard failed: {e}")
+                        continue
+                    progress.probed += probed
+                    progress.found += len(alive)
+                    yield alive
+        finally:
+            # Shards not yet started are dropped; running ones finish on their own
+            for future in pending:
+                future.cancel()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,37 @@
+"""
+Versioned Snapshots - Serialize read-mostly data once per change, not once per request
+"""
+import uuid
+from typing import Any, Callable, Optional, Tuple
+
+from src.core.serialization import dumps
+
+
+class VersionedSnapshot:
+    """
+    Caches the JSON encoding of build() until touch() is called.
+
+    The ETag combines a per-process token with the version counter, so it
+    changes on every mutation and never collides across restarts.
+    """
+
+    def __init__(self, build: Callable[[], Any]):
+        self.build = build
+        self.version = 0
+        self._token = uuid.uuid4().hex[:8]
+        self._cached: Optional[Tuple[int, str, bytes]] = None
+
+    def touch(self) -> None:
+        """Mark the underlying data as changed"""
+        self.version += 1
+
+    @property
+    def etag(self) -> str:
+        return f'"{self._token}-{self.version}"'
+
+    def get(self) -> Tuple[str, bytes]:
+        """Return (etag, body), re-serializing only if the data changed"""
+        if self._cached is None or self._cached[0] != self.version:
+            version = self.version
+            self._cached = (version, self.etag, dumps(self.build()))
+        return self._cached[1], self._cached[2]
@@ -0,0 +1,249 @@
+"""
+Sweep Engine - Bounded concurrent host probing built on asyncio
+"""
+import asyncio
+import ipaddress
+import time
+from typing import (
+    Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List,
+    Optional, Tuple, Union
+)
+
+
+class RateLimiter:
+    """Token bucket limiting how many probes may start per second"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and consume it"""
+        if self.rate <= 0:
+            return
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+NetworkSpec = Union[str, Iterable[Any]]
+
+
+def parse_networks(spec: NetworkSpec) -> List[ipaddress.IPv4Network]:
+    """
+    Parse one or more IPv4 ranges into a list of networks.
+
+    Accepts a CIDR string, several separated by commas or whitespace
+    ("10.0.0.0/24, 10.1.0.0/16"), or an iterable of strings/networks.
+    Overlapping and adjacent ranges are merged so no host is probed twice.
+    """
+    if isinstance(spec, str):
+        spec = spec.replace(",", " ").split()
+    networks = []
+    for item in spec:
+        network = ipaddress.ip_network(item, strict=False)
+        if network.version != 4:
+            raise ValueError(f"Only IPv4 ranges can be scanned: {network}")
+        networks.append(network)
+    if not networks:
+        raise ValueError("No network range given")
+    return list(ipaddress.collapse_addresses(networks))
+
+
+def host_ranges(spec: NetworkSpec) -> List[Tuple[int, int]]:
+    """Usable host addresses of each network as inclusive (first, last) integers"""
+    ranges = []
+    for network in parse_networks(spec):
+        first, last = int(network.network_address), int(network.broadcast_address)
+        if network.num_addresses > 2:
+            # Skip the network and broadcast addresses
+            first, last = first + 1, last - 1
+        ranges.append((first, last))
+    return ranges
+
+
+def count_hosts(spec: NetworkSpec) -> int:
+    """Number of addresses iter_hosts will yield for one or more ranges"""
+    return sum(last - first + 1 for first, last in host_ranges(spec))
+
+
+class ScanProgress:
+    """Running counters for a scan, used for progress and ETA reporting"""
+
+    def __init__(self, total: int = 0):
+        self.total = total
+        self.probed = 0
+        self.found = 0
+        self.started = time.monotonic()
+        # Seconds spent per scan phase, see add_time and add_span
+        self.timings: Dict[str, float] = {}
+        self._spans: Dict[str, Tuple[float, float]] = {}
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        """Account time to a phase; concurrent per-host work adds up across hosts"""
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def add_span(self, phase: str, started: float, seconds: float) -> None:
+        """
+        Account concurrent work to a phase as wall-clock time: from the
+        first piece's start to the last one's end (perf_counter times).
+        """
+        ended = started + seconds
+        first, last = self._spans.get(phase, (started, ended))
+        first, last = min(first, started), max(last, ended)
+        self._spans[phase] = (first, last)
+        self.timings[phase] = last - first
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the current progress as a JSON-serializable dict"""
+        elapsed = time.monotonic() - self.started
+        remaining = max(0, self.total - self.probed)
+        eta = None
+        if self.probed and elapsed > 0:
+            eta = round(remaining / (self.probed / elapsed), 1)
+        return {
+            "probed": self.probed,
+            "found": self.found,
+            "total": self.total,
+            "remaining": remaining,
+            "elapsed": round(elapsed, 1),
+            "eta": eta
+        }
+
+
+def iter_ranges(ranges: Iterable[Tuple[int, int]]) -> Iterator[str]:
+    """Yield every address in a list of inclusive (first, last) integer ranges"""
+    for first, last in ranges:
+        for value in range(first, last + 1):
+            yield str(ipaddress.IPv4Address(value))
+
+
+def iter_hosts(spec: NetworkSpec, max_hosts: int = 0) -> Iterator[str]:
+    """
+    Yield every usable host address in one or more CIDR ranges.
+
+    Args:
+        spec: CIDR notation network range(s), see parse_networks
+        max_hosts: Refuse specs with more addresses than this in total (0 = no limit)
+
+    Returns:
+        Iterator over host addresses as strings
+    """
+    networks = parse_networks(spec)
+    addresses = sum(network.num_addresses for network in networks)
+    if max_hosts and addresses > max_hosts:
+        raise ValueError(
+            f"{', '.join(map(str, networks))} has {addresses} addresses, "
+            f"limit is {max_hosts}"
+        )
+    return iter_ranges(host_ranges(networks))
+
+
+class SweepEngine:
+    """Runs a probe coroutine against many hosts with bounded parallelism"""
+
+    def __init__(self, probe: Callable[[str], Awaitable[Any]],
+                 concurrency: int = 256, host_timeout: float = 3.0,
+                 rate: float = 0, progress: Optional[ScanProgress] = None):
+        self.probe = probe
+        self.concurrency = max(1, concurrency)
+        self.host_timeout = host_timeout
+        self.limiter = RateLimiter(rate)
+        self.progress = progress or ScanProgress()
+
+    async def _probe_one(self, host: str) -> Any:
+        await self.limiter.acquire()
+        try:
+            return await asyncio.wait_for(self.probe(host), timeout=self.host_timeout)
+        except asyncio.TimeoutError:
+            return None
+        except Exception as e:
+            print(f"   ⚠️  Probe failed for {host}: {e}")
+            return None
+
+    @staticmethod
+    async def _feed(hosts: AsyncIterable[str], queue: asyncio.Queue, done: object) -> None:
+        """Move hosts from an async source into the workers' queue, then signal the end"""
+        try:
+            async for host in hosts:
+                await queue.put(host)
+        except Exception:
+            await queue.put(done)
+            raise
+        await queue.put(done)
+
+    async def sweep(self, hosts: Union[Iterable[str], AsyncIterable[str]],
+                    heartbeat: Optional[float] = None) -> AsyncIterator[Any]:
+        """
+        Probe hosts concurrently and yield non-empty results as they complete.
+
+        Hosts are pulled lazily from the iterable by a fixed pool of workers,
+        so memory stays bounded even for /16-sized ranges. An async iterable
+        (hosts that are still being discovered) is consumed as it produces;
+        an error it raises ends the sweep once the hosts it already produced
+        have been probed. When heartbeat is set, None is yielded whenever no
+        result arrived for that many seconds so callers can report progress
+        during quiet stretches.
+        """
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        done = object()
+        feeder = None
+        if isinstance(hosts, AsyncIterable):
+            pending: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+            feeder = asyncio.create_task(self._feed(hosts, pending, done))
+
+            async def next_host() -> Any:
+                host = await pending.get()
+                if host is done:
+                    # Leave the marker for the other workers
+                    pending.put_nowait(done)
+                return host
+        else:
+            host_iter = iter(hosts)
+
+            async def next_host() -> Any:
+                return next(host_iter, done)
+
+        async def worker() -> None:
+            while (host := await next_host()) is not done:
+                result = await self._probe_one(host)
+                self.progress.probed += 1
+                if result is not None:
+                    self.progress.found += 1
+                    await results.put(result)
+            await results.put(done)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        remaining = len(workers)
+        try:
+            while remaining:
+                try:
+                    item = await asyncio.wait_for(results.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if item is done:
+                    remaining -= 1
+                    continue
+                yield item
+            if feeder is not None:
+                # Re-raises whatever stopped the host source
+                await feeder
+        finally:
+            tasks = workers + ([feeder] if feeder is not None else [])
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if feeder is not None and hasattr(hosts, "aclose"):
+                # Lets the source stop its own work (e.g. a subprocess)
+                await hosts.aclose()
@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import './ScannerView.css';
 
 interface Device {
@@ -12,11 +12,19 @@ interface Device {
     ports: number[];
 }
 
-interface ScanResponse {
-    status: string;
-    action: string;
-    devices: Device[];
+interface DeviceChange {
+    type: 'appeared' | 'disappeared' | 'mac_changed' | 'port_opened' | 'port_closed';
+    ip: string;
+    device?: Device;
+    new?: string;
+    port?: number;
+}
+
+interface ScanProgress {
+    probed: number;
     total: number;
+    remaining: number;
+    eta: number | null;
 }
 
 function ScannerView() {
@@ -25,47 +33,101 @@ function ScannerView() {
     const [scanProgress, setScanProgress] = useState(0);
     const [error, setError] = useState<string | null>(null);
 
-    const startScan = async () => {
+    // Live inventory changes (e.g. from monitoring) arrive over the shared event socket
+    useEffect(() => {
+        const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        const socket = new WebSocket(`${protocol}://${window.location.host}/api/ws?topics=scanner.change`);
+
+        const update = (ip: string, apply: (device: Device) => Device) => {
+            setDevices(prev => prev.map(d => (d.ip === ip ? apply(d) : d)));
+        };
+
+        socket.onmessage = (message) => {
+            const event = JSON.parse(message.data);
+            if (event.type !== 'event') return;
+            const change: DeviceChange = event.data;
+            switch (change.type) {
+                case 'appeared':
+                    if (change.device) {
+                        const device = change.device;
+                        setDevices(prev => [...prev.filter(d => d.ip !== device.ip), device]);
+                    }
+                    break;
+                case 'disappeared':
+                    update(change.ip, d => ({ ...d, status: 'inactive' }));
+                    break;
+                case 'mac_changed':
+                    update(change.ip, d => ({ ...d, mac: change.new ?? d.mac }));
+                    break;
+                case 'port_opened':
+                    update(change.ip, d => ({ ...d, ports: [...d.ports, change.port!].sort((a, b) => a - b) }));
+                    break;
+                case 'port_closed':
+                    update(change.ip, d => ({ ...d, ports: d.ports.filter(p => p !== change.port) }));
+                    break;
+            }
+        };
+
+        return () => socket.close();
+    }, []);
+
+    const startScan = () => {
         setIsScanning(true);
         setError(null);
         setScanProgress(0);
+        setDevices([]);
 
-        // Simulate progress (since the backend scan is async)
-        const progressInterval = setInterval(() => {
-            setScanProgress(prev => {
-                if (prev >= 90) {
-                    clearInterval(progressInterval);
-                    return prev;
-                }
-                return prev + 10;
-            });
-        }, 500);
-
-        try {
-            const response = await fetch('/api/scan', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ network: null }),
-            });
-
-            if (!response.ok) {
-                throw new Error('Scan failed');
-            }
+        // Devices and progress arrive as Server-Sent Events while the scan runs
+        follow('/api/scan/stream');
+    };
 
-            const data: ScanResponse = await response.json();
-            setDevices(data.devices || []);
-            setScanProgress(100);
-        } catch (err) {
-            setError(err instanceof Error ? err.message : 'An error occurred during scanning');
-        } finally {
-            clearInterval(progressInterval);
+    const follow = (url: string) => {
+        const source = new EventSource(url);
+
+        const finish = () => {
+            source.close();
             setTimeout(() => {
                 setIsScanning(false);
                 setScanProgress(0);
             }, 500);
-        }
+        };
+
+        source.addEventListener('device', (event) => {
+            const { device } = JSON.parse((event as MessageEvent).data) as { device: Device };
+            setDevices(prev => [...prev.filter(d => d.ip !== device.ip), device]);
+        });
+
+        source.addEventListener('progress', (event) => {
+            const progress: ScanProgress = JSON.parse((event as MessageEvent).data);
+            if (progress.total > 0) {
+                setScanProgress(Math.round((progress.probed / progress.total) * 100));
+            }
+        });
+
+        source.addEventListener('complete', () => {
+            setScanProgress(100);
+            finish();
+        });
+
+        source.addEventListener('cancelled', () => {
+            setError('Scan was cancelled');
+            finish();
+        });
+
+        // The scanner was hot-reloaded: the same job runs again, follow it there
+        source.addEventListener('reloaded', (event) => {
+            const { job_id } = JSON.parse((event as MessageEvent).data) as { job_id: string };
+            source.close();
+            setScanProgress(0);
+            follow(`/api/scans/${job_id}/stream`);
+        });
+
+        // Server-sent "error" events carry a message; connection errors do not
+        source.addEventListener('error', (event) => {
+            const data = (event as MessageEvent).data;
+            setError(data ? JSON.parse(data).message || 'Scan failed' : 'An error occurred during scanning');
+            finish();
+        });
     };
 
     const getStatusColor = (status: string) => {